@@ -0,0 +1,177 @@
+import sys
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.utils import timezone
+
+from .bitmaps import Bitmap
+from .models import Attribute
+from .models import Product
+from .routers import reading_from
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunked
+
+ProductAttribute = Product.attributes.through
+
+
+def get_sync_overlap():
+    """How far back each sync looks again, for changes whose transactions committed after a later sync began."""
+    return timedelta(seconds=getattr(settings, 'API_ATTRIBUTE_INDEX_SYNC_OVERLAP', 2))
+
+
+class AttributeIndex(object):
+    """
+    A per-process index from each attribute id to the Bitmap of the ids of the products linked to it, from each product
+    id back to the ids of its attributes, and from each (type, value) pair to the ids of the attributes that have it.
+    It is loaded from the database on first use, kept
+    current by the receivers in api/signals.py for changes this process commits, and before every lookup caught up
+    with changes other processes made, by re-reading the links of the products whose modified_at moved since the
+    last sync. Linking, unlinking and deleting attributes all move the modified_at of the products involved. It always
+    reads from the primary, as a lagging replica could make a sync skip changes for good.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.bitmaps = {}
+        self.product_links = {}
+        self.pairs = defaultdict(set)
+        self.attribute_pairs = {}
+        self.synced_at = None
+
+    def load(self):
+        """Read every attribute and link, replacing whatever the index held."""
+        with self.lock, reading_from(replica=False):
+            synced_at = timezone.now()
+            self.bitmaps, self.pairs, self.attribute_pairs = {}, defaultdict(set), {}
+            product_links = defaultdict(list)
+            for attribute_id, type, value in Attribute.objects.values_list('id', 'type', 'value').iterator():
+                self.set_attribute(attribute_id, type, value)
+            links = (ProductAttribute.objects.order_by('attribute_id', 'product_id')
+                     .values_list('attribute_id', 'product_id').iterator(chunk_size=10000))
+            for attribute_id, group in groupby(links, key=lambda link: link[0]):
+                product_ids = [product_id for _, product_id in group]
+                self.bitmaps[attribute_id] = Bitmap(product_ids)
+                for product_id in product_ids:
+                    product_links[product_id].append(attribute_id)
+            self.product_links = {product_id: tuple(ids) for product_id, ids in product_links.items()}
+            self.synced_at, self.loaded = synced_at, True
+
+    def sync(self):
+        """Load the index, or catch it up with the attributes and products that changed since the last sync."""
+        with self.lock, reading_from(replica=False):
+            if not self.loaded:
+                return self.load()
+
+            synced_at, since = timezone.now(), self.synced_at - get_sync_overlap()
+            # Including the attributes hidden since, which are dropped.
+            for attribute_id, type, value, hidden in Attribute.all_objects.filter(modified_at__gte=since).values_list(
+                    'id', 'type', 'value', 'hidden'):
+                if hidden:
+                    self.drop_attribute(attribute_id)
+                else:
+                    self.set_attribute(attribute_id, type, value)
+            product_ids = list(Product.objects.filter(modified_at__gte=since).values_list('id', flat=True))
+            if product_ids:
+                self.relink_products(product_ids)
+            self.synced_at = synced_at
+
+    def relink_products(self, product_ids):
+        """
+        Replace the links of the products with the ones in the database, touching only the bitmaps of the attributes
+        each product gained or lost.
+        """
+        linked = defaultdict(set)
+        for chunk in chunked(product_ids, MAX_IN_CLAUSE_SIZE):
+            for product_id, attribute_id in ProductAttribute.objects.filter(product_id__in=chunk).values_list(
+                    'product_id', 'attribute_id'):
+                linked[product_id].add(attribute_id)
+        added, removed = [], []
+        for product_id in product_ids:
+            indexed = set(self.product_links.get(product_id, ()))
+            added.extend((product_id, attribute_id) for attribute_id in linked[product_id] - indexed)
+            removed.extend((product_id, attribute_id) for attribute_id in indexed - linked[product_id])
+        self.remove_links(removed)
+        self.add_links(added)
+
+    def set_attribute(self, attribute_id, type, value):
+        with self.lock:
+            previous = self.attribute_pairs.get(attribute_id)
+            if previous is not None and previous != (type, value):
+                self.pairs[previous].discard(attribute_id)
+            self.attribute_pairs[attribute_id] = (type, value)
+            self.pairs[(type, value)].add(attribute_id)
+
+    def drop_attribute(self, attribute_id):
+        with self.lock:
+            pair = self.attribute_pairs.pop(attribute_id, None)
+            if pair is not None:
+                self.pairs[pair].discard(attribute_id)
+            self.remove_links([(product_id, attribute_id) for product_id in self.bitmaps.get(attribute_id, ())])
+            self.bitmaps.pop(attribute_id, None)
+
+    def add_links(self, links):
+        """Add (product_id, attribute_id) links."""
+        with self.lock:
+            for product_id, attribute_id in links:
+                self.bitmaps.setdefault(attribute_id, Bitmap()).add(product_id)
+                attribute_ids = self.product_links.get(product_id, ())
+                if attribute_id not in attribute_ids:
+                    self.product_links[product_id] = attribute_ids + (attribute_id,)
+
+    def remove_links(self, links):
+        """Remove (product_id, attribute_id) links."""
+        with self.lock:
+            for product_id, attribute_id in links:
+                if attribute_id in self.bitmaps:
+                    self.bitmaps[attribute_id].discard(product_id)
+                attribute_ids = tuple(other for other in self.product_links.get(product_id, ())
+                                      if other != attribute_id)
+                if attribute_ids:
+                    self.product_links[product_id] = attribute_ids
+                else:
+                    self.product_links.pop(product_id, None)
+
+    def products_with(self, pair):
+        """Return the Bitmap of the products linked to an attribute with the (type, value) pair."""
+        result = Bitmap()
+        for attribute_id in self.pairs.get(pair, ()):
+            result = result | self.bitmaps.get(attribute_id, Bitmap())
+        return result
+
+    def resolve(self, all_of=(), any_of=()):
+        """
+        Return the Bitmap of the products linked to all of the (type, value) pairs in `all_of` and, when `any_of` is
+        given, to at least one of the pairs in it. The rarest pairs are intersected first.
+        """
+        with self.lock:
+            self.sync()
+            bitmaps = sorted((self.products_with(pair) for pair in set(all_of)), key=len)
+            if any_of:
+                matches_any = Bitmap()
+                for pair in set(any_of):
+                    matches_any = matches_any | self.products_with(pair)
+                bitmaps.append(matches_any)
+
+        result = bitmaps[0] if bitmaps else Bitmap()
+        for bitmap in bitmaps[1:]:
+            if not result:
+                break
+            result = result & bitmap
+        return result
+
+    def stats(self):
+        """Return the number of links in the index and roughly how many bytes it takes."""
+        with self.lock:
+            links = sum(len(bitmap) for bitmap in self.bitmaps.values())
+            size = (sys.getsizeof(self.bitmaps) + sum(bitmap.memory_size() for bitmap in self.bitmaps.values()) +
+                    sys.getsizeof(self.product_links) + sum(map(sys.getsizeof, self.product_links.values())) +
+                    sys.getsizeof(self.pairs) + sys.getsizeof(self.attribute_pairs) +
+                    sum(sys.getsizeof(pair) + sys.getsizeof(ids) for pair, ids in self.pairs.items()))
+        return {'links': links, 'bytes': size, 'bytes_per_million_links': size * 1000000 // links if links else None}
+
+
+attribute_index = AttributeIndex()
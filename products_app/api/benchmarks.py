@@ -0,0 +1,225 @@
+import io
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import OperationalError
+from django.db import close_old_connections
+from django.db import connections
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from .attribute_index import attribute_index
+from .bulk import bulk_create_products
+from .bulk import get_or_create_attributes
+from .fast_serializers import fast_product_serializer
+from .models import Attribute
+from .models import Product
+from .parsers import FastJSONParser
+from .parsers import MessagePackParser
+from .renderers import FastJSONRenderer
+from .renderers import MessagePackRenderer
+from .renderers import msgpack
+from .serializers import ProductSerializer
+
+
+def best_time(func, repeat):
+    """Return the fastest of `repeat` runs of func, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def create_catalog(products, attributes_per_product):
+    """
+    Create a synthetic catalog of products, each linked to its own mix of attributes. Meant to be run in a
+    transaction that is rolled back once the benchmark is done.
+    """
+    pairs = [(f"Type {index}", f"Value {index}") for index in range(max(attributes_per_product * 4, 1))]
+    attribute_ids = get_or_create_attributes(set(pairs), {})
+    items = [Product(name=f"Benchmark product {index}", price=f"{index % 1000}.99", manufacturer="Benchmark",
+                     product_type=f"Type {index % 10}") for index in range(products)]
+    bulk_create_products(items, [[attribute_ids[pairs[(index + offset) % len(pairs)]]
+                                  for offset in range(attributes_per_product)] for index in range(products)])
+    return items
+
+
+def serializer_suite(page_sizes, repeat):
+    """
+    Time reading and serializing a page of products with ProductSerializer over prefetched model instances against the
+    fast read serializer over values() rows. Returns the column headers and a row per page size.
+    """
+    queryset = Product.objects.filter(manufacturer="Benchmark").order_by('id')
+    prefetched = queryset.prefetch_related('attributes')
+
+    rows = []
+    for page_size in page_sizes:
+        before = best_time(lambda: ProductSerializer(prefetched[:page_size], many=True).data, repeat)
+        after = best_time(lambda: fast_product_serializer.serialize(
+            fast_product_serializer.prepare(queryset)[:page_size]), repeat)
+        rows.append((page_size, f"{page_size / before:.0f}", f"{page_size / after:.0f}", f"{before / after:.1f}x"))
+    return ("page size", "ProductSerializer rows/sec", "FastReadSerializer rows/sec", "speedup"), rows
+
+
+def renderer_suite(page_sizes, repeat):
+    """
+    Time rendering a paginated page of serialized products with JSONRenderer against FastJSONRenderer, after checking
+    they write the same bytes. Returns the column headers and a row per page size.
+    """
+    queryset = fast_product_serializer.prepare(Product.objects.filter(manufacturer="Benchmark").order_by('id'))
+    renderers = JSONRenderer(), FastJSONRenderer()
+
+    rows = []
+    for page_size in page_sizes:
+        page = {"count": page_size, "next": None, "previous": None,
+                "results": fast_product_serializer.serialize(queryset[:page_size])}
+        before, after = [best_time(lambda: renderer.render(page), repeat) for renderer in renderers]
+        identical = renderers[0].render(page) == renderers[1].render(page)
+        rows.append((page_size, f"{page_size / before:.0f}", f"{page_size / after:.0f}", f"{before / after:.1f}x",
+                     "yes" if identical else "NO"))
+    return ("page size", "JSONRenderer rows/sec", "FastJSONRenderer rows/sec", "speedup", "identical"), rows
+
+
+def formats_suite(page_sizes, repeat):
+    """
+    Compare the size of a paginated page of serialized products, and the time it takes to render and parse it, as JSON
+    and as MessagePack, each with the usual layout and with layout=columns. MessagePack is left out when msgpack is not
+    installed. Returns the column headers and a row per page size and format.
+    """
+    queryset = fast_product_serializer.prepare(Product.objects.filter(manufacturer="Benchmark").order_by('id'))
+    formats = [('json', FastJSONRenderer(), FastJSONParser())]
+    if msgpack is not None:
+        formats.append(('msgpack', MessagePackRenderer(), MessagePackParser()))
+
+    rows = []
+    for page_size in page_sizes:
+        page = {"count": page_size, "next": None, "previous": None,
+                "results": fast_product_serializer.serialize(queryset[:page_size])}
+        json_size = None
+        for name, renderer, parser in formats:
+            for layout in ('', '; layout=columns'):
+                media_type = renderer.media_type + layout
+                body = renderer.render(page, media_type)
+                json_size = json_size or len(body)
+                encode = best_time(lambda: renderer.render(page, media_type), repeat)
+                decode = best_time(lambda: parser.parse(io.BytesIO(body), media_type, {'encoding': 'utf-8'}), repeat)
+                rows.append((page_size, name + (' columns' if layout else ''), len(body),
+                             f"{len(body) / json_size:.0%}", f"{encode * 1000:.2f}", f"{decode * 1000:.2f}"))
+    return ("page size", "format", "bytes", "of json", "encode ms", "decode ms"), rows
+
+
+def attribute_index_suite(page_sizes, repeat):
+    """
+    Time finding the ids of the products with one, two and three attributes by joining the link table once per
+    attribute against resolving them through the attribute index, over the whole catalog. Also reports the size of the
+    index. Returns the column headers and a row per number of attributes.
+    """
+    products = Product.objects.filter(manufacturer="Benchmark")
+    # The attributes of one product, so each combination of them matches some products.
+    pairs = list(Attribute.objects.filter(product=products.order_by('id').first()).values_list('type', 'value'))
+    attribute_index.load()
+    stats = attribute_index.stats()
+
+    rows = []
+    for conditions in range(1, min(len(pairs), 3) + 1):
+        def join():
+            queryset = products
+            for type, value in pairs[:conditions]:
+                queryset = queryset.filter(attributes__type=type, attributes__value=value)
+            return list(queryset.values_list('id', flat=True))
+
+        before = best_time(join, repeat)
+        after = best_time(lambda: list(attribute_index.resolve(pairs[:conditions])), repeat)
+        rows.append((conditions, len(join()), f"{before * 1000:.2f}", f"{after * 1000:.2f}", f"{before / after:.1f}x",
+                     stats['bytes_per_million_links']))
+    # The index now holds the catalog, which is about to be rolled back, so have the next use load it again.
+    attribute_index.loaded = False
+    return ("attributes", "matches", "SQL joins ms", "index ms", "speedup", "index bytes per million links"), rows
+
+
+def concurrency_worker(duration, write_every, product_ids, attribute_ids, results):
+    """
+    Read a page of products, and every `write_every` operations add an attribute to a product and remove it again, for
+    `duration` seconds. Connections are handled like they are around requests, closed between operations unless
+    CONN_MAX_AGE keeps them open. Puts the number of reads, writes and of operations that failed on a locked database
+    in `results`.
+    """
+    random.seed(os.getpid())
+    queryset = fast_product_serializer.prepare(Product.objects.order_by('id'))
+    reads = writes = locked = operations = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        close_old_connections()
+        operations += 1
+        try:
+            if operations % write_every == 0:
+                product, attribute_id = Product.objects.get(pk=random.choice(product_ids)), random.choice(attribute_ids)
+                product.attributes.add(attribute_id)
+                product.attributes.remove(attribute_id)
+                writes += 1
+            else:
+                fast_product_serializer.serialize(queryset.filter(id__gte=random.choice(product_ids))[:20])
+                reads += 1
+        except OperationalError:
+            locked += 1
+    connections.close_all()
+    results.put((reads, writes, locked))
+
+
+def concurrency_suite(profiles, worker_counts, duration, products, write_every):
+    """
+    Time reads and writes from 1, 4, 16... worker processes sharing a SQLite file, under each database profile of
+    API_DB_PROFILES. Every profile gets a new, migrated database file in a temporary directory, so the configured
+    database is left alone. Returns the column headers and a row per profile and number of workers.
+    """
+    connection = connections['default']
+    original = dict(connection.settings_dict)
+    context = multiprocessing.get_context('fork')
+
+    rows = []
+    try:
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(API_SQLITE_PRAGMAS=settings.API_DB_PROFILES[profile]['PRAGMAS']):
+                connection.close()
+                connection.settings_dict['NAME'] = os.path.join(directory, 'concurrency.sqlite3')
+                connection.settings_dict.update(settings.API_DB_PROFILES[profile]['DATABASE'])
+                call_command('migrate', verbosity=0)
+                with transaction.atomic():
+                    product_ids = [product.id for product in create_catalog(products, 5)]
+                attribute_ids = list(Attribute.objects.values_list('id', flat=True))
+                connections.close_all()
+
+                for workers in worker_counts:
+                    results = context.Queue()
+                    processes = [context.Process(target=concurrency_worker,
+                                                 args=(duration, write_every, product_ids, attribute_ids, results))
+                                 for _ in range(workers)]
+                    for process in processes:
+                        process.start()
+                    totals = [sum(counts) for counts in zip(*[results.get() for _ in processes])]
+                    for process in processes:
+                        process.join()
+                    rows.append((profile, workers, f"{totals[0] / duration:.0f}", f"{totals[1] / duration:.0f}",
+                                 totals[2]))
+                connection.close()
+    finally:
+        connection.settings_dict.clear()
+        connection.settings_dict.update(original)
+    return ("profile", "workers", "reads/sec", "writes/sec", "locked errors"), rows
+
+
+SUITES = {
+    'attribute_index': attribute_index_suite,
+    'formats': formats_suite,
+    'renderers': renderer_suite,
+    'serializers': serializer_suite,
+}
@@ -0,0 +1,145 @@
+import sys
+from array import array
+from bisect import bisect_left
+
+CHUNK_BITS = 16
+LOW_MASK = (1 << CHUNK_BITS) - 1
+CHUNK_BYTES = (1 << CHUNK_BITS) // 8
+# The most ids a chunk keeps as an array, past which a bitmask of CHUNK_BYTES is smaller.
+ARRAY_LIMIT = 4096
+
+
+def to_mask(lows):
+    """Return the bitmask with the bits of the low ids set."""
+    mask = bytearray(CHUNK_BYTES)
+    for low in lows:
+        mask[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(mask, 'little')
+
+
+def mask_lows(mask):
+    """Return the low ids whose bits are set in the bitmask, in order."""
+    lows = array('H')
+    for index, byte in enumerate(mask.to_bytes(CHUNK_BYTES, 'little')):
+        if byte:
+            lows.extend((index << 3) + bit for bit in range(8) if byte >> bit & 1)
+    return lows
+
+
+def compact(lows):
+    """Return the container for the sorted low ids: an array while they are few, otherwise a bitmask."""
+    return array('H', lows) if len(lows) <= ARRAY_LIMIT else to_mask(lows)
+
+
+def copy(container):
+    return container if isinstance(container, int) else array('H', container)
+
+
+def intersect(a, b):
+    if isinstance(a, int) and isinstance(b, int):
+        return a & b
+    if isinstance(a, int):
+        a, b = b, a
+    if isinstance(b, int):
+        mask = b.to_bytes(CHUNK_BYTES, 'little')
+        return array('H', (low for low in a if mask[low >> 3] >> (low & 7) & 1))
+    return array('H', sorted(set(a).intersection(b)))
+
+
+def union(a, b):
+    if isinstance(a, int) or isinstance(b, int):
+        return (a if isinstance(a, int) else to_mask(a)) | (b if isinstance(b, int) else to_mask(b))
+    return compact(sorted(set(a).union(b)))
+
+
+class Bitmap(object):
+    """
+    A compressed set of ids, laid out like a roaring bitmap. Ids are split into chunks of 65536 by their high bits and
+    each chunk keeps its low bits as a sorted array of 16 bit ints while it has up to ARRAY_LIMIT of them, and as an
+    int bitmask once it has more, so sparse and dense sets both take little memory and intersect quickly.
+    """
+    __slots__ = ('chunks',)
+
+    def __init__(self, ids=()):
+        self.chunks = {}
+        lows_by_high = {}
+        for id in sorted(ids):
+            lows_by_high.setdefault(id >> CHUNK_BITS, []).append(id & LOW_MASK)
+        for high, lows in lows_by_high.items():
+            self.chunks[high] = compact(lows)
+
+    def __contains__(self, id):
+        container = self.chunks.get(id >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = id & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        index = bisect_left(container, low)
+        return index < len(container) and container[index] == low
+
+    def add(self, id):
+        high, low = id >> CHUNK_BITS, id & LOW_MASK
+        container = self.chunks.get(high)
+        if container is None:
+            self.chunks[high] = array('H', [low])
+        elif isinstance(container, int):
+            self.chunks[high] = container | 1 << low
+        else:
+            index = bisect_left(container, low)
+            if index == len(container) or container[index] != low:
+                container.insert(index, low)
+                if len(container) > ARRAY_LIMIT:
+                    self.chunks[high] = to_mask(container)
+
+    def discard(self, id):
+        high, low = id >> CHUNK_BITS, id & LOW_MASK
+        container = self.chunks.get(high)
+        if container is None:
+            return
+        if isinstance(container, int):
+            container &= ~(1 << low)
+            self.chunks[high] = container
+        else:
+            index = bisect_left(container, low)
+            if index < len(container) and container[index] == low:
+                del container[index]
+        if not container:
+            del self.chunks[high]
+
+    def __and__(self, other):
+        result = Bitmap()
+        for high in self.chunks.keys() & other.chunks.keys():
+            container = intersect(self.chunks[high], other.chunks[high])
+            if container:
+                result.chunks[high] = container
+        return result
+
+    def __or__(self, other):
+        result = Bitmap()
+        for high in self.chunks.keys() | other.chunks.keys():
+            if high not in other.chunks:
+                result.chunks[high] = copy(self.chunks[high])
+            elif high not in self.chunks:
+                result.chunks[high] = copy(other.chunks[high])
+            else:
+                result.chunks[high] = union(self.chunks[high], other.chunks[high])
+        return result
+
+    def __iter__(self):
+        for high in sorted(self.chunks):
+            container = self.chunks[high]
+            for low in mask_lows(container) if isinstance(container, int) else container:
+                yield high << CHUNK_BITS | low
+
+    def __len__(self):
+        return sum(bin(container).count('1') if isinstance(container, int) else len(container)
+                   for container in self.chunks.values())
+
+    def __bool__(self):
+        return bool(self.chunks)
+
+    def memory_size(self):
+        """Return roughly how many bytes the bitmap takes."""
+        return sys.getsizeof(self) + sys.getsizeof(self.chunks) + sum(
+            sys.getsizeof(high) + sys.getsizeof(container) for high, container in self.chunks.items())
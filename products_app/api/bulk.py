@@ -0,0 +1,158 @@
+from django.conf import settings
+from django.db import connections
+from django.db import router
+
+from .facets import FACET_FIELDS
+from .models import Attribute
+from .models import Product
+from .signals import links_changed
+from .signals import products_created
+from .signals import products_deleted
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunk_count
+from .utils import chunked
+
+ProductAttribute = Product.attributes.through
+
+
+def get_batch_size():
+    return getattr(settings, 'API_BULK_BATCH_SIZE', 500)
+
+
+def existing_attribute_ids(attribute_ids):
+    """Return the subset of the attribute ids that exist."""
+    existing = set()
+    for chunk in chunked(set(attribute_ids), MAX_IN_CLAUSE_SIZE):
+        existing.update(Attribute.objects.filter(id__in=chunk).values_list('id', flat=True))
+    return existing
+
+
+def bulk_insert(model, objs, batch_size=None):
+    """
+    Insert the objects with batched INSERTs and set their primary keys. bulk_create sets them on the backends that
+    return ids from a bulk insert. On SQLite the newest len(objs) ids of the table are read back instead: the first
+    INSERT takes the write lock, which SQLite holds until the transaction ends, so no other connection can insert
+    between the INSERTs and the SELECT. Other backends insert the objects one at a time. Must run inside a transaction.
+    """
+    db = router.db_for_write(model)
+    connection = connections[db]
+    assert connection.in_atomic_block, "bulk_insert must run inside a transaction"
+    if connection.features.can_return_ids_from_bulk_insert:
+        return model.objects.using(db).bulk_create(objs, batch_size=batch_size or get_batch_size())
+    if connection.vendor == 'sqlite':
+        objs = model.objects.using(db).bulk_create(objs, batch_size=batch_size or get_batch_size())
+        ids = reversed(list(model.objects.using(db).order_by('-pk').values_list('pk', flat=True)[:len(objs)]))
+    else:
+        fields = [field for field in model._meta.concrete_fields if field is not model._meta.auto_field]
+        ids = [model._base_manager.using(db)._insert([obj], fields=fields, return_id=True) for obj in objs]
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+        obj._state.adding = False
+        obj._state.db = db
+    return objs
+
+
+def bulk_create_products(products, attribute_ids_by_product=None, batch_size=None):
+    """
+    Insert the unsaved products and link each of them to the attribute ids at the same index of
+    `attribute_ids_by_product`. Must run inside a transaction.
+    """
+    products = bulk_insert(Product, products, batch_size)
+    links = []
+    for product, attribute_ids in zip(products, attribute_ids_by_product or []):
+        links.extend(ProductAttribute(product_id=product.pk, attribute_id=attribute_id)
+                     for attribute_id in set(attribute_ids))
+    ProductAttribute.objects.bulk_create(links, batch_size=batch_size or get_batch_size())
+    products_created.send(sender=Product, products=products,
+                          links=[(link.product_id, link.attribute_id) for link in links])
+    return products
+
+
+def existing_product_ids(product_ids):
+    """Return the subset of the product ids that exist."""
+    existing = set()
+    for chunk in chunked(set(product_ids), MAX_IN_CLAUSE_SIZE):
+        existing.update(Product.objects.filter(id__in=chunk).values_list('id', flat=True))
+    return existing
+
+
+def bulk_delete_products(product_ids):
+    """
+    Delete the products and their links with a few set-based statements, instead of the queries per product the
+    delete signals would run. Returns how many products were deleted. Must run inside a transaction.
+    """
+    products = [(product_id, tuple(values))
+                for product_id, *values in Product.objects.filter(id__in=product_ids).values_list('id', *FACET_FIELDS)]
+    ids = [product_id for product_id, _ in products]
+    links = ProductAttribute.objects.filter(product_id__in=ids)
+    removed = list(links.values_list('product_id', 'attribute_id'))
+    links._raw_delete(links.db)
+    deleted = Product.objects.filter(id__in=ids)
+    deleted._raw_delete(deleted.db)
+    products_deleted.send(sender=Product, products=products, links=removed)
+    return len(products)
+
+
+def bulk_relink(product_ids, add_attribute_ids=(), remove_attribute_ids=(), batch_size=None):
+    """
+    Link every product to the attributes to add and unlink it from the attributes to remove, diffing against the
+    through table a chunk of products at a time. Returns how many links were created and deleted. Must run inside a
+    transaction.
+    """
+    add_attribute_ids, remove_attribute_ids = set(add_attribute_ids), set(remove_attribute_ids)
+    chunk_size = MAX_IN_CLAUSE_SIZE - max(len(add_attribute_ids), len(remove_attribute_ids))
+    created = deleted = 0
+    for chunk in chunked(sorted(set(product_ids)), chunk_size):
+        added, removed = [], []
+        if add_attribute_ids:
+            linked = set(ProductAttribute.objects.filter(product_id__in=chunk, attribute_id__in=add_attribute_ids)
+                         .values_list('product_id', 'attribute_id'))
+            added = [(product_id, attribute_id) for product_id in chunk for attribute_id in add_attribute_ids
+                     if (product_id, attribute_id) not in linked]
+            ProductAttribute.objects.bulk_create([ProductAttribute(product_id=product_id, attribute_id=attribute_id)
+                                                  for product_id, attribute_id in added],
+                                                 batch_size=batch_size or get_batch_size())
+        if remove_attribute_ids:
+            links = ProductAttribute.objects.filter(product_id__in=chunk, attribute_id__in=remove_attribute_ids)
+            removed = list(links.values_list('product_id', 'attribute_id'))
+            if removed:
+                # The links are already known, so skip the select delete() would run for the m2m_changed receivers.
+                links._raw_delete(links.db)
+        if added or removed:
+            links_changed.send(sender=Product, added=added, removed=removed)
+        created += len(added)
+        deleted += len(removed)
+    return created, deleted
+
+
+def relink_query_count(product_count, attribute_count, batch_size=None):
+    """
+    Return the most queries bulk_relink runs for that many products and attributes to add and remove. Every chunk of
+    products selects the links to add, inserts them in batches, selects and deletes the links to remove, touches the
+    products and counts the links of each attribute with at most an UPDATE, a SELECT and an INSERT.
+    """
+    chunk_size = MAX_IN_CLAUSE_SIZE - attribute_count
+    inserts = chunk_count(chunk_size * attribute_count, batch_size or get_batch_size())
+    return chunk_count(product_count, chunk_size) * (4 + inserts + 3 * attribute_count)
+
+
+def get_or_create_attributes(pairs, known=None):
+    """
+    Return a dict mapping each (type, value) pair to the id of an attribute with that type and value, inserting the
+    pairs no attribute has yet. Pairs already in `known` are not looked up again and `known` is updated with the rest,
+    so it can be carried across batches. Must run inside a transaction.
+    """
+    known = {} if known is None else known
+    missing = set(pairs) - known.keys()
+    values = {value for _, value in missing}
+    for chunk in chunked(values, MAX_IN_CLAUSE_SIZE):
+        # Newest first, so the oldest attribute wins when the same pair has been stored more than once.
+        for attribute_id, type, value in (Attribute.objects.filter(value__in=chunk).order_by('-id')
+                                          .values_list('id', 'type', 'value')):
+            if (type, value) in missing:
+                known[(type, value)] = attribute_id
+
+    attributes = bulk_insert(Attribute, [Attribute(type=type, value=value)
+                                         for type, value in sorted(missing - known.keys())])
+    known.update(((attribute.type, attribute.value), attribute.pk) for attribute in attributes)
+    return known
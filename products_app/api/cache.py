@@ -0,0 +1,158 @@
+import hashlib
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+
+class RepresentationCache(object):
+    """
+    Caches the serialized representation of single objects under their id and current version. Invalidating an object
+    gives it a new version, so stale entries are never read again and expire on their own. When the representation
+    embeds other cached objects (a product's attributes), the versions of those are stored with the entry and checked
+    on every read, so changing an attribute invalidates every product that embeds it without having to find them.
+    """
+
+    def __init__(self, name, embedded_field=None, embedded_cache=None):
+        self.name = name
+        self.embedded_field = embedded_field
+        self.embedded_cache = embedded_cache
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+    def version_key(self, pk):
+        return f"api:{self.name}:{pk}:version"
+
+    def entry_key(self, pk, version):
+        return f"api:{self.name}:{pk}:{version}"
+
+    def get_versions(self, pks):
+        """Return the current version of each object, giving the ones that have none a new version."""
+        keys = {self.version_key(pk): pk for pk in pks}
+        versions = self.cache.get_many(list(keys))
+        for key in keys.keys() - versions.keys():
+            self.cache.add(key, uuid4().hex, timeout=None)
+            versions[key] = self.cache.get(key)
+        return {keys[key]: version for key, version in versions.items()}
+
+    def get_version(self, pk):
+        return self.get_versions([pk])[pk]
+
+    def get(self, pk):
+        """
+        Return the cache entry of the object, with its representation under 'data' and its modified_at under
+        'last_modified', or None if it is not cached or out of date.
+        """
+        version = self.cache.get(self.version_key(pk))
+        entry = self.cache.get(self.entry_key(pk, version)) if version is not None else None
+        if entry is not None and entry['embedded'] and \
+                self.embedded_cache.cache.get_many(list(entry['embedded'])) != entry['embedded']:
+            entry = None
+        self._count(hit=entry is not None)
+        return entry
+
+    def set(self, pk, version, data, last_modified=None):
+        """
+        Cache the representation under the version the object had before it was read from the database, so an
+        invalidation that lands while it was being read leaves the entry unreachable rather than stale.
+        """
+        embedded = {}
+        if self.embedded_field:
+            ids = [item['id'] for item in data[self.embedded_field]]
+            embedded = {self.embedded_cache.version_key(embedded_pk): embedded_version
+                        for embedded_pk, embedded_version in self.embedded_cache.get_versions(ids).items()}
+        entry = {'data': data, 'last_modified': last_modified, 'embedded': embedded}
+        self.cache.set(self.entry_key(pk, version), entry, timeout=getattr(settings, 'API_CACHE_TIMEOUT', 300))
+
+    def invalidate(self, pks, changed_at=None):
+        """
+        Give each of the objects a new version, recording when they changed (now by default), which is the oldest
+        modified_at a representation may have to be cached under it.
+        """
+        changed_at = time.time() if changed_at is None else changed_at.timestamp()
+        self.cache.set_many({self.version_key(pk): f'{uuid4().hex}:{changed_at}' for pk in pks}, timeout=None)
+
+    def changed_after(self, version, last_modified):
+        """Tell whether the version records a change after `last_modified`, so a representation that old is stale."""
+        _, _, changed_at = version.partition(':')
+        return bool(changed_at) and last_modified is not None and last_modified.timestamp() < float(changed_at)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / lookups if lookups else None}
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+class CountCache(object):
+    """
+    Caches the number of rows matching a queryset, keyed on its SQL. A count older than API_COUNT_REFRESH_AFTER seconds
+    is still served, while a background thread counts again, so only the first request for a queryset waits on the
+    count, and at most one refresh per queryset runs at a time in each process.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.refreshing = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+    def key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        return f"api:{self.name}:{hashlib.sha1(f'{sql}|{params!r}'.encode('utf-8')).hexdigest()}"
+
+    def get_count(self, queryset):
+        """Return the number of rows in the queryset and whether it came from the cache rather than a fresh count."""
+        queryset = queryset.order_by().values('pk')
+        key = self.key(queryset)
+        entry = self.cache.get(key)
+        if entry is None:
+            return self.count(queryset, key), False
+
+        count, counted_at = entry
+        if time.time() - counted_at > getattr(settings, 'API_COUNT_REFRESH_AFTER', 60):
+            with self._lock:
+                refresh = key not in self.refreshing
+                self.refreshing.add(key)
+            if refresh:
+                self.start_refresh(lambda: self.refresh(queryset, key))
+        return count, True
+
+    def count(self, queryset, key):
+        count = queryset.count()
+        self.cache.set(key, (count, time.time()), timeout=getattr(settings, 'API_COUNT_CACHE_TIMEOUT', 3600))
+        return count
+
+    def refresh(self, queryset, key):
+        try:
+            self.count(queryset, key)
+        finally:
+            with self._lock:
+                self.refreshing.discard(key)
+            # The thread opened its own database connection, which nothing else will close.
+            connections.close_all()
+
+    def start_refresh(self, refresh):
+        threading.Thread(target=refresh, daemon=True).start()
+
+
+attribute_cache = RepresentationCache('attribute')
+product_cache = RepresentationCache('product', embedded_field='attributes', embedded_cache=attribute_cache)
+count_cache = CountCache('count')
@@ -0,0 +1,61 @@
+import csv
+import json
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .fast_serializers import fast_product_serializer
+from .serializers import ProductSerializer
+
+
+class Echo(object):
+    """A file-like object whose write returns the value written, so csv.writer can produce rows for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def get_chunk_size():
+    return getattr(settings, 'API_EXPORT_CHUNK_SIZE', 500)
+
+
+def iter_product_chunks(queryset, chunk_size=None):
+    """
+    Yield the serialized representations of the products in the queryset a chunk at a time. Products are read in id
+    order, seeking past the last id of the previous chunk, and each chunk loads its attributes with one more query,
+    so memory use depends on the chunk size rather than the size of the catalog.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    queryset = fast_product_serializer.prepare(queryset)
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id')[:chunk_size])
+        if not chunk:
+            return
+        yield fast_product_serializer.serialize(chunk)
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
+
+
+def render_ndjson(products):
+    """Yield each product as one line of JSON."""
+    for product in products:
+        yield json.dumps(product, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def render_csv(products):
+    """Yield a header row and then a row per product, with the product's attributes as a JSON list."""
+    fields = ProductSerializer.Meta.fields
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for product in products:
+        product['attributes'] = json.dumps(product['attributes'], cls=JSONEncoder, ensure_ascii=False,
+                                           separators=(',', ':'))
+        yield writer.writerow([product[field] for field in fields])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+    'csv': (render_csv, 'text/csv'),
+}
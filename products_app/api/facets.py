@@ -0,0 +1,134 @@
+from collections import Counter
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Q
+
+from .models import AttributeFacetCount
+from .models import FieldFacetCount
+from .models import Product
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunked
+
+ProductAttribute = Product.attributes.through
+
+# The product fields counted in FieldFacetCount.
+FACET_FIELDS = ('manufacturer', 'product_type')
+
+
+def key_condition(key_fields, keys):
+    """Return a Q matching the rows whose key_fields values are one of the keys."""
+    groups = defaultdict(list)
+    for key in keys:
+        groups[key[:-1]].append(key[-1])
+    return reduce(or_, (Q(**dict(zip(key_fields, prefix)), **{f"{key_fields[-1]}__in": values})
+                        for prefix, values in groups.items()))
+
+
+def apply_deltas(model, key_fields, deltas):
+    """
+    Add each delta to the count of the row whose key_fields values are its key, creating the rows that do not exist
+    yet. Rows getting the same delta are updated together, so a change to rows that already exist costs one UPDATE.
+    """
+    by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(key)
+
+    for delta, keys in by_delta.items():
+        for pending in chunked(keys, MAX_IN_CLAUSE_SIZE // len(key_fields)):
+            while pending:
+                updated = model.objects.filter(key_condition(key_fields, pending)).update(count=F('count') + delta)
+                if updated == len(pending):
+                    break
+                existing = set(model.objects.filter(key_condition(key_fields, pending)).values_list(*key_fields))
+                pending = [key for key in pending if key not in existing]
+                try:
+                    with transaction.atomic():
+                        model.objects.bulk_create([model(count=delta, **dict(zip(key_fields, key)))
+                                                   for key in pending])
+                    break
+                except IntegrityError:
+                    # Another transaction created some of the rows since the UPDATE, so go round again for them.
+                    continue
+
+
+def count_products(added=(), removed=()):
+    """Count the (manufacturer, product_type) values of the products that were added and removed."""
+    deltas = Counter()
+    for values, delta in [(values, 1) for values in added] + [(values, -1) for values in removed]:
+        for field, value in zip(FACET_FIELDS, values):
+            deltas[(field, value)] += delta
+    apply_deltas(FieldFacetCount, ('field', 'value'), deltas)
+
+
+def count_links(added=(), removed=()):
+    """Count the attribute ids of product links that were added and of product links that were removed."""
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    apply_deltas(AttributeFacetCount, ('attribute_id',), {(attribute_id,): delta
+                                                          for attribute_id, delta in deltas.items()})
+
+
+def format_facets(field_counts, attribute_counts):
+    """Return the facets response, with the values of each facet ordered from the most to the least products."""
+    facets = {field: sorted(({'value': value, 'count': count} for value, count in field_counts[field]),
+                            key=lambda facet: (-facet['count'], facet['value']))
+              for field in FACET_FIELDS}
+    facets['attributes'] = sorted(({'type': type, 'value': value, 'count': count}
+                                   for type, value, count in attribute_counts),
+                                  key=lambda facet: (-facet['count'], facet['type'], facet['value']))
+    return facets
+
+
+def stored_facets():
+    """
+    Return the facets of every product from the facet count tables. The stored counts are per attribute, so the
+    attributes sharing a type and value with another one are counted through their links instead, counting each
+    product once as queryset_facets does.
+    """
+    field_counts = defaultdict(list)
+    for field, value, count in FieldFacetCount.objects.filter(count__gt=0).values_list('field', 'value', 'count'):
+        field_counts[field].append((value, count))
+
+    groups = defaultdict(list)
+    for attribute_id, type, value, count in (AttributeFacetCount.objects.filter(count__gt=0, attribute__hidden=False)
+                                             .values_list('attribute_id', 'attribute__type', 'attribute__value',
+                                                          'count')):
+        groups[(type, value)].append((attribute_id, count))
+    totals = {key: counts[0][1] for key, counts in groups.items() if len(counts) == 1}
+    for chunk in chunked_groups([[attribute_id for attribute_id, _ in counts]
+                                 for counts in groups.values() if len(counts) > 1], MAX_IN_CLAUSE_SIZE):
+        totals.update(((type, value), count) for type, value, count in (
+            ProductAttribute.objects.filter(attribute_id__in=chunk).values_list('attribute__type', 'attribute__value')
+            .annotate(count=Count('product_id', distinct=True)).order_by()))
+    return format_facets(field_counts, [(type, value, count) for (type, value), count in totals.items()])
+
+
+def chunked_groups(groups, size):
+    """Yield the ids of the groups a chunk of at most `size` ids at a time, never splitting a group across chunks."""
+    chunk = []
+    for group in groups:
+        if chunk and len(chunk) + len(group) > size:
+            yield chunk
+            chunk = []
+        chunk.extend(group)
+    if chunk:
+        yield chunk
+
+
+def queryset_facets(queryset):
+    """Return the facets of the products in the queryset, counting each product once."""
+    product_ids = queryset.order_by().values('id')
+    products = Product.objects.filter(id__in=product_ids)
+    field_counts = {field: products.values_list(field).annotate(count=Count('id')).order_by()
+                    for field in FACET_FIELDS}
+    attribute_counts = (ProductAttribute.objects.filter(product_id__in=product_ids, attribute__hidden=False)
+                        .values_list('attribute__type', 'attribute__value')
+                        .annotate(count=Count('product_id', distinct=True)).order_by())
+    return format_facets(field_counts, attribute_counts)
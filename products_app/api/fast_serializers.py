@@ -0,0 +1,162 @@
+import decimal
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework import ISO_8601
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .serializers import AttributeSerializer
+from .serializers import ProductSerializer
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunked
+
+
+def decimal_converter(field):
+    """Return a function formatting a decimal the way the DecimalField does, with its quantize settings resolved."""
+    if field.localize or field.decimal_places is None:
+        return field.to_representation
+
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    rounding = field.rounding
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        quantized = value.quantize(exponent, rounding=rounding, context=context)
+        return '{0:f}'.format(quantized) if coerce_to_string else quantized
+    return convert
+
+
+def datetime_converter(field, current_timezone):
+    """Return a function formatting an aware datetime the way the DateTimeField does in the given time zone."""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = getattr(field, 'timezone', current_timezone)
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+class FastReadSerializer(object):
+    """
+    A read-only counterpart of a ModelSerializer that gives the same output, built straight from queryset.values()
+    rows. Every field gets a converter picked once up front, instead of DRF resolving and formatting each field of each
+    object through its field classes. The many-to-many fields listed in `nested` are read for all the rows at once,
+    with one query through the link table, and serialized by their own FastReadSerializer, which only reads the linked
+    objects matching its `conditions`.
+    """
+    converter_factories = {
+        serializers.IntegerField: lambda field: int,
+        serializers.CharField: lambda field: str,
+        serializers.DecimalField: decimal_converter,
+    }
+
+    def __init__(self, serializer_class, nested=None, conditions=None):
+        self.serializer_class = serializer_class
+        self.nested = nested or {}
+        self.conditions = conditions or {}
+        self._converters = {}
+        self._narrowed = {}
+
+    @cached_property
+    def fields(self):
+        return [(name, field) for name, field in self.serializer_class().fields.items() if not field.write_only]
+
+    @cached_property
+    def columns(self):
+        """The names of the columns the rows should have."""
+        columns = [field.source for name, field in self.fields if name not in self.nested]
+        return columns if 'id' in columns or not self.nested else columns + ['id']
+
+    def narrow(self, names):
+        """Return a serializer for just the named fields, which only reads the columns and links those need."""
+        names = frozenset(names)
+        if names not in self._narrowed:
+            serializer = FastReadSerializer(self.serializer_class,
+                                            {name: nested for name, nested in self.nested.items() if name in names},
+                                            self.conditions)
+            serializer.fields = [(name, field) for name, field in self.fields if name in names]
+            self._narrowed[names] = serializer
+        return self._narrowed[names]
+
+    def get_converters(self):
+        """Return the (name, source, converter) of each field, with None as the converter of nested fields."""
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        if current_timezone not in self._converters:
+            self._converters[current_timezone] = [
+                (name, field.source, None if name in self.nested else self.get_converter(field, current_timezone))
+                for name, field in self.fields]
+        return self._converters[current_timezone]
+
+    def get_converter(self, field, current_timezone):
+        if type(field) is serializers.DateTimeField:
+            return datetime_converter(field, current_timezone)
+        factory = self.converter_factories.get(type(field))
+        return factory(field) if factory else field.to_representation
+
+    def prepare(self, queryset, extra_columns=()):
+        """Return the queryset reading the rows to serialize, as dicts, along with any extra columns asked for."""
+        columns = self.columns + [column for column in extra_columns if column not in self.columns]
+        return queryset.prefetch_related(None).values(*columns)
+
+    def prefetch(self, rows):
+        """Return the representations of the objects linked to the rows through each nested field, by row id."""
+        return {name: self.get_nested(name, field.source, rows) for name, field in self.fields if name in self.nested}
+
+    def serialize(self, rows, nested=None):
+        """Return the representation of each of the rows, with the nested objects `prefetch` read for them if given."""
+        rows = list(rows)
+        if nested is None:
+            nested = self.prefetch(rows)
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in self.get_converters():
+                if convert is None:
+                    item[name] = nested[name].get(row['id'], [])
+                else:
+                    value = row[source]
+                    item[name] = None if value is None else convert(value)
+            data.append(item)
+        return data
+
+    def get_nested(self, name, source, rows):
+        """Return the representations of the objects linked to the rows through the `source` field, by row id."""
+        field = self.serializer_class.Meta.model._meta.get_field(source)
+        serializer = self.nested[name]
+        through = field.remote_field.through
+        source_column, target = f"{field.m2m_field_name()}_id", field.m2m_reverse_field_name()
+        ordering = [f"-{target}__{key[1:]}" if key.startswith('-') else f"{target}__{key}"
+                    for key in field.related_model._meta.ordering]
+
+        conditions = {f"{target}__{lookup}": value for lookup, value in serializer.conditions.items()}
+        pks, linked_rows = [], []
+        for ids in chunked({row['id'] for row in rows}, MAX_IN_CLAUSE_SIZE):
+            links = through.objects.filter(**{f"{source_column}__in": ids}, **conditions).order_by(
+                *ordering).values_list(source_column, *[f"{target}__{column}" for column in serializer.columns])
+            for pk, *values in links:
+                pks.append(pk)
+                linked_rows.append(dict(zip(serializer.columns, values)))
+
+        linked = defaultdict(list)
+        for pk, item in zip(pks, serializer.serialize(linked_rows)):
+            linked[pk].append(item)
+        return linked
+
+
+# Products still linked to an attribute a deletion job is unlinking leave it out, like Attribute.objects does.
+fast_attribute_serializer = FastReadSerializer(AttributeSerializer, conditions={'hidden': False})
+fast_product_serializer = FastReadSerializer(ProductSerializer, nested={'attributes': fast_attribute_serializer})
@@ -0,0 +1,98 @@
+import json
+
+from django.db.models.expressions import Expression
+from django_filters.rest_framework import CharFilter
+from django_filters.rest_framework import FilterSet
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.filters import OrderingFilter
+
+from .attribute_index import attribute_index
+from .models import Product
+
+
+def parse_attribute_pairs(request, param):
+    """Return the (type, value) pairs of each `param=Type:Value` query parameter."""
+    pairs = []
+    for raw in request.query_params.getlist(param):
+        type, separator, value = raw.partition(':')
+        if not separator or not type or not value:
+            raise ValidationError({param: [f"Expected Type:Value, got \"{raw}\"."]})
+        pairs.append((type, value))
+    return pairs
+
+
+class JSONArrayValues(Expression):
+    """
+    The ids bound as a single JSON array that SQLite's json_each reads as a table, for an `id__in` lookup whose SQL
+    and parameters stay the same size however many ids there are.
+    """
+
+    def __init__(self, values):
+        super(JSONArrayValues, self).__init__()
+        self.values = values
+
+    def as_sql(self, compiler, connection):
+        return 'SELECT value FROM json_each(%s)', [json.dumps(self.values)]
+
+
+class AttributeIndexFilterBackend(BaseFilterBackend):
+    """
+    Filters products on any number of attributes through the in-memory attribute index. Each `attribute=Type:Value`
+    must match and, when `attribute_any=Type:Value` is passed, at least one of those must match too. The index resolves
+    the product ids up front, so the rows are read by id instead of through one join of the link table per attribute.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        all_of = parse_attribute_pairs(request, 'attribute')
+        any_of = parse_attribute_pairs(request, 'attribute_any')
+        if not all_of and not any_of:
+            return queryset
+
+        product_ids = attribute_index.resolve(all_of, any_of)
+        if not product_ids:
+            return queryset.none()
+        return queryset.filter(id__in=JSONArrayValues(list(product_ids)))
+
+
+class ProductFilterSet(FilterSet):
+    """
+    The filters of the product listings. The attribute filters join the link table straight to the attribute table,
+    which skips the manager leaving out hidden attributes, so they only match attributes that are not hidden.
+    """
+    attributes__type = CharFilter(method='filter_visible_attributes')
+    attributes__value = CharFilter(method='filter_visible_attributes')
+
+    class Meta:
+        model = Product
+        fields = {
+            'name': ['exact'],
+            'price': ['exact', 'gte', 'lte'],
+            'manufacturer': ['exact', 'in'],
+            'product_type': ['exact', 'in'],
+            'release_date': ['exact', 'range'],
+            'created_at': ['exact'],
+            'modified_at': ['exact'],
+        }
+
+    def filter_visible_attributes(self, queryset, name, value):
+        return queryset.filter(**{name: value, 'attributes__hidden': False})
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    Orders on one of the view's `ordering_fields`, e.g. `ordering=-price`, each of which should have an index. Only
+    one field is taken, with the id in the same direction to break ties, so SQLite walks the field's index (which
+    holds the rowid) in order instead of sorting the result in a temporary B-tree. Anything else is rejected.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        param = request.query_params.get(self.ordering_param, '').strip()
+        if not param:
+            return self.get_default_ordering(view)
+
+        valid_fields = [item[0] for item in self.get_valid_fields(queryset, view, {'request': request})]
+        if param.lstrip('-') not in valid_fields:
+            raise ValidationError({self.ordering_param: [f"Cannot order by \"{param}\", expected one of "
+                                                         f"{', '.join(valid_fields)}, optionally prefixed with -."]})
+        return [param, '-id' if param.startswith('-') else 'id']
@@ -0,0 +1,106 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db import transaction
+from django.utils import timezone
+
+from .bulk import bulk_delete_products
+from .bulk import bulk_relink
+from .cache import attribute_cache
+from .models import Attribute
+from .models import DeletionJob
+from .models import Product
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+ProductAttribute = Product.attributes.through
+
+
+def get_batch_size():
+    """The most links unlinked, or products deleted, per transaction of a deletion job."""
+    return getattr(settings, 'API_DELETION_BATCH_SIZE', 500)
+
+
+def delete_attribute_later(attribute):
+    """
+    Hide the attribute and create the job deleting it. Hiding it is a single UPDATE, which skips the post_save receiver
+    that would touch every product linked to it; the products are touched a batch at a time as they are unlinked.
+    """
+    hidden_at = timezone.now()
+    Attribute.all_objects.filter(pk=attribute.pk).update(hidden=True, modified_at=hidden_at)
+    attribute_cache.invalidate([attribute.pk], hidden_at)
+    transaction.on_commit(lambda: attribute_cache.invalidate([attribute.pk], hidden_at))
+    return create_job(DeletionJob.ATTRIBUTE, [attribute.pk],
+                      ProductAttribute.objects.filter(attribute_id=attribute.pk).count())
+
+
+def delete_products_later(product_ids):
+    """Create the job deleting the products."""
+    return create_job(DeletionJob.PRODUCTS, sorted(product_ids), len(product_ids))
+
+
+def create_job(kind, target_ids, total):
+    job = DeletionJob.objects.create(kind=kind, target_ids=json.dumps(target_ids), total=total)
+    transaction.on_commit(lambda: start_job(job.pk))
+    return job
+
+
+def start_job(job_id):
+    """Run the job in a thread of its own, so the request that created it does not wait for it."""
+    if getattr(settings, 'API_DELETION_JOBS_IN_BACKGROUND', True):
+        threading.Thread(target=run_job_and_close, args=(job_id,), daemon=True).start()
+
+
+def run_job_and_close(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # The thread opened its own database connection, which nothing else will close.
+        connections.close_all()
+
+
+def run_job(job_id):
+    """
+    Run the job a batch at a time until it is done, committing each batch along with the job's progress. Running a job
+    again, after its process died or once it failed, picks up with whatever is left to delete.
+    """
+    job = DeletionJob.objects.get(pk=job_id)
+    job.status, job.error = DeletionJob.RUNNING, ''
+    job.save(update_fields=['status', 'error', 'modified_at'])
+    step = delete_attribute_batch if job.kind == DeletionJob.ATTRIBUTE else bulk_delete_products
+    try:
+        for batch in iter_batches(job):
+            with transaction.atomic():
+                job.processed += step(batch)
+                job.save(update_fields=['processed', 'modified_at'])
+    except Exception as error:
+        logger.exception("Deletion job %s failed", job.pk)
+        job.status, job.error = DeletionJob.FAILED, str(error)
+    else:
+        job.status = DeletionJob.DONE
+    job.save(update_fields=['status', 'error', 'modified_at'])
+    return job
+
+
+def iter_batches(job):
+    """Yield what each batch of the job deletes: an attribute id over and over until it is gone, or product ids."""
+    target_ids = json.loads(job.target_ids)
+    if job.kind == DeletionJob.ATTRIBUTE:
+        while Attribute.all_objects.filter(pk=target_ids[0]).exists():
+            yield target_ids[0]
+    else:
+        yield from chunked(target_ids, get_batch_size())
+
+
+def delete_attribute_batch(attribute_id):
+    """Unlink the attribute from a batch of its products, or delete it once it has none left."""
+    product_ids = list(ProductAttribute.objects.filter(attribute_id=attribute_id)
+                       .values_list('product_id', flat=True)[:get_batch_size()])
+    if not product_ids:
+        Attribute.all_objects.filter(pk=attribute_id).delete()
+        return 0
+    return bulk_relink(product_ids, remove_attribute_ids=[attribute_id])[1]
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from api.benchmarks import SUITES
+from api.benchmarks import create_catalog
+
+
+class Command(BaseCommand):
+    help = ("Runs one of the benchmark suites in api/benchmarks.py against a synthetic catalog. The catalog is created "
+            "in a transaction that is rolled back afterwards, so the database is left as it was.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('suite', choices=sorted(SUITES), help="The benchmark suite to run.")
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[10, 100, 1000],
+                            help="The number of rows per request or page to time.")
+        parser.add_argument('--attributes', type=int, default=5, help="The number of attributes per product.")
+        parser.add_argument('--repeat', type=int, default=5, help="The number of runs to take the fastest of.")
+
+    def handle(self, *args, **options):
+        if min(options['page_sizes']) < 1 or options['repeat'] < 1 or options['attributes'] < 0:
+            raise CommandError("--page-sizes and --repeat must be at least 1, --attributes at least 0.")
+
+        with transaction.atomic():
+            create_catalog(max(options['page_sizes']), options['attributes'])
+            headers, rows = SUITES[options['suite']](options['page_sizes'], options['repeat'])
+            transaction.set_rollback(True)
+
+        widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+        for row in [headers] + rows:
+            self.stdout.write("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
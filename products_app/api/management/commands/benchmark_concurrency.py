@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connections
+
+from api.benchmarks import concurrency_suite
+
+
+class Command(BaseCommand):
+    help = ("Times reads and writes from several worker processes sharing a SQLite database, under each database "
+            "profile. Every profile runs against a new database file in a temporary directory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', default=sorted(settings.API_DB_PROFILES),
+                            choices=sorted(settings.API_DB_PROFILES), help="The database profiles to compare.")
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16],
+                            help="The numbers of worker processes to time.")
+        parser.add_argument('--duration', type=float, default=5, help="How many seconds to time each run for.")
+        parser.add_argument('--products', type=int, default=2000, help="The number of products in the catalog.")
+        parser.add_argument('--write-every', type=int, default=5,
+                            help="Have one operation out of this many write instead of read.")
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("The concurrency benchmark only runs against SQLite.")
+        if min(options['workers']) < 1 or options['duration'] <= 0 or options['products'] < 1 or \
+                options['write_every'] < 1:
+            raise CommandError("--workers, --products and --write-every must be at least 1, --duration above 0.")
+
+        headers, rows = concurrency_suite(options['profiles'], options['workers'], options['duration'],
+                                          options['products'], options['write_every'])
+        widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+        for row in [headers] + rows:
+            self.stdout.write("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
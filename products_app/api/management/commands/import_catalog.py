@@ -0,0 +1,88 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from api.bulk import bulk_create_products
+from api.bulk import get_or_create_attributes
+from api.models import ImportCheckpoint
+from api.models import Product
+from api.serializers import ProductSerializer
+
+
+class Command(BaseCommand):
+    help = ("Imports products from a newline delimited JSON file, one product per line with an optional list of "
+            "{\"type\", \"value\"} attributes. Attributes are deduplicated on type and value, every batch is "
+            "committed in its own transaction and --resume continues after the last committed batch.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The newline delimited JSON file to import.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="The number of lines per transaction.")
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue from the last batch committed by an earlier import of the same file.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        path = os.path.abspath(options['path'])
+        if not os.path.isfile(path):
+            raise CommandError(f"{path} does not exist.")
+
+        self.checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=path)
+        if not options['resume']:
+            self.checkpoint.offset = self.checkpoint.line_number = 0
+        elif self.checkpoint.line_number:
+            self.stdout.write(f"Resuming after line {self.checkpoint.line_number}")
+
+        self.validator = ProductSerializer()
+        self.attribute_ids = {}
+        self.imported = self.skipped = 0
+        self.started = time.monotonic()
+
+        batch = []
+        offset, line_number = self.checkpoint.offset, self.checkpoint.line_number
+        with open(path, 'rb') as catalog:
+            catalog.seek(offset)
+            for line in catalog:
+                offset += len(line)
+                line_number += 1
+                if line.strip():
+                    batch.append((line_number, line))
+                if len(batch) >= options['batch_size']:
+                    self.import_batch(batch, offset, line_number)
+                    batch = []
+        self.import_batch(batch, offset, line_number)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.imported} products, skipped {self.skipped} invalid lines"))
+
+    def import_batch(self, batch, offset, line_number):
+        """Import the batch's products and move the checkpoint past it in a single transaction."""
+        products, attribute_pairs = [], []
+        for number, line in batch:
+            try:
+                item = json.loads(line.decode('utf-8'))
+                attributes = (item.pop('attributes', None) if isinstance(item, dict) else None) or []
+                pairs = [(str(attribute['type']), str(attribute['value'])) for attribute in attributes]
+                products.append(Product(**self.validator.run_validation(item)))
+                attribute_pairs.append(pairs)
+            except (ValueError, TypeError, KeyError, ValidationError) as error:
+                self.skipped += 1
+                self.stderr.write(f"Skipping line {number}: {getattr(error, 'detail', error)}")
+
+        with transaction.atomic():
+            self.attribute_ids = get_or_create_attributes(
+                {pair for pairs in attribute_pairs for pair in pairs}, self.attribute_ids)
+            bulk_create_products(products, [[self.attribute_ids[pair] for pair in pairs]
+                                            for pairs in attribute_pairs])
+            self.checkpoint.offset, self.checkpoint.line_number = offset, line_number
+            self.checkpoint.save()
+
+        self.imported += len(products)
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(f"Line {line_number}: {self.imported} products imported, "
+                          f"{self.imported / elapsed if elapsed else 0:.0f} rows/sec")
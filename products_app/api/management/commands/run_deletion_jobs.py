@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import run_job
+from api.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = ("Runs the deletion jobs that have not finished, such as those whose worker process stopped while running "
+            "them. Each job picks up with whatever it has left to delete.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help="Also run the jobs that failed.")
+
+    def handle(self, *args, **options):
+        statuses = [DeletionJob.PENDING, DeletionJob.RUNNING]
+        if options['retry_failed']:
+            statuses.append(DeletionJob.FAILED)
+        for job_id in DeletionJob.objects.filter(status__in=statuses).order_by('id').values_list('id', flat=True):
+            job = run_job(job_id)
+            self.stdout.write(f"{job}" + (f" ({job.error})" if job.error else ""))
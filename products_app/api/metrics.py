@@ -0,0 +1,283 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from time import time
+
+from django.conf import settings
+from django.db import connections
+
+from .cache import attribute_cache
+from .cache import product_cache
+from .mixins import QueryCounter
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows, where there are no prefork servers
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+HELP = {
+    'api_requests_total': ('counter', "Requests answered, by url name, method and status code."),
+    'api_request_duration_seconds': ('histogram', "Time taken to answer a request, by url name and method."),
+    'api_request_queries': ('histogram', "Database queries run by a request, by url name and method."),
+    'api_cache_hits_total': ('counter', "Detail cache lookups answered from the cache."),
+    'api_cache_misses_total': ('counter', "Detail cache lookups that had to read the database."),
+    'api_cache_hit_ratio': ('gauge', "Share of the detail cache lookups answered from the cache."),
+}
+
+
+class MetricsRegistry(object):
+    """
+    The counters and histograms of this worker process. With API_METRICS_DIR set, every worker writes a snapshot of
+    its metrics to a file of its own there at most every API_METRICS_FLUSH_INTERVAL seconds and when it exits, and
+    `collect` adds up the snapshots of all of them, so every prefork worker's requests are counted whichever worker
+    answers the scrape. A snapshot file is named after the worker's pid and an id of its own, so a worker that gets
+    the pid of one that has exited does not overwrite its counts. The snapshots of workers that have exited are folded
+    into the archive total, so the counters never go down and the files do not pile up.
+    """
+    archive_name = 'archive.json'
+
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.flushed_at = 0.0
+        self.worker_pid = None
+        self.worker_id = None
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self.counters[(name, labels)] += amount
+
+    def observe(self, name, labels, buckets, value):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = {'buckets': list(buckets),
+                                                               'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram['counts'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), dict(histogram, counts=list(histogram['counts']))]
+                          for (name, labels), histogram in self.histograms.items()]
+        for cache in (product_cache, attribute_cache):
+            stats = cache.stats()
+            counters.append(['api_cache_hits_total', [['cache', cache.name]], stats['hits']])
+            counters.append(['api_cache_misses_total', [['cache', cache.name]], stats['misses']])
+        return {'counters': counters, 'histograms': histograms}
+
+    def get_directory(self):
+        return getattr(settings, 'API_METRICS_DIR', None)
+
+    def get_worker_name(self):
+        """Return the name of this worker's snapshot file, with a new id in a process forked from the one before."""
+        if self.worker_pid != os.getpid():
+            self.worker_pid, self.worker_id = os.getpid(), uuid.uuid4().hex
+        return f'worker-{self.worker_pid}-{self.worker_id}.json'
+
+    def flush(self, force=False):
+        """Write this worker's snapshot to API_METRICS_DIR, if it is set and the last one is old enough."""
+        directory = self.get_directory()
+        if not directory or not force and time() - self.flushed_at < getattr(settings, 'API_METRICS_FLUSH_INTERVAL', 1):
+            return
+        self.flushed_at = time()
+        os.makedirs(directory, exist_ok=True)
+        write_snapshot(os.path.join(directory, self.get_worker_name()), self.snapshot())
+
+    def collect(self):
+        """Return the snapshots of every worker added up, or this worker's alone without API_METRICS_DIR."""
+        directory = self.get_directory()
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        # Under the lock, no scrape reads a snapshot that another one is folding into the archive.
+        with locked(os.path.join(directory, 'metrics.lock')):
+            archive = self.fold_exited_workers(directory)
+            snapshots = [archive]
+            for path in glob.glob(os.path.join(directory, 'worker-*.json')):
+                if os.path.basename(path) not in archive['folded']:
+                    snapshots.append(read_snapshot(path))
+        return merge(snapshot for snapshot in snapshots if snapshot is not None)
+
+    def fold_exited_workers(self, directory):
+        """
+        Add the snapshots of the workers that have exited to the archive total, and remove them. The archive names the
+        files it has folded until they are gone, so a scrape that stops between the two does not count them twice.
+        """
+        archive_path = os.path.join(directory, self.archive_name)
+        archive = read_snapshot(archive_path) or {'counters': [], 'histograms': [], 'folded': []}
+        paths = glob.glob(os.path.join(directory, 'worker-*.json'))
+        folded = [name for name in archive.get('folded', []) if os.path.join(directory, name) in paths]
+        exited = [path for path in paths if os.path.basename(path) not in folded and
+                  not worker_is_running(get_worker_pid(path))]
+        if exited:
+            snapshots = [archive] + [read_snapshot(path) for path in exited]
+            folded += [os.path.basename(path) for path in exited]
+            archive = dict(merge(snapshot for snapshot in snapshots if snapshot is not None), folded=folded)
+            write_snapshot(archive_path, archive)
+        for name in folded:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        return dict(archive, folded=folded)
+
+
+def read_snapshot(path):
+    """Return the snapshot in the file, or None when it is gone or cannot be read."""
+    try:
+        with open(path) as snapshot:
+            return json.load(snapshot)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(path, snapshot):
+    # Written to a temporary file and renamed, so a scrape never reads half a snapshot.
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on the file for the block, where there are file locks."""
+    with open(path, 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def get_worker_pid(path):
+    """Return the pid in the name of a worker's snapshot file, "worker-<pid>-<id>.json"."""
+    try:
+        return int(os.path.basename(path)[len('worker-'):].split('-')[0].split('.')[0])
+    except ValueError:
+        return None
+
+
+def worker_is_running(pid):
+    """Tell whether a process with the pid is running, taking files without a pid for running workers."""
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge(snapshots):
+    counters, histograms = defaultdict(float), {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key not in histograms:
+                histograms[key] = dict(histogram, counts=list(histogram['counts']))
+            else:
+                total = histograms[key]
+                total['counts'] = [left + right for left, right in zip(total['counts'], histogram['counts'])]
+                total['sum'] += histogram['sum']
+                total['count'] += histogram['count']
+    return {'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': [[name, labels, histogram] for (name, labels), histogram in histograms.items()]}
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(snapshot):
+    """Return the snapshot in the Prometheus text exposition format."""
+    samples = defaultdict(list)
+    for name, labels, value in snapshot['counters']:
+        samples[name].append(f'{name}{format_labels(labels)} {format_number(value)}')
+    for name, labels, histogram in snapshot['histograms']:
+        cumulative = 0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            cumulative += count
+            bucket_labels = list(labels) + [['le', format_number(bound)]]
+            samples[name].append(f'{name}_bucket{format_labels(bucket_labels)} {cumulative}')
+        samples[name].append(f'{name}_bucket{format_labels(list(labels) + [["le", "+Inf"]])} {histogram["count"]}')
+        samples[name].append(f'{name}_sum{format_labels(labels)} {format_number(histogram["sum"])}')
+        samples[name].append(f'{name}_count{format_labels(labels)} {histogram["count"]}')
+
+    hits, misses = defaultdict(float), defaultdict(float)
+    for name, labels, value in snapshot['counters']:
+        if name in ('api_cache_hits_total', 'api_cache_misses_total'):
+            (hits if name == 'api_cache_hits_total' else misses)[dict(labels)['cache']] += value
+    for cache in sorted(hits):
+        lookups = hits[cache] + misses[cache]
+        if lookups:
+            samples['api_cache_hit_ratio'].append(
+                f'api_cache_hit_ratio{format_labels([["cache", cache]])} {format_number(hits[cache] / lookups)}')
+
+    lines = []
+    for name in sorted(samples):
+        kind, description = HELP[name]
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}'] + sorted(samples[name])
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, force=True)
+
+
+class MetricsMiddleware(object):
+    """
+    Counts every request to a named route by url name, method and status code, and adds its duration and number of
+    queries to histograms, for the metrics/ route to export.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        wrapped = list(connections.all())
+        for connection in wrapped:
+            connection.execute_wrappers.append(counter)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            for connection in wrapped:
+                if counter in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(counter)
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match is not None and match.url_name else 'unmatched'
+        labels = (('url_name', url_name), ('method', request.method))
+        registry.inc('api_requests_total', labels + (('status', str(response.status_code)),))
+        registry.observe('api_request_duration_seconds', labels, LATENCY_BUCKETS, perf_counter() - started)
+        registry.observe('api_request_queries', labels, QUERY_BUCKETS, counter.count)
+        registry.flush()
+        return response
@@ -0,0 +1,65 @@
+# Generated by Django 2.0.2 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['type', 'value'], name='attribute_type_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['value'], name='attribute_value_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['created_at'], name='attribute_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['modified_at'], name='attribute_modified_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name'], name='product_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['manufacturer'], name='product_manufacturer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_type'], name='product_product_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['release_date'], name='product_release_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at'], name='product_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['modified_at'], name='product_modified_at_idx'),
+        ),
+        # The auto-created through table's attribute_id index has to go back to the table for every product id it
+        # finds, while this one answers attribute to product lookups (attributes__type/value filters) on its own.
+        # Given as lists, which RunSQL runs statement by statement without needing sqlparse to split them.
+        migrations.RunSQL(
+            ['CREATE INDEX "product_attributes_reverse_idx" '
+             'ON "api_product_attributes" ("attribute_id", "product_id")'],
+            reverse_sql=['DROP INDEX "product_attributes_reverse_idx"'],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.0.2 on 2026-10-18 11:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='attribute',
+            options={'ordering': ('id',)},
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.0.2 on 2026-10-18 12:05
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_facets(apps, schema_editor):
+    """Fill the facet counts in from the products that already exist."""
+    Product = apps.get_model('api', 'Product')
+    FieldFacetCount = apps.get_model('api', 'FieldFacetCount')
+    AttributeFacetCount = apps.get_model('api', 'AttributeFacetCount')
+
+    for field in ('manufacturer', 'product_type'):
+        FieldFacetCount.objects.bulk_create(
+            FieldFacetCount(field=field, value=row[field], count=row['count'])
+            for row in Product.objects.values(field).annotate(count=Count('id')).order_by())
+    AttributeFacetCount.objects.bulk_create(
+        AttributeFacetCount(attribute_id=row['attribute_id'], count=row['count'])
+        for row in Product.attributes.through.objects.values('attribute_id').annotate(count=Count('id')).order_by())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_attribute_ordering'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FieldFacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=32)),
+                ('value', models.CharField(max_length=255)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='fieldfacetcount',
+            unique_together={('field', 'value')},
+        ),
+        migrations.CreateModel(
+            name='AttributeFacetCount',
+            fields=[
+                ('attribute', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                   serialize=False, to='api.Attribute')),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
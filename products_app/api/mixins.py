@@ -0,0 +1,405 @@
+import hashlib
+import json
+import logging
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+from calendar import timegm
+from contextlib import ExitStack
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.utils.http import quote_etag
+from rest_framework import permissions
+from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Tombstone
+from .routers import reading_from
+from .routers import remember_write
+from .routers import replica_reads_allowed
+from .routers import wrote_recently
+from .timing import timed
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunked
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter(object):
+    """
+    An execute wrapper that counts the queries run against a connection while it is installed. Savepoint statements
+    are left out, as how many of them run depends on how deeply the request is nested in transactions.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMixin(object):
+    """
+    Lets a view declare the maximum number of queries a single request to it may run. The budget covers every HTTP
+    method the view supports, so it should be set to the cost of the most expensive one. Requests that go over budget
+    are logged when API_ENFORCE_QUERY_BUDGETS (defaults to DEBUG) is on, and the test suite fails on them.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        with self.checking_query_budget(request):
+            return super(QueryBudgetMixin, self).dispatch(request, *args, **kwargs)
+
+    @contextmanager
+    def checking_query_budget(self, request):
+        """Count the queries the block runs, and log them if they go over the view's budget."""
+        if self.query_budget is None or not getattr(settings, 'API_ENFORCE_QUERY_BUDGETS', settings.DEBUG):
+            yield
+            return
+
+        counter = QueryCounter()
+        # Every database the block may read from or write to, the replicas included, counts against the budget.
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            yield
+
+        if counter.count > self.query_budget:
+            logger.warning("%s %s ran %d queries, over the %s budget of %d", request.method, request.path,
+                           counter.count, self.__class__.__name__, self.query_budget)
+
+
+def serialize_rows(request, serializer, rows):
+    """Return the representations of the rows from the fast serializer, timing the nested objects' loads apart."""
+    with timed(request, 'prefetch'):
+        nested = serializer.prefetch(rows)
+    with timed(request, 'serialize'):
+        return serializer.serialize(rows, nested)
+
+
+class ServerTimingMixin(object):
+    """
+    Marks the filtering and the fetch of the page of a request as phases for ServerTimingMiddleware, which only times a
+    sample of the requests. The count, the nested objects' loads, the serialization and the conditional GET validators
+    are marked where they run. `timing_overhead_budget` is how many milliseconds timing a request to the view may cost
+    before the middleware samples it less often.
+    """
+    timing_overhead_budget = None
+
+    def filter_queryset(self, queryset):
+        with timed(self.request, 'filter'):
+            return super(ServerTimingMixin, self).filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        with timed(self.request, 'fetch'):
+            return super(ServerTimingMixin, self).paginate_queryset(queryset)
+
+
+class ReplicaRoutingMixin(object):
+    """
+    Lets requests with one of the view's `replica_methods` read from a replica, unless the client wrote within the
+    read-your-writes window. Requests with any other unsafe method are taken to write, and open the window for the
+    client. Reads outside of requests, and of views without `replica_methods`, stay on the primary.
+    """
+    replica_methods = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        replica = request.method in self.replica_methods and not wrote_recently(request)
+        with reading_from(replica):
+            response = super(ReplicaRoutingMixin, self).dispatch(request, *args, **kwargs)
+        if request.method not in permissions.SAFE_METHODS and request.method not in self.replica_methods:
+            remember_write(response)
+        return response
+
+
+class CachedRetrieveMixin(object):
+    """
+    Serves retrieve from the view's representation_cache, reading and serializing the object only on a miss. The
+    cache is invalidated by the receivers in api/signals.py.
+    """
+    representation_cache = None
+
+    def get_cache_entry(self):
+        """Return the cache entry of the requested object, looking it up at most once per request."""
+        if not hasattr(self, '_cache_entry'):
+            self._cache_entry = self.representation_cache.get(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        return self._cache_entry
+
+    def retrieve(self, request, *args, **kwargs):
+        entry = self.get_cache_entry()
+        if entry is not None:
+            return Response(entry['data'])
+
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        version = self.representation_cache.get_version(pk)
+        data, last_modified = self.get_representation()
+        # A replica may not have caught up with the write that invalidated the entry yet, in which case the row it gave
+        # is older than the change the version records, and caching it would keep it past the invalidation.
+        if not replica_reads_allowed() or not self.representation_cache.changed_after(version, last_modified):
+            self.representation_cache.set(pk, version, data, last_modified=last_modified)
+        return Response(data)
+
+    def get_representation(self):
+        """Return the representation of the requested object and its modified_at."""
+        instance = self.get_object()
+        return self.get_serializer(instance).data, instance.modified_at
+
+
+class FilterOnceMixin(object):
+    """
+    Filters the view's queryset at most once per request, however many of the mixins read it, as a filter backend
+    may do real work up front, like resolving attribute filters through the attribute index.
+    """
+
+    def get_filtered_queryset(self):
+        if not hasattr(self, '_filtered_queryset'):
+            self._filtered_queryset = self.filter_queryset(self.get_queryset())
+        return self._filtered_queryset
+
+
+class FastReadMixin(FilterOnceMixin):
+    """
+    Serves list, and the representation CachedRetrieveMixin caches, from the view's fast_serializer. It reads
+    queryset.values() rows instead of model instances and gives the same output as the view's serializer_class.
+    """
+    fast_serializer = None
+
+    def get_fast_serializer(self):
+        return self.fast_serializer
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_fast_serializer()
+        # The pagination reads the position of a page from these, whichever fields are serialized.
+        extra_columns = ['id'] + ([self.keyset_sort_key] if getattr(self, 'keyset_sort_key', None) else [])
+        queryset = serializer.prepare(self.get_filtered_queryset(), extra_columns)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            with timed(request, 'fetch'):
+                page = list(queryset)
+            return Response(serialize_rows(request, serializer, page))
+        return self.get_paginated_response(serialize_rows(request, serializer, page))
+
+    def get_representation(self):
+        serializer = self.get_fast_serializer()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = serializer.prepare(self.get_filtered_queryset(), ['modified_at'])
+        with timed(self.request, 'fetch'):
+            row = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, row)
+        return serialize_rows(self.request, serializer, [row])[0], row['modified_at']
+
+
+class BatchRetrieveMixin(object):
+    """
+    Reads the objects whose ids are posted as {"ids": [...]} with the view's fast_serializer, a chunk of ids per query,
+    and returns their representations in the order the ids were given along with the ids that do not exist.
+    """
+
+    def batch_retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+
+        fast_serializer = self.get_fast_serializer()
+        queryset = fast_serializer.prepare(self.filter_queryset(self.get_queryset()), ['id'])
+        rows = []
+        with timed(request, 'fetch'):
+            for chunk in chunked(list(dict.fromkeys(ids)), MAX_IN_CLAUSE_SIZE):
+                rows.extend(queryset.filter(id__in=chunk))
+        found = {row['id']: item for row, item in zip(rows, serialize_rows(request, fast_serializer, rows))}
+        return Response({'results': [found[pk] for pk in ids if pk in found],
+                         'missing_ids': [pk for pk in dict.fromkeys(ids) if pk not in found]})
+
+
+class SparseFieldsetMixin(object):
+    """
+    Lets list and retrieve requests pick the fields they need with `fields=id,name,price`. Many-to-many fields are
+    only read when they are picked too, or asked for with `expand=attributes`. The view's fast_serializer is narrowed
+    to those fields, so the query only selects their columns. Cached representations are narrowed instead.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+
+    def get_field_names(self):
+        """Return the names of the fields the request asks for, or None when it asks for all of them."""
+        fields = self.request.query_params.get(self.fields_query_param)
+        expand = self.request.query_params.get(self.expand_query_param)
+        if fields is None and expand is None:
+            return None
+
+        available = [name for name, field in self.fast_serializer.fields]
+        names = {name.strip() for name in fields.split(',') if name.strip()} if fields is not None else set(available)
+        expanded = {name.strip() for name in (expand or '').split(',') if name.strip()}
+        errors = {}
+        if not names:
+            errors[self.fields_query_param] = ["Name at least one field."]
+        elif names - set(available):
+            errors[self.fields_query_param] = [f"Unknown fields: {', '.join(sorted(names - set(available)))}. "
+                                               f"Choose from {', '.join(available)}."]
+        if expanded - set(self.fast_serializer.nested):
+            errors[self.expand_query_param] = [f"Only {', '.join(self.fast_serializer.nested)} can be expanded."]
+        if errors:
+            raise ValidationError(errors)
+        return names | expanded
+
+    def get_fast_serializer(self):
+        names = self.get_field_names()
+        return self.fast_serializer if names is None else self.fast_serializer.narrow(names)
+
+    def retrieve(self, request, *args, **kwargs):
+        names = self.get_field_names()
+        if names is None:
+            return super(SparseFieldsetMixin, self).retrieve(request, *args, **kwargs)
+
+        entry = self.get_cache_entry() if hasattr(self, 'get_cache_entry') else None
+        if entry is not None:
+            return Response({name: value for name, value in entry['data'].items() if name in names})
+        return Response(self.get_representation()[0])
+
+
+class ConditionalGetMixin(FilterOnceMixin):
+    """
+    Answers list and retrieve requests carrying If-None-Match or If-Modified-Since with a 304 when nothing they cover
+    has changed, without reading or serializing the objects. The validators are the latest modified_at of the
+    requested objects and their count, which also changes when one of them is deleted. They come from one aggregate
+    query, or for retrieve from the view's cache entry when it has an up to date one. The ETag also covers the query
+    string and the Accept header, as both change the representation.
+    """
+
+    def list(self, request, *args, **kwargs):
+        state = self.get_validators(self.get_filtered_queryset())
+        return self.conditional_response(request, state,
+                                         lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        respond = lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)  # noqa: E731
+        entry = self.get_cache_entry() if hasattr(self, 'get_cache_entry') else None
+        if entry is not None:
+            state = {'last_modified': entry['last_modified'], 'count': 1}
+        else:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            state = self.get_validators(
+                self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}))
+            if not state['count']:
+                return respond()
+        return self.conditional_response(request, state, respond)
+
+    def get_validators(self, queryset):
+        with timed(self.request, 'validators'):
+            return queryset.order_by().aggregate(last_modified=Max('modified_at'), count=Count('pk'))
+
+    def conditional_response(self, request, state, respond):
+        last_modified = timegm(state['last_modified'].utctimetuple()) if state['last_modified'] else None
+        etag = quote_etag(hashlib.sha1("|".join([
+            request.get_full_path(), request.META.get('HTTP_ACCEPT', ''),
+            state['last_modified'].isoformat() if state['last_modified'] else '', str(state['count']),
+        ]).encode('utf-8')).hexdigest())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified) or respond()
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class ChangeFeedMixin(object):
+    """
+    Lists the objects changed and deleted after a (modified_at, id) cursor, oldest first, as entries with the object's
+    representation from the view's fast_serializer or, for deleted objects, a tombstone. Every page links to the next
+    one with a new cursor, and the last one links to where to poll from, so a consumer syncs in time proportional to
+    what changed. Changes younger than API_CHANGE_FEED_SETTLE seconds are left for a later page, so a transaction that
+    committed after a later one, but with an older modified_at, is not skipped. Objects whose `hidden_field` is set are
+    listed as deleted.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = 'Invalid cursor'
+    tombstone_kind = None
+    hidden_field = None
+
+    def changes(self, request, *args, **kwargs):
+        position = self.decode_cursor(request)
+        limit = self.get_limit(request)
+        settled = timezone.now() - timedelta(seconds=getattr(settings, 'API_CHANGE_FEED_SETTLE', 2))
+
+        serializer = self.get_fast_serializer()
+        extra_columns = ['id', 'modified_at'] + ([self.hidden_field] if self.hidden_field else [])
+        rows = serializer.prepare(self.after(self.get_queryset().filter(modified_at__lte=settled), 'modified_at', 'id',
+                                             position), extra_columns)
+        tombstones = self.after(Tombstone.objects.filter(kind=self.tombstone_kind, deleted_at__lte=settled),
+                                'deleted_at', 'object_id', position).values_list('deleted_at', 'object_id')
+
+        entries = sorted([(row['modified_at'], row['id'], row) for row in rows[:limit + 1]] +
+                         [(deleted_at, object_id, None) for deleted_at, object_id in tombstones[:limit + 1]],
+                         key=lambda entry: entry[:2])
+        has_more, entries = len(entries) > limit, entries[:limit]
+        live = [row for _, _, row in entries if row is not None and not (self.hidden_field and row[self.hidden_field])]
+        representations = dict(zip((row['id'] for row in live), serialize_rows(request, serializer, live)))
+
+        date_field = serializers.DateTimeField()
+        results = [{'id': pk, 'deleted': False, 'object': representations[pk]} if pk in representations else
+                   {'id': pk, 'deleted': True, 'deleted_at': date_field.to_representation(changed_at)}
+                   for changed_at, pk, _ in entries]
+        if entries:
+            position = entries[-1][:2]
+        return Response({'next': self.encode_cursor(request, position, limit), 'has_more': has_more,
+                         'results': results})
+
+    def after(self, queryset, time_field, id_field, position):
+        """Return the queryset ordered on (time_field, id_field) and starting after the position, when there is one."""
+        queryset = queryset.order_by(time_field, id_field)
+        if position is None:
+            return queryset
+        changed_at, pk = position
+        # Rather than (time > t OR time = t AND id > i), which SQLite answers by merging two index lookups and sorting
+        # the result, so each page reads a single range of the (time, id) index in order.
+        return (queryset.filter(**{f'{time_field}__gte': changed_at})
+                .exclude(**{time_field: changed_at, f'{id_field}__lte': pk}))
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(request.query_params[self.limit_query_param], strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def decode_cursor(self, request):
+        """Return the (modified_at, id) position the request's cursor encodes, or None to start from the beginning."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            changed_at = parse_datetime(tokens['t'])
+            if changed_at is None:
+                raise ValueError(tokens['t'])
+            return changed_at, int(tokens['i'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, request, position, limit):
+        url = replace_query_param(request.build_absolute_uri(), self.limit_query_param, limit)
+        if position is None:
+            return url
+        changed_at, pk = position
+        tokens = json.dumps({'t': changed_at.isoformat(), 'i': pk}, separators=(',', ':'))
+        return replace_query_param(url, self.cursor_query_param,
+                                   urlsafe_b64encode(tokens.encode('ascii')).decode('ascii'))
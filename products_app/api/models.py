@@ -2,6 +2,13 @@ from django.db import models
 from django.utils import timezone
 
 
+class VisibleAttributeManager(models.Manager):
+    """Leaves out the attributes that are hidden while a deletion job unlinks them from their products."""
+
+    def get_queryset(self):
+        return super(VisibleAttributeManager, self).get_queryset().filter(hidden=False)
+
+
 class Attribute(models.Model):
     """
     The representation of attribute. In a more complex system there would be a separate model for attribute types and
@@ -12,6 +19,20 @@ class Attribute(models.Model):
     value = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     modified_at = models.DateTimeField(auto_now=True)
+    hidden = models.BooleanField(default=False)
+
+    objects = VisibleAttributeManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        # Also the order products list their attributes in, so both serializers agree on it.
+        ordering = ('id',)
+        indexes = [
+            models.Index(fields=['type', 'value'], name='attribute_type_value_idx'),
+            models.Index(fields=['value'], name='attribute_value_idx'),
+            models.Index(fields=['created_at'], name='attribute_created_at_idx'),
+            models.Index(fields=['modified_at'], name='attribute_modified_at_idx'),
+        ]
 
     def __str__(self):
         """Return the representation of the attribute, showing the type and value"""
@@ -32,6 +53,117 @@ class Product(models.Model):
     modified_at = models.DateTimeField(auto_now=True)
     attributes = models.ManyToManyField(Attribute)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='product_name_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['manufacturer'], name='product_manufacturer_idx'),
+            models.Index(fields=['product_type'], name='product_product_type_idx'),
+            models.Index(fields=['release_date'], name='product_release_date_idx'),
+            models.Index(fields=['created_at'], name='product_created_at_idx'),
+            models.Index(fields=['modified_at'], name='product_modified_at_idx'),
+        ]
+
     def __str__(self):
         """Return the representation of a product, it's name"""
         return f"{self.name}"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    How far the import_catalog command got through a source file. It is saved in the same transaction as each batch it
+    imports, so a resumed import picks up exactly after the last committed batch.
+    """
+    source = models.CharField(max_length=1024, unique=True)
+    offset = models.BigIntegerField(default=0)
+    line_number = models.BigIntegerField(default=0)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """Return the representation of the checkpoint, showing the source and line reached"""
+        return f"{self.source}: line {self.line_number}"
+
+
+class FieldFacetCount(models.Model):
+    """
+    The number of products with each manufacturer and product type, kept up to date by the receivers in
+    api/signals.py so the unfiltered facet counts are read without going through the products.
+    """
+    field = models.CharField(max_length=32)
+    value = models.CharField(max_length=255)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = (('field', 'value'),)
+
+    def __str__(self):
+        """Return the representation of the facet count, showing the field, value and count"""
+        return f"{self.field} {self.value}: {self.count}"
+
+
+class AttributeFacetCount(models.Model):
+    """The number of products linked to each attribute, kept up to date like FieldFacetCount."""
+    attribute = models.OneToOneField(Attribute, on_delete=models.CASCADE, primary_key=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        """Return the representation of the facet count, showing the attribute and count"""
+        return f"{self.attribute_id}: {self.count}"
+
+
+class DeletionJob(models.Model):
+    """
+    The deletion of an attribute or of a list of products, which api/jobs.py carries out a batch at a time, each in its
+    own short transaction, so a heavily linked attribute or a long list of products never holds the write lock for
+    long. `processed` counts the links unlinked for an attribute and the products deleted for products.
+    """
+    ATTRIBUTE = 'attribute'
+    PRODUCTS = 'products'
+    KIND_CHOICES = ((ATTRIBUTE, 'Attribute'), (PRODUCTS, 'Products'))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = ((PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'))
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    target_ids = models.TextField(help_text="The JSON list of the ids of the objects to delete.")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    modified_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='deletion_job_status_idx'),
+        ]
+
+    def __str__(self):
+        """Return the representation of the job, showing what it deletes and how far it got"""
+        return f"{self.kind} deletion {self.pk}: {self.status}, {self.processed}/{self.total}"
+
+
+class Tombstone(models.Model):
+    """
+    A record that a product or attribute was deleted, so the change feeds can tell their consumers. Written by the
+    receivers in api/signals.py for single and bulk deletes alike.
+    """
+    PRODUCT = 'product'
+    ATTRIBUTE = 'attribute'
+    KIND_CHOICES = ((PRODUCT, 'Product'), (ATTRIBUTE, 'Attribute'))
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at', 'object_id'], name='tombstone_feed_idx'),
+        ]
+
+    def __str__(self):
+        """Return the representation of the tombstone, showing what was deleted and when"""
+        return f"{self.kind} {self.object_id} deleted at {self.deleted_at}"
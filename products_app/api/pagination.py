@@ -0,0 +1,226 @@
+import json
+from base64 import urlsafe_b64decode
+from base64 import urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.pagination import CursorPagination
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .cache import count_cache
+from .timing import timed
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks straight to the next page on a (sort_key, id) keyset instead of skipping rows, so a
+    page deep into the listing costs the same as the first one. The sort key comes from the view's `keyset_sort_key`
+    and should be an indexed column whose value does not change, so a page walk never skips or repeats a row.
+    """
+    page_size_query_param = 'limit'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.sort_key = getattr(view, 'keyset_sort_key', 'id')
+
+        position, reverse = self.decode_cursor(request)
+        ordering = (self.sort_key, 'id')
+        if reverse:
+            ordering = ('-' + self.sort_key, '-id')
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            value, pk = position
+            lookup = 'lt' if reverse else 'gt'
+            queryset = queryset.filter(Q(**{f'{self.sort_key}__{lookup}': value}) |
+                                       Q(**{self.sort_key: value, f'id__{lookup}': pk}))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = has_more if reverse else position is not None
+        self.display_page_controls = self.has_next or self.has_previous
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param], strict=True)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor((self._get_position(self.page[-1]), False))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor((self._get_position(self.page[0]), True))
+
+    def decode_cursor(self, request):
+        """Return the (sort key value, id) position and direction encoded in the request's cursor."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            return (tokens['k'], int(tokens['i'])), bool(tokens.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        (value, pk), reverse = cursor
+        tokens = {'k': value, 'i': pk}
+        if reverse:
+            tokens['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(tokens, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position(self, row):
+        if isinstance(row, dict):
+            value, pk = row[self.sort_key], row['id']
+        else:
+            value, pk = getattr(row, self.sort_key), row.id
+        if isinstance(value, (datetime, Decimal)):
+            value = str(value)
+        return value, pk
+
+
+class NoCountPagination(LimitOffsetPagination):
+    """
+    Limit/offset pagination without the count, which on a filtered listing can cost more than reading the page. It
+    reads one row past the page instead, whose presence is what tells that there is a next page.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.request = request
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+
+class CachedCountPagination(NoCountPagination):
+    """
+    Pages like NoCountPagination, along with a count from the count cache, which may be a little out of date and is
+    refreshed in the background. `count_cached` tells whether it came from the cache.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super(CachedCountPagination, self).paginate_queryset(queryset, request, view)
+        if page is not None:
+            with timed(request, 'count'):
+                self.count, self.count_cached = count_cache.get_count(queryset)
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('count_cached', self.count_cached),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class CountTimingPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination with its count timed as a phase of its own, apart from the fetch of the page. DRF 3.7 counts
+    through a module-level function rather than a method, so the whole of paginate_queryset is taken over.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        with timed(request, 'count'):
+            self.count = count_rows(queryset)
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return list(queryset[self.offset:self.offset + self.limit])
+
+
+def count_rows(queryset):
+    """Return the number of rows of a queryset, or of items of a list."""
+    try:
+        return queryset.count()
+    except (AttributeError, TypeError):
+        return len(queryset)
+
+
+class CatalogPagination(BasePagination):
+    """
+    The pagination for the product and attribute listings. Pages with the site-wide limit/offset pagination unless
+    the client picks another mode through the `pagination` query parameter, e.g. `?pagination=cursor`.
+    """
+    mode_query_param = 'pagination'
+    default_mode = CountTimingPagination
+    modes = {
+        'cursor': KeysetPagination,
+        'nocount': NoCountPagination,
+        'cached-count': CachedCountPagination,
+    }
+
+    def __init__(self):
+        self.paginator = self.default_mode()
+
+    @property
+    def display_page_controls(self):
+        return self.paginator.display_page_controls
+
+    def get_paginator(self, request):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode is None and request.query_params.get(KeysetPagination.cursor_query_param):
+            mode = 'cursor'
+        return self.modes.get(mode, self.default_mode)()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return self.paginator.get_schema_fields(view)
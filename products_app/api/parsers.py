@@ -0,0 +1,66 @@
+import codecs
+import io
+import re
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.parsers import JSONParser
+
+from .renderers import FastJSONRenderer
+from .renderers import MessagePackRenderer
+from .renderers import from_columns
+from .renderers import get_layout
+from .renderers import msgpack
+from .renderers import orjson
+
+# orjson reads integers too big for 64 bits as floats, where the json module keeps them as integers.
+LONG_NUMBER = re.compile(rb'\d{19}')
+
+
+def parse_columns(data):
+    """Return the list of dicts held by a table of fields and rows, raising ParseError when it is malformed."""
+    try:
+        return from_columns(data)
+    except ValueError as exc:
+        raise ParseError(f'Columns layout error - {exc}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    A drop-in JSONParser that decodes UTF-8 bodies with orjson when it is installed. Bodies orjson rejects, or would
+    read differently, are parsed again by JSONParser, so the data and the error messages stay the same. A body sent
+    with `layout=columns` in its Content-Type is read as a table of fields and rows, like FastJSONRenderer writes.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        data = self.parse_json(stream, media_type, parser_context)
+        return parse_columns(data) if get_layout(media_type) == 'columns' else data
+
+    def parse_json(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != 'utf-8':
+            return super(FastJSONParser, self).parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if not LONG_NUMBER.search(body):
+            try:
+                return orjson.loads(body)
+            except ValueError:
+                pass
+        return super(FastJSONParser, self).parse(io.BytesIO(body), media_type, parser_context)
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack bodies, including tables of fields and rows sent with `layout=columns` in the Content-Type."""
+    media_type = 'application/x-msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            data = msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
+        return parse_columns(data) if get_layout(media_type) == 'columns' else data
@@ -0,0 +1,144 @@
+import cProfile
+import hmac
+import json
+import os
+import re
+import sys
+import threading
+import traceback
+from collections import Counter
+from time import perf_counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Request ids from the X-Request-ID header are used in file names, so only these are kept as they are.
+SAFE_REQUEST_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def short_path(filename):
+    """Return the path of a source file relative to the project, or to its package for installed packages."""
+    if filename.startswith(settings.BASE_DIR):
+        return os.path.relpath(filename, settings.BASE_DIR)
+    return os.path.join(*filename.split(os.sep)[-2:])
+
+
+def frame_name(code):
+    return f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples the stack of a thread every `interval` seconds, counting how often each stack is seen. While the thread
+    runs a query, the SQL is added as the innermost frame, so the flame graph shows which code ran which queries.
+    """
+
+    def __init__(self, thread_id, interval):
+        super(StackSampler, self).__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.current_sql = None
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            if self.current_sql:
+                stack.append('SQL: ' + ' '.join(self.current_sql.split())[:120].replace(';', ','))
+            self.stacks[';'.join(stack)] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        """Return the stacks in the collapsed format flamegraph.pl and speedscope read: a stack and its count a line."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder(object):
+    """An execute wrapper recording each query with its duration and the application frames that ran it."""
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.sampler.current_sql = sql
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.sampler.current_sql = None
+            stack = [f'{short_path(frame.filename)}:{frame.lineno} {frame.name}'
+                     for frame in traceback.extract_stack()[:-1]
+                     if frame.filename.startswith(settings.BASE_DIR) and '/site-packages/' not in frame.filename]
+            self.queries.append({'sql': sql, 'ms': round(duration * 1000, 3), 'many': many, 'stack': stack})
+
+
+class ProfilingMiddleware(object):
+    """
+    Profiles single requests on demand. A request carrying the API_PROFILING_TOKEN in an X-Profile header runs under
+    cProfile and a stack sampler, and leaves three files named after its request id in API_PROFILING_DIR: the pstats,
+    the collapsed stacks for a flame graph and the queries it ran, each with its duration and the code that ran it.
+    The request id is the X-Request-ID header when there is a usable one, and is sent back in X-Profile-Id. Without a
+    token the middleware takes itself out of the chain when the process starts, so it costs nothing.
+    """
+    header = 'HTTP_X_PROFILE'
+
+    def __init__(self, get_response):
+        self.token = getattr(settings, 'API_PROFILING_TOKEN', None)
+        if not self.token:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        given = request.META.get(self.header)
+        if not given or not hmac.compare_digest(given.encode('utf-8'), self.token.encode('utf-8')):
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        request_id = request.META.get('HTTP_X_REQUEST_ID', '')
+        if not SAFE_REQUEST_ID.match(request_id):
+            request_id = uuid4().hex
+
+        sampler = StackSampler(threading.get_ident(), getattr(settings, 'API_PROFILING_INTERVAL', 0.001))
+        recorder = QueryRecorder(sampler)
+        profiler = cProfile.Profile()
+        for connection in connections.all():
+            connection.execute_wrappers.append(recorder)
+        sampler.start()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            for connection in connections.all():
+                if recorder in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(recorder)
+
+        self.save(request, request_id, profiler, sampler, recorder)
+        response['X-Profile-Id'] = request_id
+        return response
+
+    def save(self, request, request_id, profiler, sampler, recorder):
+        directory = getattr(settings, 'API_PROFILING_DIR', os.path.join(settings.BASE_DIR, 'profiles'))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, request_id)
+        profiler.dump_stats(path + '.pstats')
+        with open(path + '.collapsed', 'w') as collapsed:
+            collapsed.write(sampler.collapsed())
+        with open(path + '.sql.json', 'w') as queries:
+            json.dump({'method': request.method, 'path': request.get_full_path(), 'queries': recorder.queries},
+                      queries, indent=2)
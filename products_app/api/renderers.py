@@ -0,0 +1,109 @@
+from django.http.multipartparser import parse_header
+from rest_framework.renderers import BaseRenderer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+except (ImportError, AttributeError):
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def get_layout(media_type):
+    """Return the `layout` parameter of the media type, or None."""
+    if not media_type:
+        return None
+    layout = parse_header(media_type.encode('ascii'))[1].get('layout')
+    return layout.decode('ascii') if layout else None
+
+
+def to_columns(items):
+    """
+    Return a list of dicts as {"fields": [...], "rows": [[...], ...]}, with the values of each row in the order of the
+    fields. Lists whose items are not all dicts with the same keys are returned as they are.
+    """
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return items
+    fields = list(items[0])
+    if any(len(item) != len(fields) or any(field not in item for field in fields) for item in items):
+        return items
+    return {'fields': fields, 'rows': [[item[field] for field in fields] for item in items]}
+
+
+def from_columns(table):
+    """
+    Return the list of dicts held by a {"fields": [...], "rows": [[...], ...]} table, and anything else as it is.
+    Raises ValueError for a table whose fields are not a list of strings, or whose rows are not lists of a value per
+    field.
+    """
+    if not isinstance(table, dict) or set(table) != {'fields', 'rows'}:
+        return table
+    fields, rows = table['fields'], table['rows']
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError('"fields" must be a list of strings.')
+    if not isinstance(rows, list) or not all(isinstance(row, list) and len(row) == len(fields) for row in rows):
+        raise ValueError('"rows" must be a list of lists with a value for each field.')
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class ColumnarLayoutMixin(object):
+    """
+    Renders a list, or the "results" of a page, as a table of fields and rows when the accepted media type has
+    `layout=columns`, as in `Accept: application/x-msgpack; layout=columns`. Each key is then written once per response
+    instead of once per object. The rest of the response, such as the count and links of a page, is left as it is.
+    """
+
+    def apply_layout(self, data, accepted_media_type):
+        if get_layout(accepted_media_type) != 'columns':
+            return data
+        if isinstance(data, dict) and 'results' in data:
+            return dict(data, results=to_columns(data['results']))
+        return to_columns(data)
+
+
+class FastJSONRenderer(ColumnarLayoutMixin, JSONRenderer):
+    """
+    A drop-in JSONRenderer that encodes with orjson when it is installed, writing the same bytes as JSONRenderer. Dates
+    and times are handed to the encoder_class like JSONRenderer does, so they keep DRF's formatting. Output orjson
+    cannot write the same way (indented or ASCII-only output, integers over 64 bits, types neither it nor the
+    encoder_class know) falls back to JSONRenderer. The one difference left is floats: orjson writes very small ones
+    without an exponent and NaN or Infinity as null, but the serializers here never produce floats.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = self.apply_layout(data, accepted_media_type)
+        if orjson is None or data is None or self.ensure_ascii or not self.compact or \
+                self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except (TypeError, ValueError):
+            return super(FastJSONRenderer, self).render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, so the output stays a strict subset of javascript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(ColumnarLayoutMixin, BaseRenderer):
+    """
+    Renders MessagePack, a binary counterpart of JSON that is smaller and quicker to encode and decode. It is only
+    registered in settings.py when msgpack is installed. Dates, times and decimals go through the encoder_class like
+    they do for JSONRenderer, so they come out as the same strings.
+    """
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder_class = encoders.JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(self.apply_layout(data, accepted_media_type), default=self.encoder_class().default,
+                             use_bin_type=True)
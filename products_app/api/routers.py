@@ -0,0 +1,62 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Whether the thread is running a request that may read from a replica. Everything else, from writes to management
+# commands and background jobs, reads from the primary.
+state = threading.local()
+
+READ_YOUR_WRITES_COOKIE = 'api_primary_until'
+
+
+def get_replicas():
+    return getattr(settings, 'API_REPLICA_ALIASES', [])
+
+
+def replica_reads_allowed():
+    return getattr(state, 'replica', False) and bool(get_replicas())
+
+
+@contextmanager
+def reading_from(replica):
+    """Let the reads of the block go to a replica, or keep them on the primary, whatever the block is nested in."""
+    outer, state.replica = getattr(state, 'replica', False), replica
+    try:
+        yield
+    finally:
+        state.replica = outer
+
+
+def wrote_recently(request):
+    """Whether the client wrote within API_READ_YOUR_WRITES_WINDOW seconds, going by the cookie it was given then."""
+    try:
+        return float(request.COOKIES.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def remember_write(response):
+    """Have the client's reads go to the primary until its write has had time to reach the replicas."""
+    window = getattr(settings, 'API_READ_YOUR_WRITES_WINDOW', 5)
+    response.set_cookie(READ_YOUR_WRITES_COOKIE, str(time.time() + window), max_age=window, httponly=True)
+
+
+class PrimaryReplicaRouter(object):
+    """
+    Sends the reads of requests that ReplicaRoutingMixin lets read from a replica to one of the API_REPLICA_ALIASES at
+    random, and every other read and all writes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return random.choice(get_replicas()) if replica_reads_allowed() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        return True
@@ -1,6 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import Attribute
+from .models import DeletionJob
 from .models import Product
 
 
@@ -24,6 +26,15 @@ class ProductSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at', 'modified_at')
 
 
+class ProductBulkItemSerializer(ProductSerializer):
+    """Definition for how to deserialize one product of a bulk create, with the ids of the attributes to link to it."""
+    attribute_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                          write_only=True)
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ('attribute_ids',)
+
+
 class ProductAddAttributeSerializer(serializers.ModelSerializer):
     """Definition of how to serialize a product with an attribute being added to it."""
     attributes = AttributeSerializer(read_only=True, many=True)
@@ -37,10 +48,9 @@ class ProductAddAttributeSerializer(serializers.ModelSerializer):
                             'release_date', 'created_at', 'modified_at')
 
     def update(self, instance, validated_data):
-        product = Product.objects.get(pk=instance.id)
         attribute_id = validated_data.pop("attribute_id")
-        product.attributes.add(attribute_id)
-        return product
+        instance.attributes.add(attribute_id)
+        return instance
 
 
 class ProductRemoveAttributeSerializer(serializers.ModelSerializer):
@@ -56,7 +66,72 @@ class ProductRemoveAttributeSerializer(serializers.ModelSerializer):
                             'release_date', 'created_at', 'modified_at')
 
     def update(self, instance, validated_data):
-        product = Product.objects.get(pk=instance.id)
         attribute_id = validated_data.pop("attribute_id")
-        product.attributes.remove(attribute_id)
-        return product
+        instance.attributes.remove(attribute_id)
+        return instance
+
+
+class ProductAttributeLinksSerializer(serializers.Serializer):
+    """Definition of how to deserialize a set of products and the attributes to link to and unlink from all of them."""
+    max_attribute_ids = 100
+
+    product_ids = serializers.ListField(child=serializers.IntegerField(min_value=1))
+    add_attribute_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                              default=list)
+    remove_attribute_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                                 default=list)
+
+    def validate_product_ids(self, product_ids):
+        max_ids = getattr(settings, 'API_ATTRIBUTE_LINKS_MAX_ITEMS', 100000)
+        if len(product_ids) > max_ids:
+            raise serializers.ValidationError(f"At most {max_ids} products can be changed at once.")
+        return product_ids
+
+    def validate(self, data):
+        add, remove = set(data["add_attribute_ids"]), set(data["remove_attribute_ids"])
+        if not add and not remove:
+            raise serializers.ValidationError("Either add_attribute_ids or remove_attribute_ids must be supplied.")
+        if add & remove:
+            raise serializers.ValidationError(
+                f"Attributes {sorted(add & remove)} cannot be both added and removed.")
+        if len(add | remove) > self.max_attribute_ids:
+            raise serializers.ValidationError(f"At most {self.max_attribute_ids} attributes can be changed at once.")
+        missing = (add | remove) - set(Attribute.objects.filter(id__in=add | remove).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Attributes {sorted(missing)} do not exist.")
+        return data
+
+
+class BatchGetSerializer(serializers.Serializer):
+    """Definition of how to deserialize the ids of the objects to read at once."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def validate_ids(self, ids):
+        max_ids = getattr(settings, 'API_BATCH_GET_MAX_IDS', 1000)
+        if not ids:
+            raise serializers.ValidationError("Name at least one id.")
+        if len(ids) > max_ids:
+            raise serializers.ValidationError(f"At most {max_ids} objects can be read at once.")
+        return ids
+
+
+class ProductBulkDeleteSerializer(serializers.Serializer):
+    """Definition of how to deserialize the ids of the products to delete at once."""
+    product_ids = serializers.ListField(child=serializers.IntegerField(min_value=1))
+
+    def validate_product_ids(self, product_ids):
+        max_ids = getattr(settings, 'API_BULK_DELETE_MAX_ITEMS', 100000)
+        if not product_ids:
+            raise serializers.ValidationError("Name at least one product.")
+        if len(product_ids) > max_ids:
+            raise serializers.ValidationError(f"At most {max_ids} products can be deleted at once.")
+        return product_ids
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    """Definition for how to serialize the status of a deletion job."""
+
+    class Meta:
+        model = DeletionJob
+        fields = ('id', 'kind', 'status', 'total', 'processed', 'error', 'created_at', 'modified_at')
+        read_only_fields = fields
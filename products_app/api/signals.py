@@ -0,0 +1,236 @@
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
+from django.dispatch import Signal
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .attribute_index import attribute_index
+from .cache import attribute_cache
+from .cache import product_cache
+from .facets import FACET_FIELDS
+from .facets import count_links
+from .facets import count_products
+from .models import Attribute
+from .models import Product
+from .models import Tombstone
+from .utils import MAX_IN_CLAUSE_SIZE
+from .utils import chunked
+
+ProductAttribute = Product.attributes.through
+
+# Sent by bulk_relink for each chunk of products it relinks, as it writes the product/attribute through table directly
+# and so never sends m2m_changed. `added` and `removed` are lists of (product_id, attribute_id) links.
+links_changed = Signal(providing_args=['added', 'removed'])
+
+# Sent by bulk_create_products, as bulk_create sends no post_save. `products` are the new products and `links` is a list
+# of (product_id, attribute_id) links created along with them.
+products_created = Signal(providing_args=['products', 'links'])
+
+# Sent by bulk_delete_products for each chunk of products it deletes, as it deletes them without sending pre_delete or
+# post_delete. `products` is a list of (product_id, facet values) and `links` the (product_id, attribute_id) links
+# deleted along with them.
+products_deleted = Signal(providing_args=['products', 'links'])
+
+
+def invalidate(representation_cache, pks, changed_at=None):
+    """
+    Invalidate the cached representations now and again once the transaction commits, so a read that saw the old rows
+    while the transaction was still open cannot stay cached under the new version. `changed_at` is the modified_at
+    the change gave the objects, or now when it left none.
+    """
+    pks, changed_at = list(pks), changed_at or timezone.now()
+    representation_cache.invalidate(pks, changed_at)
+    transaction.on_commit(lambda: representation_cache.invalidate(pks, changed_at))
+
+
+def touch_products(product_ids):
+    """
+    Move the modified_at of the products to now and invalidate their cached representations. Used when something a
+    product embeds changes (its links or one of its attributes) without the product itself being saved.
+    """
+    product_ids = list(product_ids)
+    now = timezone.now()
+    for chunk in chunked(product_ids, MAX_IN_CLAUSE_SIZE):
+        Product.objects.filter(id__in=chunk).update(modified_at=now)
+    invalidate(product_cache, product_ids, now)
+    return now
+
+
+def get_touch_batch_size():
+    """The most products an attribute change touches in the transaction saving it, and per transaction after that."""
+    return getattr(settings, 'API_TOUCH_BATCH_SIZE', 500)
+
+
+def touch_linked_products(attribute_id):
+    """Touch the products linked to the attribute a batch at a time, each batch in a transaction of its own."""
+    last_id = 0
+    while True:
+        product_ids = list(ProductAttribute.objects.filter(attribute_id=attribute_id, product_id__gt=last_id)
+                           .order_by('product_id').values_list('product_id', flat=True)[:get_touch_batch_size()])
+        if not product_ids:
+            return
+        with transaction.atomic():
+            touch_products(product_ids)
+        last_id = product_ids[-1]
+
+
+def touch_linked_products_and_close(attribute_id):
+    try:
+        touch_linked_products(attribute_id)
+    finally:
+        # The thread opened its own database connection, which nothing else will close.
+        connections.close_all()
+
+
+def bury(kind, object_ids):
+    """Record that the objects were deleted, for the change feeds."""
+    Tombstone.objects.bulk_create([Tombstone(kind=kind, object_id=object_id) for object_id in object_ids])
+
+
+def update_index(method, *args):
+    """Apply a change to the attribute index once the transaction commits, if this process has loaded it."""
+    if attribute_index.loaded:
+        transaction.on_commit(lambda: method(*args))
+
+
+def linked_product_ids(attribute):
+    return list(ProductAttribute.objects.filter(attribute_id=attribute.pk).values_list('product_id', flat=True))
+
+
+def facet_values(product):
+    return tuple(getattr(product, field) for field in FACET_FIELDS)
+
+
+@receiver(pre_save, sender=Product)
+def product_saving(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._stored_facet_values = Product.objects.filter(pk=instance.pk).values_list(*FACET_FIELDS).first()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    invalidate(product_cache, [instance.pk], instance.modified_at)
+    stored = getattr(instance, '_stored_facet_values', None)
+    if created or stored != facet_values(instance):
+        count_products(added=[facet_values(instance)], removed=[stored] if stored and not created else [])
+
+
+@receiver(pre_delete, sender=Product)
+def product_deleting(sender, instance, **kwargs):
+    instance._linked_attribute_ids = list(
+        ProductAttribute.objects.filter(product_id=instance.pk).values_list('attribute_id', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    invalidate(product_cache, [instance.pk])
+    bury(Tombstone.PRODUCT, [instance.pk])
+    count_products(removed=[facet_values(instance)])
+    count_links(removed=getattr(instance, '_linked_attribute_ids', []))
+    update_index(attribute_index.remove_links,
+                 [(instance.pk, attribute_id) for attribute_id in getattr(instance, '_linked_attribute_ids', [])])
+
+
+@receiver(pre_save, sender=Attribute)
+def attribute_saving(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._stored_type_value = Attribute.all_objects.filter(pk=instance.pk).values_list('type', 'value').first()
+
+
+@receiver(post_save, sender=Attribute)
+def attribute_saved(sender, instance, created, **kwargs):
+    """
+    Touch the products embedding the attribute when its type or value changed. Their cached representations already
+    check the attribute's version, so only modified_at has to move. A heavily linked attribute has its products touched
+    a batch at a time by a thread started once the transaction commits, as the deletion jobs do, so saving it never
+    updates more than a batch of products.
+    """
+    invalidate(attribute_cache, [instance.pk], instance.modified_at)
+    update_index(attribute_index.set_attribute, instance.pk, instance.type, instance.value)
+    if created or getattr(instance, '_stored_type_value', None) == (instance.type, instance.value):
+        return
+
+    batch_size = get_touch_batch_size()
+    product_ids = list(ProductAttribute.objects.filter(attribute_id=instance.pk)
+                       .values_list('product_id', flat=True)[:batch_size + 1])
+    if len(product_ids) <= batch_size:
+        touch_products(product_ids)
+    else:
+        transaction.on_commit(lambda: threading.Thread(target=touch_linked_products_and_close, args=(instance.pk,),
+                                                       daemon=True).start())
+
+
+@receiver(pre_delete, sender=Attribute)
+def attribute_deleting(sender, instance, **kwargs):
+    touch_products(linked_product_ids(instance))
+
+
+@receiver(post_delete, sender=Attribute)
+def attribute_deleted(sender, instance, **kwargs):
+    invalidate(attribute_cache, [instance.pk])
+    bury(Tombstone.ATTRIBUTE, [instance.pk])
+    update_index(attribute_index.drop_attribute, instance.pk)
+
+
+@receiver(m2m_changed, sender=ProductAttribute)
+def product_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._cleared_ids = (linked_product_ids(instance) if reverse else list(
+            ProductAttribute.objects.filter(product_id=instance.pk).values_list('attribute_id', flat=True)))
+    elif action == 'pre_remove' and pk_set:
+        # m2m_changed passes the ids that were asked to be removed, whether they were linked or not.
+        links = (ProductAttribute.objects.filter(attribute_id=instance.pk, product_id__in=pk_set) if reverse else
+                 ProductAttribute.objects.filter(product_id=instance.pk, attribute_id__in=pk_set))
+        instance._removed_ids = list(links.values_list('product_id' if reverse else 'attribute_id', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear') or pk_set is not None and not pk_set:
+        return
+
+    changed_ids = pk_set if action == 'post_add' else getattr(
+        instance, '_cleared_ids' if action == 'post_clear' else '_removed_ids', [])
+    attribute_ids = [instance.pk] * len(changed_ids) if reverse else changed_ids
+    links = [(product_id, instance.pk) for product_id in changed_ids] if reverse else [
+        (instance.pk, attribute_id) for attribute_id in changed_ids]
+    if action == 'post_add':
+        count_links(added=attribute_ids)
+        update_index(attribute_index.add_links, links)
+    else:
+        count_links(removed=attribute_ids)
+        update_index(attribute_index.remove_links, links)
+
+    if not reverse:
+        instance.modified_at = touch_products([instance.pk])
+    else:
+        touch_products(changed_ids)
+
+
+@receiver(links_changed)
+def products_relinked(sender, added, removed, **kwargs):
+    touch_products({product_id for product_id, _ in added + removed})
+    count_links(added=[attribute_id for _, attribute_id in added],
+                removed=[attribute_id for _, attribute_id in removed])
+    update_index(attribute_index.remove_links, removed)
+    update_index(attribute_index.add_links, added)
+
+
+@receiver(products_created)
+def products_bulk_created(sender, products, links, **kwargs):
+    count_products(added=[facet_values(product) for product in products])
+    count_links(added=[attribute_id for _, attribute_id in links])
+    update_index(attribute_index.add_links, links)
+
+
+@receiver(products_deleted)
+def products_bulk_deleted(sender, products, links, **kwargs):
+    invalidate(product_cache, [product_id for product_id, _ in products])
+    bury(Tombstone.PRODUCT, [product_id for product_id, _ in products])
+    count_products(removed=[values for _, values in products])
+    count_links(removed=[attribute_id for _, attribute_id in links])
+    update_index(attribute_index.remove_links, links)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    Django's SQLite backend, starting transactions with BEGIN and the TRANSACTION_MODE of the database settings. A
+    DEFERRED transaction that reads before it writes cannot wait for the write lock when another connection took it
+    in the meantime, and fails with "database is locked" straight away. IMMEDIATE takes the write lock up front, so
+    the busy timeout applies. New connections get the API_SQLITE_PRAGMAS of the database profile, set on the raw
+    connection, so they are not counted as queries of the request that opened it.
+    """
+
+    def get_new_connection(self, conn_params):
+        conn = super(DatabaseWrapper, self).get_new_connection(conn_params)
+        for pragma, value in getattr(settings, 'API_SQLITE_PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.settings_dict.get('TRANSACTION_MODE', 'DEFERRED')}")
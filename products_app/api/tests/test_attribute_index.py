@@ -0,0 +1,180 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test import TestCase
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.attribute_index import attribute_index
+from api.bitmaps import Bitmap
+from api.models import Attribute
+from api.models import Product
+
+ProductAttribute = Product.attributes.through
+
+# Sparse ids, a chunk dense enough to be kept as a bitmask, and ids past the first chunk.
+SPARSE_IDS = {1, 7, 65535, 65536, 200000, 10 ** 9}
+DENSE_IDS = set(range(70000, 80000, 2))
+
+
+class WhenStoringIdsInABitmap(SimpleTestCase):
+    """This class shows that a bitmap behaves like a set of ids, whether its chunks are arrays or bitmasks"""
+
+    def test_should_hold_the_ids_it_was_built_from(self):
+        bitmap = Bitmap(SPARSE_IDS | DENSE_IDS)
+        self.assertEqual(sorted(SPARSE_IDS | DENSE_IDS), list(bitmap))
+        self.assertEqual(len(SPARSE_IDS | DENSE_IDS), len(bitmap))
+        self.assertIn(70002, bitmap)
+        self.assertNotIn(70001, bitmap)
+
+    def test_should_intersect_and_unite_like_sets(self):
+        odd = set(range(70001, 90000, 2)) | {7, 10 ** 9}
+        for left, right in ((SPARSE_IDS | DENSE_IDS, odd), (DENSE_IDS, set(range(75000, 76000))), (SPARSE_IDS, odd)):
+            self.assertEqual(sorted(left & right), list(Bitmap(left) & Bitmap(right)))
+            self.assertEqual(sorted(left | right), list(Bitmap(left) | Bitmap(right)))
+
+    def test_should_add_and_discard_ids(self):
+        bitmap = Bitmap(DENSE_IDS)
+        for id in (3, 70001, 70002, 10 ** 9):
+            bitmap.add(id)
+        for id in (3, 70004, 12345):
+            bitmap.discard(id)
+        self.assertEqual(sorted((DENSE_IDS | {70001, 10 ** 9}) - {70004}), list(bitmap))
+
+    def test_should_be_empty_once_every_id_is_discarded(self):
+        bitmap = Bitmap([5, 6])
+        bitmap.discard(5)
+        bitmap.discard(6)
+        self.assertFalse(bitmap)
+
+
+class WhenFilteringProductsOnSeveralAttributes(TestCase):
+    """This class shows that the attribute filters find the same products as joining the link table per attribute"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.red = Attribute.objects.create(type="Color", value="Red")
+        cls.blue = Attribute.objects.create(type="Color", value="Blue")
+        cls.wheels = Attribute.objects.create(type="Number Of Wheels", value="4")
+        cls.products = {}
+        for name, attributes in (("Car", [cls.red, cls.wheels]), ("Van", [cls.blue, cls.wheels]),
+                                 ("Bike", [cls.red]), ("Boat", [])):
+            product = Product.objects.create(name=name, price=10, manufacturer="Acme", product_type="Vehicle")
+            product.attributes.add(*attributes)
+            cls.products[name] = product
+
+    def setUp(self):
+        attribute_index.load()
+
+    def get_names(self, **params):
+        response = APIClient().get(reverse("products"), data=dict(params, limit=100))
+        self.assertEqual(200, response.status_code, response.data)
+        return sorted(product["name"] for product in response.data["results"])
+
+    def test_should_match_products_with_all_of_the_attributes(self):
+        self.assertEqual(["Car"], self.get_names(attribute=["Color:Red", "Number Of Wheels:4"]))
+        self.assertEqual(
+            sorted(Product.objects.filter(attributes=self.red).filter(attributes=self.wheels).values_list("name",
+                                                                                                         flat=True)),
+            self.get_names(attribute=["Color:Red", "Number Of Wheels:4"]))
+
+    def test_should_match_products_with_any_of_the_attributes(self):
+        self.assertEqual(["Bike", "Car", "Van"], self.get_names(attribute_any=["Color:Red", "Color:Blue"]))
+
+    def test_should_combine_all_and_any(self):
+        self.assertEqual(["Car", "Van"], self.get_names(attribute="Number Of Wheels:4",
+                                                        attribute_any=["Color:Red", "Color:Blue"]))
+
+    def test_should_combine_with_the_other_filters(self):
+        self.assertEqual(["Bike"], self.get_names(attribute="Color:Red", name="Bike"))
+
+    def test_should_match_nothing_for_an_unknown_attribute(self):
+        self.assertEqual([], self.get_names(attribute=["Color:Red", "Color:Green"]))
+
+    def test_should_resolve_the_attributes_once_per_request(self):
+        with mock.patch.object(attribute_index, "resolve", wraps=attribute_index.resolve) as resolve:
+            self.get_names(attribute="Color:Red")
+        self.assertEqual(1, resolve.call_count)
+
+    def test_should_reject_an_attribute_without_a_value(self):
+        response = APIClient().get(reverse("products"), data={"attribute": "Color"})
+        self.assertEqual(400, response.status_code)
+        self.assertIn("attribute", response.data)
+
+
+class WhenLinksChangeAfterTheIndexIsLoaded(TestCase):
+    """This class shows that the index catches up with link and attribute changes before filtering"""
+
+    def setUp(self):
+        self.red = Attribute.objects.create(type="Color", value="Red")
+        self.wheels = Attribute.objects.create(type="Number Of Wheels", value="4")
+        self.car = Product.objects.create(name="Car", price=10, manufacturer="Acme", product_type="Vehicle")
+        self.car.attributes.add(self.red)
+        attribute_index.load()
+
+    def resolve(self, *pairs):
+        return list(attribute_index.resolve(all_of=pairs))
+
+    def test_should_see_added_links(self):
+        self.car.attributes.add(self.wheels)
+        self.assertEqual([self.car.id], self.resolve(("Color", "Red"), ("Number Of Wheels", "4")))
+
+    def test_should_forget_removed_links(self):
+        self.car.attributes.remove(self.red)
+        self.assertEqual([], self.resolve(("Color", "Red")))
+
+    def test_should_see_changed_attributes(self):
+        self.red.value = "Crimson"
+        self.red.save()
+        self.assertEqual([], self.resolve(("Color", "Red")))
+        self.assertEqual([self.car.id], self.resolve(("Color", "Crimson")))
+
+    def test_should_forget_deleted_attributes(self):
+        self.red.delete()
+        self.assertEqual([], self.resolve(("Color", "Red")))
+
+    def test_should_only_touch_the_bitmaps_of_the_links_that_changed(self):
+        unrelated = mock.Mock(spec=Bitmap)
+        attribute_index.bitmaps[10 ** 6] = unrelated
+        ProductAttribute.objects.filter(product_id=self.car.id).delete()
+        ProductAttribute.objects.create(product_id=self.car.id, attribute_id=self.wheels.id)
+        attribute_index.relink_products([self.car.id])
+        self.assertEqual([], unrelated.mock_calls)
+        self.assertEqual((self.wheels.id,), attribute_index.product_links[self.car.id])
+        self.assertEqual([], self.resolve(("Color", "Red")))
+        self.assertEqual([self.car.id], self.resolve(("Number Of Wheels", "4")))
+
+    def test_should_report_its_size(self):
+        stats = attribute_index.stats()
+        self.assertEqual(1, stats["links"])
+        self.assertGreater(stats["bytes"], 0)
+
+
+class WhenFilteringOnAnAttributeMatchingManyProducts(TestCase):
+    """This class shows that the query stays the same size however many products the attribute filters match"""
+
+    @classmethod
+    def setUpTestData(cls):
+        red = Attribute.objects.create(type="Color", value="Red")
+        Product.objects.bulk_create([Product(name=f"Car {index}", price=10, manufacturer="Acme", product_type="Vehicle")
+                                     for index in range(5000)])
+        ProductAttribute.objects.bulk_create([ProductAttribute(product_id=product_id, attribute_id=red.id)
+                                              for product_id in Product.objects.values_list("id", flat=True)])
+
+    def setUp(self):
+        attribute_index.load()
+        self.queries = []
+        with connection.execute_wrapper(lambda execute, sql, params, many, context: (
+                self.queries.append((sql, params)), execute(sql, params, many, context))[1]):
+            self.response = APIClient().get(reverse("products"), data={"attribute": "Color:Red", "limit": 10})
+
+    def test_should_count_every_match(self):
+        self.assertEqual(5000, self.response.data["count"])
+        self.assertEqual(10, len(self.response.data["results"]))
+
+    def test_should_not_inline_the_matching_ids(self):
+        filtered = [(sql, params) for sql, params in self.queries if "json_each" in sql]
+        self.assertTrue(filtered)
+        self.assertLess(max(len(sql) for sql, _ in filtered), 2000)
+        self.assertLess(max(len(params) for _, params in filtered), 10)
@@ -0,0 +1,111 @@
+from django.db import connection
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.mixins import QueryCounter
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenSendingAPostToProductBatchGetView(TestCaseWithFixtureData):
+    """This class defines the test suite for reading several products at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostToProductBatchGetView, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product3.attributes.add(cls.attribute3)
+
+        cls.client = APIClient()
+        cls.missing_id = cls.product3.id + 1000
+        cls.response = cls.client.post(
+            reverse("product_batch_get"),
+            data={"ids": [cls.product3.id, cls.missing_id, cls.product1.id]},
+            format="json"
+        )
+
+    def test_should_receive_a_200_ok_response(self):
+        self.assertEqual(status.HTTP_200_OK, self.response.status_code)
+
+    def test_should_return_the_products_in_the_order_asked_for(self):
+        self.assertEqual([self.product3.id, self.product1.id], [item["id"] for item in self.response.data["results"]])
+
+    def test_should_return_the_same_representation_as_the_detail_view(self):
+        detail = self.client.get(reverse("product_details", kwargs={"pk": self.product1.id}))
+        self.assertEqual(detail.data, self.response.data["results"][1])
+
+    def test_should_report_the_missing_ids(self):
+        self.assertEqual([self.missing_id], self.response.data["missing_ids"])
+
+
+class WhenSendingAPostForManyProductsToProductBatchGetView(TestCaseWithFixtureData):
+    """This class shows that reading more products at once takes no more queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostForManyProductsToProductBatchGetView, cls).setUpTestData()
+
+        for index in range(50):
+            product = Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget")
+            product.save()
+            product.attributes.add(cls.attribute1, cls.attribute2)
+
+        client = APIClient()
+        ids = list(Product.objects.values_list("id", flat=True))
+        cls.query_counts = []
+        for count in (3, 50):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                client.post(reverse("product_batch_get"), data={"ids": ids[:count]}, format="json")
+            cls.query_counts.append(counter.count)
+        cls.sparse = client.post(reverse("product_batch_get") + "?fields=id,name", data={"ids": ids[:2]},
+                                 format="json")
+
+    def test_should_run_as_many_queries_for_50_products_as_for_3(self):
+        self.assertEqual(self.query_counts[0], self.query_counts[1])
+
+    def test_should_only_return_the_fields_asked_for(self):
+        self.assertEqual([["id", "name"]] * 2, [sorted(item) for item in self.sparse.data["results"]])
+
+
+class WhenSendingAnInvalidPostToProductBatchGetView(TestCaseWithFixtureData):
+    """This class defines the test suite for rejecting a batch without ids"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAnInvalidPostToProductBatchGetView, cls).setUpTestData()
+
+        cls.response = APIClient().post(reverse("product_batch_get"), data={"ids": []}, format="json")
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, self.response.status_code)
+
+    def test_should_say_what_is_wrong(self):
+        self.assertIn("ids", self.response.data)
+
+
+class WhenSendingAPostToAttributeBatchGetView(TestCaseWithFixtureData):
+    """This class defines the test suite for reading several attributes at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostToAttributeBatchGetView, cls).setUpTestData()
+
+        cls.missing_id = cls.attribute3.id + 1000
+        cls.response = APIClient().post(
+            reverse("attribute_batch_get"),
+            data={"ids": [cls.attribute2.id, cls.attribute1.id, cls.missing_id, cls.attribute2.id]},
+            format="json"
+        )
+
+    def test_should_receive_a_200_ok_response(self):
+        self.assertEqual(status.HTTP_200_OK, self.response.status_code)
+
+    def test_should_return_an_attribute_per_id_asked_for_in_order(self):
+        self.assertEqual([self.attribute2.id, self.attribute1.id, self.attribute2.id],
+                         [item["id"] for item in self.response.data["results"]])
+
+    def test_should_report_the_missing_ids(self):
+        self.assertEqual([self.missing_id], self.response.data["missing_ids"])
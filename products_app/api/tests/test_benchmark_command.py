@@ -0,0 +1,22 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Product
+
+
+class WhenRunningTheSerializerBenchmark(TestCase):
+    """This class defines the test suite for benchmarking the product serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stdout = StringIO()
+        call_command("benchmark", "serializers", page_sizes=[1, 5], repeat=1, attributes=2, stdout=cls.stdout)
+        cls.lines = cls.stdout.getvalue().splitlines()
+
+    def test_should_report_every_page_size(self):
+        self.assertEqual(["1", "5"], [line.split()[0] for line in self.lines[1:]])
+
+    def test_should_leave_no_products_behind(self):
+        self.assertFalse(Product.objects.filter(manufacturer="Benchmark").exists())
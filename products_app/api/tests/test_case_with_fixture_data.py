@@ -25,4 +25,4 @@ class TestCaseWithFixtureData(TestCase):
     @classmethod
     def tearDownClass(cls):
         Product.objects.all().delete()
-        Attribute.objects.all().delete()
+        Attribute.all_objects.all().delete()
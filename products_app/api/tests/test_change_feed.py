@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.models import Attribute
+from api.models import Product
+from api.models import Tombstone
+from api.views import AttributeChanges
+from api.views import ProductChanges
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+from .test_filter_indexes import explain
+
+
+def walk(client, url):
+    """Return the pages of the feed from the url on, and the url to poll for the changes after the last one."""
+    pages = []
+    while True:
+        response = client.get(url)
+        pages.append(response)
+        url = response.data["next"]
+        if not response.data["has_more"]:
+            return pages, url
+
+
+@override_settings(API_CHANGE_FEED_SETTLE=0)
+class WhenFollowingTheProductChangeFeed(TestCaseWithFixtureData):
+    """This class defines the test suite for syncing products through products/changes/ and then polling it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenFollowingTheProductChangeFeed, cls).setUpTestData()
+
+        for index in range(22):
+            Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget").save()
+
+        cls.client = APIClient()
+        cls.pages, poll_url = walk(cls.client, reverse("product_changes") + "?limit=10")
+        cls.quiet = cls.client.get(poll_url)
+
+        cls.product1.attributes.add(cls.attribute1)
+        deleted_id = cls.product2.id
+        cls.product2.delete()
+        cls.product2.id = deleted_id
+        cls.changes = cls.client.get(poll_url).data["results"]
+
+    def test_should_receive_a_200_ok_response_for_every_page(self):
+        self.assertEqual({status.HTTP_200_OK}, {page.status_code for page in self.pages})
+
+    def test_should_list_every_product_exactly_once(self):
+        ids = [entry["id"] for page in self.pages for entry in page.data["results"] if not entry["deleted"]]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertLessEqual(set(Product.objects.exclude(pk=self.product2.id).values_list("id", flat=True)), set(ids))
+
+    def test_should_give_the_same_representation_as_the_detail_view(self):
+        entry = next(entry for page in self.pages for entry in page.data["results"] if entry["id"] == self.product3.id)
+        self.assertEqual(self.client.get(reverse("product_details", kwargs={"pk": self.product3.id})).data,
+                         entry["object"])
+
+    def test_should_have_nothing_new_to_poll_right_after_syncing(self):
+        self.assertEqual(([], False), (self.quiet.data["results"], self.quiet.data["has_more"]))
+
+    def test_should_list_a_product_whose_attributes_changed(self):
+        entry = next(entry for entry in self.changes if entry["id"] == self.product1.id)
+        self.assertEqual([self.attribute1.id], [attribute["id"] for attribute in entry["object"]["attributes"]])
+
+    def test_should_list_a_deleted_product_as_a_tombstone(self):
+        entry = next(entry for entry in self.changes if entry["id"] == self.product2.id)
+        self.assertTrue(entry["deleted"])
+        self.assertNotIn("object", entry)
+
+    def test_should_list_only_the_changes_since_the_cursor(self):
+        self.assertEqual([self.product1.id, self.product2.id], [entry["id"] for entry in self.changes])
+
+
+@override_settings(API_CHANGE_FEED_SETTLE=0)
+class WhenFollowingTheAttributeChangeFeed(TestCaseWithFixtureData):
+    """This class defines the test suite for the changes listed by attributes/changes/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenFollowingTheAttributeChangeFeed, cls).setUpTestData()
+
+        cls.client = APIClient()
+        _, poll_url = walk(cls.client, reverse("attribute_changes"))
+        cls.hidden = Attribute.objects.create(type="Material", value="Wood")
+        Attribute.objects.filter(pk=cls.hidden.pk).update(hidden=True)
+        cls.created = Attribute.objects.create(type="Material", value="Steel")
+        cls.changes = cls.client.get(poll_url).data["results"]
+
+    def test_should_list_a_created_attribute(self):
+        entry = next(entry for entry in self.changes if entry["id"] == self.created.id)
+        self.assertEqual(("Material", "Steel"), (entry["object"]["type"], entry["object"]["value"]))
+
+    def test_should_list_a_hidden_attribute_as_deleted(self):
+        self.assertTrue(next(entry for entry in self.changes if entry["id"] == self.hidden.id)["deleted"])
+
+
+class WhenFollowingAChangeFeedWithABadCursor(TestCaseWithFixtureData):
+    """This class defines the test suite for rejecting a cursor the feed did not hand out"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenFollowingAChangeFeedWithABadCursor, cls).setUpTestData()
+
+        cls.response = APIClient().get(reverse("product_changes"), data={"cursor": "not-a-cursor"})
+
+    def test_should_receive_a_404_not_found_response(self):
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.response.status_code)
+
+
+class WhenExplainingAChangeFeedPage(TestCase):
+    """This class checks that a page after a cursor reads one range of an index in order, however long the feed is"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        feeds = {"products": (ProductChanges, Product.objects.all(), "modified_at", "id"),
+                 "attributes": (AttributeChanges, Attribute.all_objects.all(), "modified_at", "id"),
+                 "tombstones": (ProductChanges, Tombstone.objects.filter(kind=Tombstone.PRODUCT),
+                                "deleted_at", "object_id")}
+        cls.plans = {name: explain(view().after(queryset.filter(**{f"{time_field}__lte": now}), time_field, id_field,
+                                                (now - timedelta(minutes=1), 5))[:101])
+                     for name, (view, queryset, time_field, id_field) in feeds.items()}
+
+    def test_should_not_sort_the_changes(self):
+        self.assertEqual({}, {name: plan for name, plan in self.plans.items()
+                              if any("TEMP B-TREE" in step or "MULTI-INDEX OR" in step for step in plan)})
+
+    def test_should_not_scan_a_table(self):
+        self.assertEqual({}, {name: plan for name, plan in self.plans.items()
+                              if any(step.startswith("SCAN") and "INDEX" not in step for step in plan)})
+
+    def test_should_seek_to_the_cursor(self):
+        self.assertIn("deleted_at>?", " ".join(self.plans["tombstones"]))
+        self.assertIn("modified_at>?", " ".join(self.plans["products"]))
@@ -0,0 +1,166 @@
+from django.db import connection
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.mixins import QueryCounter
+from api.models import Product
+from api.signals import touch_linked_products
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenRepeatingAProductRequestWithItsValidators(TestCaseWithFixtureData):
+    """This class defines the test suite for answering a product request that has not changed with a 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenRepeatingAProductRequestWithItsValidators, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        cls.first_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}))
+        cls.list_response = cls.client.get(reverse("products"))
+
+        cls.counter = QueryCounter()
+        with connection.execute_wrapper(cls.counter):
+            cls.etag_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}),
+                                               HTTP_IF_NONE_MATCH=cls.first_response["ETag"])
+        cls.date_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}),
+                                           HTTP_IF_MODIFIED_SINCE=cls.first_response["Last-Modified"])
+        cls.list_etag_response = cls.client.get(reverse("products"), HTTP_IF_NONE_MATCH=cls.list_response["ETag"])
+        cls.other_etag_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product2.id}),
+                                                 HTTP_IF_NONE_MATCH=cls.first_response["ETag"])
+
+    def test_should_send_validators(self):
+        self.assertTrue(self.first_response.has_header("ETag"))
+        self.assertTrue(self.first_response.has_header("Last-Modified"))
+
+    def test_should_answer_a_matching_etag_with_not_modified(self):
+        self.assertEqual(304, self.etag_response.status_code)
+        self.assertEqual(self.first_response["ETag"], self.etag_response["ETag"])
+
+    def test_should_answer_a_cached_product_without_querying_the_database(self):
+        self.assertEqual(0, self.counter.count)
+
+    def test_should_answer_an_unchanged_date_with_not_modified(self):
+        self.assertEqual(304, self.date_response.status_code)
+
+    def test_should_answer_an_unchanged_list_with_not_modified(self):
+        self.assertEqual(304, self.list_etag_response.status_code)
+
+    def test_should_not_match_the_etag_of_another_product(self):
+        self.assertEqual(200, self.other_etag_response.status_code)
+
+
+class WhenRepeatingAProductRequestAfterAChange(TestCaseWithFixtureData):
+    """This class defines the test suite for changing the validators of a product when it or its links change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenRepeatingAProductRequestAfterAChange, cls).setUpTestData()
+
+        cls.product2.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        products = (cls.product1, cls.product2, cls.product3)
+        etags = [cls.client.get(reverse("product_details", kwargs={'pk': product.id}))["ETag"] for product in products]
+        list_etag = cls.client.get(reverse("products"))["ETag"]
+
+        cls.client.post(reverse("product_details", kwargs={'pk': cls.product1.id}),
+                        data={"name": "Apple Watch", "price": 399.99, "manufacturer": "Apple",
+                              "product_type": "Smartwatch"},
+                        format="json")
+        cls.client.post(reverse("attribute_details", kwargs={'pk': cls.attribute1.id}),
+                        data={"type": "Color", "value": "Blue"}, format="json")
+        cls.client.post(reverse("product_add_attribute", kwargs={'pk': cls.product3.id}),
+                        data={"attribute_id": cls.attribute2.id}, format="json")
+
+        cls.responses = [cls.client.get(reverse("product_details", kwargs={'pk': product.id}),
+                                        HTTP_IF_NONE_MATCH=etag)
+                         for product, etag in zip(products, etags)]
+
+        cls.client.post(reverse("product_delete", kwargs={'pk': cls.product1.id}))
+        cls.list_response = cls.client.get(reverse("products"), HTTP_IF_NONE_MATCH=list_etag)
+
+    def test_should_return_the_updated_product(self):
+        self.assertEqual(200, self.responses[0].status_code)
+
+    def test_should_return_a_product_whose_attribute_changed(self):
+        self.assertEqual(200, self.responses[1].status_code)
+        self.assertEqual("Blue", self.responses[1].data["attributes"][0]["value"])
+
+    def test_should_return_a_product_whose_attributes_were_added(self):
+        self.assertEqual(200, self.responses[2].status_code)
+        self.assertEqual([self.attribute2.id], [attribute["id"] for attribute in self.responses[2].data["attributes"]])
+
+    def test_should_return_the_list_after_a_delete(self):
+        self.assertEqual(200, self.list_response.status_code)
+
+
+class WhenSavingAnAttributeLinkedToProducts(TestCaseWithFixtureData):
+    """This class defines the test suite for touching the products of an attribute when its type or value changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSavingAnAttributeLinkedToProducts, cls).setUpTestData()
+
+        for product in (cls.product1, cls.product2, cls.product3):
+            product.attributes.add(cls.attribute1)
+        cls.product2.attributes.add(cls.attribute2)
+        cls.before = cls.get_modified_at()
+
+        cls.attribute1.save()
+        cls.unchanged = cls.get_modified_at()
+        cls.attribute2.value = "6"
+        cls.attribute2.save()
+        cls.changed = cls.get_modified_at()
+        with override_settings(API_TOUCH_BATCH_SIZE=2):
+            cls.attribute1.value = "Blue"
+            cls.attribute1.save()
+            cls.over_batch = cls.get_modified_at()
+            touch_linked_products(cls.attribute1.id)
+            cls.touched_later = cls.get_modified_at()
+
+    @classmethod
+    def get_modified_at(cls):
+        return dict(Product.objects.values_list("id", "modified_at"))
+
+    def test_should_not_touch_the_products_when_nothing_changed(self):
+        self.assertEqual(self.before, self.unchanged)
+
+    def test_should_touch_the_products_when_the_value_changed(self):
+        self.assertGreater(self.changed[self.product2.id], self.before[self.product2.id])
+        self.assertEqual(self.before[self.product1.id], self.changed[self.product1.id])
+
+    def test_should_leave_more_than_a_batch_of_products_to_a_background_thread(self):
+        self.assertEqual(self.changed, self.over_batch)
+
+    def test_should_touch_every_product_a_batch_at_a_time(self):
+        self.assertTrue(all(self.touched_later[pk] > self.over_batch[pk] for pk in self.over_batch))
+
+
+class WhenRequestingDifferentProductListsWithTheSameEtag(TestCaseWithFixtureData):
+    """This class defines the test suite for keeping the ETag of differently filtered lists apart"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenRequestingDifferentProductListsWithTheSameEtag, cls).setUpTestData()
+
+        cls.client = APIClient()
+        etag = cls.client.get(reverse("products"), data={"manufacturer": "Apple"})["ETag"]
+        cls.response = cls.client.get(reverse("products"), data={"manufacturer": "Logitech"}, HTTP_IF_NONE_MATCH=etag)
+
+    def test_should_return_the_other_list(self):
+        self.assertEqual(200, self.response.status_code)
+
+
+class WhenRequestingAMissingProductWithAnEtag(TestCaseWithFixtureData):
+    """This class defines the test suite for conditional requests for products that do not exist"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenRequestingAMissingProductWithAnEtag, cls).setUpTestData()
+
+        cls.response = APIClient().get(reverse("product_details", kwargs={'pk': 0}), HTTP_IF_NONE_MATCH="*")
+
+    def test_should_return_not_found(self):
+        self.assertEqual(404, self.response.status_code)
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.cache import count_cache
+from api.models import Attribute
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenWalkingTheProductListWithoutACount(TestCaseWithFixtureData):
+    """This class defines the test suite for paging through every product with pagination=nocount"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenWalkingTheProductListWithoutACount, cls).setUpTestData()
+
+        for index in range(22):
+            Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget").save()
+
+        cls.client = APIClient()
+        cls.pages, cls.queries = [], []
+        url = reverse("products") + "?pagination=nocount&limit=10"
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = cls.client.get(url)
+            cls.pages.append(response)
+            cls.queries.append([query["sql"] for query in queries.captured_queries])
+            url = response.data["next"]
+
+    def test_should_receive_a_200_ok_response_for_every_page(self):
+        self.assertEqual([status.HTTP_200_OK] * 3, [page.status_code for page in self.pages])
+
+    def test_should_return_every_product_exactly_once(self):
+        ids = [product["id"] for page in self.pages for product in page.data["results"]]
+        self.assertCountEqual(Product.objects.values_list("id", flat=True), ids)
+
+    def test_should_not_include_a_count(self):
+        self.assertNotIn("count", self.pages[0].data)
+
+    def test_should_only_count_the_products_for_the_validators(self):
+        self.assertEqual(1, sum("COUNT(" in sql for sql in self.queries[0]))
+
+    def test_previous_link_should_return_the_page_before(self):
+        response = self.client.get(self.pages[1].data["previous"])
+        self.assertEqual(self.pages[0].data["results"], response.data["results"])
+
+
+class WhenPagingTheAttributeListWithACachedCount(TestCaseWithFixtureData):
+    """This class defines the test suite for the count of the attributes listed with pagination=cached-count"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenPagingTheAttributeListWithACachedCount, cls).setUpTestData()
+
+        cache.clear()
+        cls.client = APIClient()
+        url = reverse("attributes") + "?pagination=cached-count&limit=2"
+        cls.first = cls.client.get(url)
+        Attribute(type="Material", value="Wood").save()
+        cls.cached = cls.client.get(url)
+        with override_settings(API_COUNT_REFRESH_AFTER=-1), \
+                mock.patch.object(count_cache, "start_refresh", lambda refresh: refresh()):
+            cls.stale = cls.client.get(url)
+        cls.refreshed = cls.client.get(url)
+
+    def test_should_count_the_attributes_the_first_time(self):
+        self.assertEqual((3, False), (self.first.data["count"], self.first.data["count_cached"]))
+
+    def test_should_serve_the_cached_count_afterwards(self):
+        self.assertEqual((3, True), (self.cached.data["count"], self.cached.data["count_cached"]))
+
+    def test_should_serve_the_stale_count_while_refreshing_it(self):
+        self.assertEqual(3, self.stale.data["count"])
+
+    def test_should_serve_the_refreshed_count_once_counted_again(self):
+        self.assertEqual(4, self.refreshed.data["count"])
+
+    def test_should_link_to_the_next_page(self):
+        self.assertIn("offset=2", self.first.data["next"])
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.facets import stored_facets
+from api.jobs import run_job
+from api.models import Attribute
+from api.models import DeletionJob
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+ProductAttribute = Product.attributes.through
+
+
+class WhenDeletingAnAttributeLinkedToManyProducts(TestCaseWithFixtureData):
+    """This class defines the test suite for deleting an attribute with a chunked background job"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenDeletingAnAttributeLinkedToManyProducts, cls).setUpTestData()
+
+        for index in range(5):
+            product = Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget")
+            product.save()
+            product.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product1.attributes.add(cls.attribute1)
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(reverse("attribute_delete", kwargs={'pk': cls.attribute1.id}))
+        cls.detail_while_hidden = cls.client.get(reverse("attribute_details", kwargs={'pk': cls.attribute1.id}))
+        cls.list_while_hidden = cls.client.get(reverse("attributes"))
+        cls.product_while_hidden = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}))
+        cls.filtered_while_hidden = [cls.client.get(reverse("products"), data={field: value}) for field, value in (
+            ("attributes__type", cls.attribute1.type), ("attributes__value", cls.attribute1.value))]
+        cls.pending = cls.client.get(cls.response.data["url"])
+        with override_settings(API_DELETION_BATCH_SIZE=2):
+            run_job(cls.response.data["id"])
+        cls.done = cls.client.get(cls.response.data["url"])
+
+    def test_should_receive_a_202_accepted_response(self):
+        self.assertEqual(status.HTTP_202_ACCEPTED, self.response.status_code)
+
+    def test_should_point_at_the_job(self):
+        self.assertEqual(self.response.data["url"], self.response["Location"])
+
+    def test_should_hide_the_attribute_right_away(self):
+        self.assertEqual(status.HTTP_404_NOT_FOUND, self.detail_while_hidden.status_code)
+        self.assertNotIn(self.attribute1.id, [item["id"] for item in self.list_while_hidden.data["results"]])
+        self.assertEqual([], self.product_while_hidden.data["attributes"])
+
+    def test_should_not_filter_products_on_the_hidden_attribute(self):
+        self.assertEqual([[], []], [response.data["results"] for response in self.filtered_while_hidden])
+
+    def test_should_count_the_links_to_remove(self):
+        self.assertEqual((DeletionJob.PENDING, 6, 0),
+                         (self.pending.data["status"], self.pending.data["total"], self.pending.data["processed"]))
+
+    def test_should_finish_the_job(self):
+        self.assertEqual((DeletionJob.DONE, 6, 6),
+                         (self.done.data["status"], self.done.data["total"], self.done.data["processed"]))
+
+    def test_should_delete_the_attribute_and_its_links(self):
+        self.assertFalse(Attribute.all_objects.filter(pk=self.attribute1.id).exists())
+        self.assertFalse(ProductAttribute.objects.filter(attribute_id=self.attribute1.id).exists())
+
+    def test_should_leave_the_other_links(self):
+        self.assertEqual(5, ProductAttribute.objects.filter(attribute_id=self.attribute2.id).count())
+
+    def test_should_not_count_the_attribute_in_the_facets(self):
+        self.assertEqual([("Number Of Wheels", "4", 5)],
+                         [(facet["type"], facet["value"], facet["count"]) for facet in stored_facets()["attributes"]])
+
+
+class WhenDeletingProductsInBulk(TestCaseWithFixtureData):
+    """This class defines the test suite for deleting many products with a chunked background job"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenDeletingProductsInBulk, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product2.attributes.add(cls.attribute1)
+
+        cls.client = APIClient()
+        cls.missing_id = cls.product3.id + 1000
+        cls.response = cls.client.post(reverse("product_bulk_delete"),
+                                       data={"product_ids": [cls.product1.id, cls.product2.id, cls.missing_id]},
+                                       format="json")
+        with override_settings(API_DELETION_BATCH_SIZE=1):
+            call_command("run_deletion_jobs", stdout=StringIO())
+        cls.done = cls.client.get(cls.response.data["url"])
+
+    def test_should_receive_a_202_accepted_response(self):
+        self.assertEqual(status.HTTP_202_ACCEPTED, self.response.status_code)
+
+    def test_should_report_the_products_that_do_not_exist(self):
+        self.assertEqual([self.missing_id], self.response.data["missing_product_ids"])
+
+    def test_should_finish_the_job(self):
+        self.assertEqual((DeletionJob.DONE, 2, 2),
+                         (self.done.data["status"], self.done.data["total"], self.done.data["processed"]))
+
+    def test_should_delete_the_products_and_their_links(self):
+        self.assertEqual([self.product3.id], list(Product.objects.values_list("id", flat=True)))
+        self.assertFalse(ProductAttribute.objects.exists())
+
+    def test_should_update_the_facet_counts(self):
+        facets = stored_facets()
+        self.assertEqual([("HP", 1)], [(facet["value"], facet["count"]) for facet in facets["manufacturer"]])
+        self.assertEqual([], facets["attributes"])
+
+
+class WhenSendingAPostWithoutProductsToProductBulkDeleteView(TestCaseWithFixtureData):
+    """This class defines the test suite for rejecting a bulk delete without products"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostWithoutProductsToProductBulkDeleteView, cls).setUpTestData()
+
+        cls.response = APIClient().post(reverse("product_bulk_delete"), data={"product_ids": []}, format="json")
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, self.response.status_code)
@@ -0,0 +1,96 @@
+from django.db import connection
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.cache import product_cache
+from api.mixins import QueryCounter
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenReadingTheSameProductTwice(TestCaseWithFixtureData):
+    """This class defines the test suite for serving a product detail from the cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenReadingTheSameProductTwice, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        hits, misses = product_cache.hits, product_cache.misses
+
+        cls.client = APIClient()
+        cls.first_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}))
+        cls.counter = QueryCounter()
+        with connection.execute_wrapper(cls.counter):
+            cls.second_response = cls.client.get(reverse("product_details", kwargs={'pk': cls.product1.id}))
+        cls.hits, cls.misses = product_cache.hits - hits, product_cache.misses - misses
+        cls.stats_response = cls.client.get(reverse("cache_stats"))
+
+    def test_second_read_should_not_query_the_database(self):
+        self.assertEqual(0, self.counter.count)
+
+    def test_second_read_should_match_the_first(self):
+        self.assertEqual(self.first_response.data, self.second_response.data)
+
+    def test_should_count_a_miss_then_a_hit(self):
+        self.assertEqual((1, 1), (self.hits, self.misses))
+
+    def test_stats_should_expose_the_counters(self):
+        self.assertEqual(product_cache.stats(), self.stats_response.data["product"])
+
+
+class WhenChangingACachedProduct(TestCaseWithFixtureData):
+    """This class defines the test suite for invalidating a cached product when it or its attributes change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenChangingACachedProduct, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.product2.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        for product in (cls.product1, cls.product2, cls.product3):
+            cls.client.get(reverse("product_details", kwargs={'pk': product.id}))
+
+        cls.client.post(reverse("product_details", kwargs={'pk': cls.product1.id}),
+                        data={"name": "Apple Watch", "price": 399.99, "manufacturer": "Apple",
+                              "product_type": "Smartwatch"},
+                        format="json")
+        cls.client.post(reverse("attribute_details", kwargs={'pk': cls.attribute1.id}),
+                        data={"type": "Color", "value": "Blue"}, format="json")
+        cls.client.post(reverse("product_add_attribute", kwargs={'pk': cls.product3.id}),
+                        data={"attribute_id": cls.attribute2.id}, format="json")
+        cls.client.post(reverse("product_attribute_links"),
+                        data={"product_ids": [cls.product2.id], "add_attribute_ids": [cls.attribute3.id]},
+                        format="json")
+
+        cls.responses = [cls.client.get(reverse("product_details", kwargs={'pk': product.id})).data
+                         for product in (cls.product1, cls.product2, cls.product3)]
+
+    def test_should_return_the_updated_product(self):
+        self.assertEqual("Apple Watch", self.responses[0]["name"])
+
+    def test_should_return_the_updated_attribute_in_every_product_that_embeds_it(self):
+        self.assertEqual(["Blue", "Blue"], [data["attributes"][0]["value"] for data in self.responses[:2]])
+
+    def test_should_return_attributes_linked_through_add_attribute(self):
+        self.assertEqual([self.attribute2.id], [attribute["id"] for attribute in self.responses[2]["attributes"]])
+
+    def test_should_return_attributes_linked_in_bulk(self):
+        self.assertCountEqual([self.attribute1.id, self.attribute3.id],
+                              [attribute["id"] for attribute in self.responses[1]["attributes"]])
+
+
+class WhenDeletingACachedAttribute(TestCaseWithFixtureData):
+    """This class defines the test suite for invalidating a cached attribute when it is deleted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenDeletingACachedAttribute, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.client.get(reverse("attribute_details", kwargs={'pk': cls.attribute1.id}))
+        cls.client.post(reverse("attribute_delete", kwargs={'pk': cls.attribute1.id}))
+        cls.response = cls.client.get(reverse("attribute_details", kwargs={'pk': cls.attribute1.id}))
+
+    def test_should_receive_a_404_not_found_response(self):
+        self.assertEqual(404, self.response.status_code)
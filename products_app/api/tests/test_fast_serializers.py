@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.fast_serializers import fast_attribute_serializer
+from api.fast_serializers import fast_product_serializer
+from api.models import Attribute
+from api.models import Product
+from api.serializers import AttributeSerializer
+from api.serializers import ProductSerializer
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenSerializingWithTheFastReadSerializers(TestCaseWithFixtureData):
+    """This class shows that the fast read serializers give the same output as the model serializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSerializingWithTheFastReadSerializers, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute3, cls.attribute1)
+        cls.product2.attributes.add(cls.attribute2)
+        cls.cheap_product = Product(name="Sticker", price=Decimal("0.5"), manufacturer="Acme", product_type="Sticker")
+        cls.cheap_product.save()
+
+    def assertSameOutput(self, expected, actual):
+        self.assertEqual(JSONRenderer().render(expected), JSONRenderer().render(actual))
+
+    def test_products_should_match_the_product_serializer(self):
+        queryset = Product.objects.order_by('id')
+        self.assertSameOutput(ProductSerializer(queryset.prefetch_related('attributes'), many=True).data,
+                              fast_product_serializer.serialize(fast_product_serializer.prepare(queryset)))
+
+    def test_attributes_should_match_the_attribute_serializer(self):
+        queryset = Attribute.objects.all()
+        self.assertSameOutput(AttributeSerializer(queryset, many=True).data,
+                              fast_attribute_serializer.serialize(fast_attribute_serializer.prepare(queryset)))
+
+    def test_should_match_in_another_time_zone(self):
+        queryset = Product.objects.order_by('id')
+        with timezone.override("America/New_York"):
+            self.assertSameOutput(ProductSerializer(queryset.prefetch_related('attributes'), many=True).data,
+                                  fast_product_serializer.serialize(fast_product_serializer.prepare(queryset)))
+
+    def test_product_views_should_match_the_product_serializer(self):
+        client = APIClient()
+        listed = client.get(reverse("products"), data={"limit": 10}).data["results"]
+        detail = client.get(reverse("product_details", kwargs={'pk': self.product1.id})).data
+        self.assertSameOutput(ProductSerializer(Product.objects.all(), many=True).data,
+                              sorted(listed, key=lambda product: product["id"]))
+        self.assertSameOutput(ProductSerializer(self.product1).data, detail)
@@ -0,0 +1,105 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from api.models import Attribute
+from api.models import Product
+from api.views import AttributeList
+from api.views import ProductList
+
+FILTER_VALUES = {
+    'name': "iWatch",
+    'price': Decimal("399.99"),
+    'manufacturer': "Apple",
+    'product_type': "Smartwatch",
+    'release_date': timezone.now(),
+    'created_at': timezone.now(),
+    'modified_at': timezone.now(),
+    'attributes__type': "Color",
+    'attributes__value': "Red",
+    'type': "Color",
+    'value': "Red",
+}
+
+
+# The value to filter on with each lookup other than exact, given the exact value.
+LOOKUP_VALUES = {
+    'gte': lambda value: value,
+    'lte': lambda value: value,
+    'in': lambda value: [value, value],
+    'range': lambda value: (value, value),
+}
+
+
+def lookups(filter_fields):
+    """Return the filter name and lookup of every filter in a list or dict of filter_fields."""
+    if isinstance(filter_fields, dict):
+        return [(field, lookup) for field, field_lookups in filter_fields.items() for lookup in field_lookups]
+    return [(field, 'exact') for field in filter_fields]
+
+
+def lookup_filter(field, lookup):
+    """Return the queryset filter for a lookup on the field, with a value of the right shape."""
+    if lookup == 'exact':
+        return {field: FILTER_VALUES[field]}
+    return {f"{field}__{lookup}": LOOKUP_VALUES[lookup](FILTER_VALUES[field])}
+
+
+def explain(queryset):
+    """Return the detail column of each step of SQLite's query plan for the queryset."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class WhenExplainingTheSupportedListFilters(TestCase):
+    """This class checks that every filter the list views accept is answered from an index rather than a scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plans = {}
+        for filter_ in cls.product_filters():
+            value, = lookup_filter(filter_.field_name, filter_.lookup_expr).values()
+            cls.plans[f"products?{filter_.field_name}__{filter_.lookup_expr}"] = explain(
+                filter_.filter(Product.objects.all(), value))
+        for field, lookup in lookups(AttributeList.filter_fields):
+            cls.plans[f"attributes?{field}__{lookup}"] = explain(
+                Attribute.objects.filter(**lookup_filter(field, lookup)))
+
+    @classmethod
+    def product_filters(cls):
+        return ProductList.filter_class(queryset=Product.objects.all()).filters.values()
+
+    def test_should_explain_every_filter(self):
+        self.assertEqual(len(self.product_filters()) + len(lookups(AttributeList.filter_fields)), len(self.plans))
+
+    def test_no_filter_should_scan_a_table(self):
+        scans = {filter_name: plan for filter_name, plan in self.plans.items()
+                 if any(step.startswith("SCAN") for step in plan)}
+        self.assertEqual({}, scans)
+
+    def test_attribute_filters_should_use_the_reverse_through_index(self):
+        plan = " ".join(self.plans["products?attributes__type__exact"])
+        self.assertIn("product_attributes_reverse_idx", plan)
+
+
+class WhenExplainingTheSupportedOrderings(TestCase):
+    """This class checks that every ordering the product list accepts walks an index rather than sorting the rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plans = {}
+        for field in ProductList.ordering_fields:
+            for ordering in (field, f"-{field}"):
+                tie_breaker = "-id" if ordering.startswith("-") else "id"
+                cls.plans[ordering] = explain(Product.objects.order_by(ordering, tie_breaker)[:10])
+        cls.plans["price range by price"] = explain(
+            Product.objects.filter(price__gte=100, price__lte=500).order_by("-price", "-id")[:10])
+
+    def test_no_ordering_should_sort_in_a_temporary_b_tree(self):
+        sorts = {ordering: plan for ordering, plan in self.plans.items()
+                 if any("TEMP B-TREE" in step for step in plan)}
+        self.assertEqual({}, sorts)
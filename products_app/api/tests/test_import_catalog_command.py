@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.models import Attribute
+from api.models import ImportCheckpoint
+from api.models import Product
+
+CATALOG = [
+    {"name": "iWatch", "price": "399.99", "manufacturer": "Apple", "product_type": "Smartwatch",
+     "attributes": [{"type": "Color", "value": "Red"}]},
+    {"name": "iPad", "price": "329.00", "manufacturer": "Apple", "product_type": "Tablet",
+     "attributes": [{"type": "Color", "value": "Red"}, {"type": "Storage", "value": "256GB"}]},
+    {"name": "No Price", "manufacturer": "Apple", "product_type": "Tablet"},
+    {"name": "MX Keys", "price": "99.99", "manufacturer": "Logitech", "product_type": "Keyboard",
+     "attributes": [{"type": "Color", "value": "Black"}]},
+]
+
+
+def write_catalog(lines):
+    catalog = tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False)
+    with catalog:
+        catalog.write("\n".join(json.dumps(line) for line in lines) + "\n")
+    return catalog.name
+
+
+class WhenImportingACatalog(TestCase):
+    """This class defines the test suite for importing a catalog file in batches"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Attribute(type="Color", value="Red").save()
+        cls.path = write_catalog(CATALOG)
+        cls.stdout, cls.stderr = StringIO(), StringIO()
+        call_command("import_catalog", cls.path, batch_size=2, stdout=cls.stdout, stderr=cls.stderr)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+        super(WhenImportingACatalog, cls).tearDownClass()
+
+    def test_should_import_the_valid_products(self):
+        self.assertCountEqual(["iWatch", "iPad", "MX Keys"], Product.objects.values_list("name", flat=True))
+
+    def test_should_report_the_invalid_lines(self):
+        self.assertIn("Skipping line 3", self.stderr.getvalue())
+
+    def test_should_deduplicate_attributes_on_type_and_value(self):
+        self.assertEqual(1, Attribute.objects.filter(type="Color", value="Red").count())
+        self.assertEqual(3, Attribute.objects.count())
+
+    def test_should_link_the_attributes(self):
+        self.assertCountEqual([("Color", "Red"), ("Storage", "256GB")],
+                              Product.objects.get(name="iPad").attributes.values_list("type", "value"))
+
+    def test_should_report_progress_for_each_batch(self):
+        self.assertEqual(3, self.stdout.getvalue().count("rows/sec"))
+
+    def test_should_checkpoint_the_end_of_the_file(self):
+        checkpoint = ImportCheckpoint.objects.get(source=self.path)
+        self.assertEqual((os.path.getsize(self.path), 4), (checkpoint.offset, checkpoint.line_number))
+
+
+class WhenResumingAnInterruptedImport(TestCase):
+    """This class defines the test suite for resuming an import from its last committed batch"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.path = write_catalog(CATALOG)
+        with open(cls.path, "rb") as catalog:
+            first_line = catalog.readline()
+        Product(name="iWatch", price=399.99, manufacturer="Apple", product_type="Smartwatch").save()
+        ImportCheckpoint(source=cls.path, offset=len(first_line), line_number=1).save()
+
+        call_command("import_catalog", cls.path, resume=True, stdout=StringIO(), stderr=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.path)
+        super(WhenResumingAnInterruptedImport, cls).tearDownClass()
+
+    def test_should_not_import_the_committed_lines_again(self):
+        self.assertEqual(1, Product.objects.filter(name="iWatch").count())
+
+    def test_should_import_the_remaining_lines(self):
+        self.assertTrue(Product.objects.filter(name="MX Keys").exists())
@@ -0,0 +1,100 @@
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.models import Attribute
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenWalkingTheProductListWithCursorPagination(TestCaseWithFixtureData):
+    """This class defines the test suite for paging through every product with cursors"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenWalkingTheProductListWithCursorPagination, cls).setUpTestData()
+
+        for index in range(22):
+            Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget").save()
+
+        cls.client = APIClient()
+        cls.pages = []
+        url = reverse("products") + "?pagination=cursor&limit=10"
+        while url:
+            response = cls.client.get(url)
+            cls.pages.append(response)
+            url = response.data["next"]
+
+    def test_should_receive_a_200_ok_response_for_every_page(self):
+        self.assertEqual([status.HTTP_200_OK] * 3, [page.status_code for page in self.pages])
+
+    def test_should_return_every_product_exactly_once(self):
+        ids = [product["id"] for page in self.pages for product in page.data["results"]]
+        self.assertEqual(sorted(Product.objects.values_list("id", flat=True)), ids)
+
+    def test_should_not_include_a_count(self):
+        self.assertNotIn("count", self.pages[0].data)
+
+    def test_first_page_should_have_no_previous_link(self):
+        self.assertIsNone(self.pages[0].data["previous"])
+
+    def test_previous_link_should_return_the_page_before(self):
+        response = self.client.get(self.pages[1].data["previous"])
+        self.assertEqual(self.pages[0].data["results"], response.data["results"])
+
+    def test_previous_link_of_the_first_page_should_be_empty(self):
+        response = self.client.get(self.pages[1].data["previous"])
+        self.assertIsNone(response.data["previous"])
+
+
+class WhenSendingAnInvalidCursorToProductListView(TestCaseWithFixtureData):
+    """This class defines the test suite for a cursor that was not produced by the API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAnInvalidCursorToProductListView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.get(reverse("products"), data={"pagination": "cursor", "cursor": "not-a-cursor"})
+
+    def test_should_receive_a_404_not_found_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WhenListingProductsWithoutAPaginationMode(TestCaseWithFixtureData):
+    """This class shows that limit/offset stays the default pagination"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenListingProductsWithoutAPaginationMode, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.get(reverse("products"), data={"limit": 1, "offset": 1})
+
+    def test_should_include_a_count(self):
+        self.assertEqual(3, self.response.data["count"])
+
+    def test_should_skip_the_offset(self):
+        self.assertEqual(1, len(self.response.data["results"]))
+        self.assertIn("offset=2", self.response.data["next"])
+
+
+class WhenWalkingTheAttributeListWithCursorPagination(TestCaseWithFixtureData):
+    """This class defines the test suite for paging through the attributes with cursors"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenWalkingTheAttributeListWithCursorPagination, cls).setUpTestData()
+
+        Attribute(type="Color", value="Blue").save()
+
+        cls.client = APIClient()
+        cls.first_page = cls.client.get(reverse("attributes"), data={"pagination": "cursor", "limit": 2})
+        cls.second_page = cls.client.get(cls.first_page.data["next"])
+
+    def test_should_return_every_attribute_exactly_once(self):
+        ids = [attribute["id"] for attribute in self.first_page.data["results"] + self.second_page.data["results"]]
+        self.assertEqual(sorted(Attribute.objects.values_list("id", flat=True)), ids)
+
+    def test_last_page_should_have_no_next_link(self):
+        self.assertIsNone(self.second_page.data["next"])
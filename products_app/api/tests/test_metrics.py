@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import connection
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.metrics import LATENCY_BUCKETS
+from api.metrics import MetricsMiddleware
+from api.metrics import MetricsRegistry
+from api.metrics import render_prometheus
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+EXITED_PID = 2 ** 22 + 1
+
+
+def sample(text, line_start):
+    """Return the value of the sample whose line starts with the name and labels given."""
+    return float(next(line for line in text.splitlines() if line.startswith(line_start)).rsplit(" ", 1)[1])
+
+
+class WhenScrapingTheMetricsRoute(TestCaseWithFixtureData):
+    """This class defines the test suite for the Prometheus metrics of the requests a worker answered"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenScrapingTheMetricsRoute, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.before = cls.client.get(reverse("metrics")).content.decode()
+        cls.client.get(reverse("products"))
+        cls.client.get(reverse("product_details", kwargs={"pk": cls.product1.id}))
+        cls.client.get(reverse("product_details", kwargs={"pk": 100000}))
+        cls.response = cls.client.get(reverse("metrics"))
+        cls.text = cls.response.content.decode()
+
+    def count(self, text, labels):
+        try:
+            return sample(text, f'api_requests_total{{{labels}}}')
+        except StopIteration:
+            return 0
+
+    def test_should_receive_a_200_ok_response_in_the_prometheus_format(self):
+        self.assertEqual(status.HTTP_200_OK, self.response.status_code)
+        self.assertTrue(self.response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+    def test_should_count_requests_by_url_name_and_status(self):
+        for labels in ('url_name="products",method="GET",status="200"',
+                       'url_name="product_details",method="GET",status="200"',
+                       'url_name="product_details",method="GET",status="404"'):
+            self.assertEqual(1, self.count(self.text, labels) - self.count(self.before, labels), labels)
+
+    def test_should_have_latency_and_query_histograms(self):
+        self.assertIn('api_request_duration_seconds_bucket{url_name="products",method="GET",le="+Inf"}', self.text)
+        self.assertIn('api_request_queries_count{url_name="products",method="GET"}', self.text)
+
+    def test_should_report_the_cache_hit_ratios(self):
+        self.assertIn('api_cache_hit_ratio{cache="product"}', self.text)
+
+    def test_should_refuse_other_clients(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.7")
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+
+class WhenCountingTheQueriesOfARequest(TestCase):
+    """This class shows that the metrics count the queries of a request the way the query budgets do"""
+
+    def test_should_leave_savepoints_out(self):
+        def get_response(request):
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return HttpResponse()
+
+        registry = MetricsRegistry()
+        with mock.patch("api.metrics.registry", registry):
+            MetricsMiddleware(get_response)(RequestFactory().get("/"))
+        (histogram,) = [histogram for (name, _), histogram in registry.histograms.items()
+                        if name == "api_request_queries"]
+        self.assertEqual((1, 1), (histogram["count"], histogram["sum"]))
+
+
+class WhenAddingUpTheMetricsOfSeveralWorkers(SimpleTestCase):
+    """This class shows that the metrics of every worker writing to API_METRICS_DIR are added up"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_should_add_up_counters_and_histograms(self):
+        labels = (("url_name", "products"), ("method", "GET"))
+        with override_settings(API_METRICS_DIR=self.directory):
+            workers = [MetricsRegistry() for _ in range(3)]
+            for index, worker in enumerate(workers):
+                worker.inc("api_requests_total", labels + (("status", "200"),), index + 1)
+                worker.observe("api_request_duration_seconds", labels, LATENCY_BUCKETS, 0.02 * (index + 1))
+                worker.flush(force=True)
+            text = render_prometheus(MetricsRegistry().collect())
+
+        self.assertEqual(6, sample(text, 'api_requests_total{url_name="products",method="GET",status="200"}'))
+        self.assertEqual(3, sample(text, 'api_request_duration_seconds_count{url_name="products",method="GET"}'))
+        bucket = 'api_request_duration_seconds_bucket{url_name="products",method="GET",'
+        self.assertEqual(1, sample(text, bucket + 'le="0.025"}'))
+        self.assertEqual(3, sample(text, bucket + 'le="0.1"}'))
+
+    def test_should_not_overwrite_the_snapshot_of_a_worker_that_had_the_same_pid(self):
+        labels = (("url_name", "products"), ("method", "GET"), ("status", "200"))
+        with override_settings(API_METRICS_DIR=self.directory):
+            for amount in (5, 1):
+                worker = MetricsRegistry()
+                worker.inc("api_requests_total", labels, amount)
+                worker.flush(force=True)
+            text = render_prometheus(MetricsRegistry().collect())
+
+        self.assertEqual(6, sample(text, 'api_requests_total{url_name="products",method="GET",status="200"}'))
+
+    def flush_exited_worker(self, amount):
+        """Write the snapshot of a worker, under a pid whose process has since exited."""
+        worker = MetricsRegistry()
+        worker.inc("api_requests_total", (("url_name", "products"), ("method", "GET"), ("status", "200")), amount)
+        with mock.patch("api.metrics.os.getpid", return_value=EXITED_PID):
+            worker.flush(force=True)
+
+    def test_should_fold_the_snapshots_of_exited_workers_into_the_archive(self):
+        line = 'api_requests_total{url_name="products",method="GET",status="200"}'
+        with override_settings(API_METRICS_DIR=self.directory), \
+                mock.patch("api.metrics.worker_is_running", side_effect=lambda pid: pid != EXITED_PID):
+            self.flush_exited_worker(5)
+            self.flush_exited_worker(1)
+            first = render_prometheus(MetricsRegistry().collect())
+            self.flush_exited_worker(2)
+            second = render_prometheus(MetricsRegistry().collect())
+            names = os.listdir(self.directory)
+
+        self.assertEqual((6, 8), (sample(first, line), sample(second, line)))
+        self.assertIn("archive.json", names)
+        self.assertFalse([name for name in names if name.startswith(f"worker-{EXITED_PID}-")])
+
+    def test_should_not_count_a_folded_snapshot_twice_when_removing_it_failed(self):
+        line = 'api_requests_total{url_name="products",method="GET",status="200"}'
+        with override_settings(API_METRICS_DIR=self.directory), \
+                mock.patch("api.metrics.worker_is_running", side_effect=lambda pid: pid != EXITED_PID):
+            self.flush_exited_worker(5)
+            with mock.patch("api.metrics.os.remove", side_effect=FileNotFoundError):
+                first = render_prometheus(MetricsRegistry().collect())
+            second = render_prometheus(MetricsRegistry().collect())
+
+        self.assertEqual((5, 5), (sample(first, line), sample(second, line)))
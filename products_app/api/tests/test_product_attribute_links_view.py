@@ -0,0 +1,100 @@
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenSendingAPostToLinkAndUnlinkAttributesToProductAttributeLinksView(TestCaseWithFixtureData):
+    """This class defines the test suite for linking and unlinking attributes on several products at once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostToLinkAndUnlinkAttributesToProductAttributeLinksView, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product2.attributes.add(cls.attribute2)
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_attribute_links"),
+            data={
+                "product_ids": [cls.product1.id, cls.product2.id, cls.product1.id + 2000],
+                "add_attribute_ids": [cls.attribute1.id, cls.attribute3.id],
+                "remove_attribute_ids": [cls.attribute2.id],
+            },
+            format="json"
+        )
+
+    def test_should_receive_a_200_ok_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_200_OK)
+
+    def test_should_only_create_the_missing_links(self):
+        self.assertEqual(3, self.response.data["created"])
+
+    def test_should_delete_the_unlinked_attributes(self):
+        self.assertEqual(2, self.response.data["deleted"])
+
+    def test_should_report_the_products_that_do_not_exist(self):
+        self.assertEqual([self.product1.id + 2000], self.response.data["missing_product_ids"])
+
+    def test_products_should_have_the_new_set_of_attributes(self):
+        expected = [self.attribute1.id, self.attribute3.id]
+        self.assertCountEqual(expected, self.product1.attributes.values_list("id", flat=True))
+        self.assertCountEqual(expected, self.product2.attributes.values_list("id", flat=True))
+
+    def test_other_products_should_be_untouched(self):
+        self.assertFalse(self.product3.attributes.exists())
+
+
+class WhenSendingAPostForAnInvalidAttributeToProductAttributeLinksView(TestCaseWithFixtureData):
+    """This class defines the test suite for linking an attribute that does not exist"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostForAnInvalidAttributeToProductAttributeLinksView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_attribute_links"),
+            data={"product_ids": [cls.product1.id], "add_attribute_ids": [cls.attribute1.id + 2000]},
+            format="json"
+        )
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_should_not_link_anything(self):
+        self.assertFalse(self.product1.attributes.exists())
+
+
+class WhenSendingAPostThatAddsAndRemovesTheSameAttributeToProductAttributeLinksView(TestCaseWithFixtureData):
+    """This class defines the test suite for a request that both adds and removes an attribute"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostThatAddsAndRemovesTheSameAttributeToProductAttributeLinksView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_attribute_links"),
+            data={"product_ids": [cls.product1.id], "add_attribute_ids": [cls.attribute1.id],
+                  "remove_attribute_ids": [cls.attribute1.id]},
+            format="json"
+        )
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WhenSendingAPostForTooManyProductsToProductAttributeLinksView(TestCaseWithFixtureData):
+    """This class defines the test suite for changing the links of more products than API_ATTRIBUTE_LINKS_MAX_ITEMS"""
+
+    def test_should_receive_a_400_bad_request_response(self):
+        with override_settings(API_ATTRIBUTE_LINKS_MAX_ITEMS=2):
+            response = APIClient().post(reverse("product_attribute_links"), format="json", data={
+                "product_ids": [self.product1.id, self.product2.id, self.product3.id],
+                "add_attribute_ids": [self.attribute1.id]})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertFalse(self.product1.attributes.exists())
@@ -0,0 +1,148 @@
+from unittest import mock
+
+from django.db import connection
+from django.db import transaction
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.bulk import bulk_insert
+from api.models import Attribute
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenSendingAPostOfValidProductsToProductBulkCreateView(TestCaseWithFixtureData):
+    """This class defines the test suite for a bulk create where every product is valid"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostOfValidProductsToProductBulkCreateView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_bulk_create"),
+            [
+                {"name": "iPad", "price": 329.00, "manufacturer": "Apple", "product_type": "Tablet",
+                 "attribute_ids": [cls.attribute1.id, cls.attribute3.id]},
+                {"name": "MX Keys", "price": 99.99, "manufacturer": "Logitech", "product_type": "Keyboard"},
+            ],
+            format="json"
+        )
+
+    def test_should_receive_a_201_created_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_201_CREATED)
+
+    def test_should_report_every_product_as_created(self):
+        self.assertEqual(2, self.response.data["created"])
+        self.assertEqual([status.HTTP_201_CREATED] * 2, [result["status"] for result in self.response.data["results"]])
+
+    def test_should_return_the_ids_of_the_created_products(self):
+        ids = [result["id"] for result in self.response.data["results"]]
+        self.assertEqual(["iPad", "MX Keys"], [Product.objects.get(pk=pk).name for pk in ids])
+
+    def test_should_link_the_requested_attributes(self):
+        product = Product.objects.get(pk=self.response.data["results"][0]["id"])
+        self.assertCountEqual([self.attribute1.id, self.attribute3.id],
+                              product.attributes.values_list("id", flat=True))
+
+
+class WhenSendingAPostWithSomeInvalidProductsToProductBulkCreateView(TestCaseWithFixtureData):
+    """This class defines the test suite for a bulk create where some of the products are invalid"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostWithSomeInvalidProductsToProductBulkCreateView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_bulk_create"),
+            [
+                {"name": "iPad", "price": 329.00, "manufacturer": "Apple", "product_type": "Tablet"},
+                {"name": "No Price", "manufacturer": "Apple", "product_type": "Tablet"},
+                {"name": "Bad Link", "price": 1, "manufacturer": "Apple", "product_type": "Tablet",
+                 "attribute_ids": [cls.attribute1.id + 2000]},
+            ],
+            format="json"
+        )
+
+    def test_should_receive_a_207_multi_status_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_207_MULTI_STATUS)
+
+    def test_should_create_the_valid_products(self):
+        self.assertTrue(Product.objects.filter(name="iPad").exists())
+
+    def test_should_report_the_errors_of_each_invalid_product(self):
+        results = self.response.data["results"]
+        self.assertIn("price", results[1]["errors"])
+        self.assertIn("attribute_ids", results[2]["errors"])
+
+    def test_should_not_create_the_invalid_products(self):
+        self.assertFalse(Product.objects.filter(name__in=["No Price", "Bad Link"]).exists())
+
+
+class WhenSendingAnAtomicPostWithAnInvalidProductToProductBulkCreateView(TestCaseWithFixtureData):
+    """This class defines the test suite for an all-or-nothing bulk create that has an invalid product"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAnAtomicPostWithAnInvalidProductToProductBulkCreateView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_bulk_create") + "?atomic=true",
+            [
+                {"name": "iPad", "price": 329.00, "manufacturer": "Apple", "product_type": "Tablet"},
+                {"name": "No Price", "manufacturer": "Apple", "product_type": "Tablet"},
+            ],
+            format="json"
+        )
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_should_not_create_any_product(self):
+        self.assertEqual(0, self.response.data["created"])
+        self.assertFalse(Product.objects.filter(name="iPad").exists())
+
+    def test_should_mark_the_valid_product_as_not_created(self):
+        self.assertEqual(status.HTTP_424_FAILED_DEPENDENCY, self.response.data["results"][0]["status"])
+
+
+class WhenSendingAPostThatIsNotAListToProductBulkCreateView(TestCaseWithFixtureData):
+    """This class defines the test suite for a bulk create whose body is not a list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAPostThatIsNotAListToProductBulkCreateView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.post(
+            reverse("product_bulk_create"),
+            {"name": "iPad", "price": 329.00, "manufacturer": "Apple", "product_type": "Tablet"},
+            format="json"
+        )
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WhenBulkInsertingObjects(TestCase):
+    """This class shows that bulk_insert gives the inserted objects the primary keys of their rows"""
+
+    def insert(self, queries):
+        with transaction.atomic(), self.assertNumQueries(queries):
+            return bulk_insert(Attribute, [Attribute(type="Color", value=value) for value in ("Red", "Green", "Blue")],
+                               batch_size=2)
+
+    def assertInsertedRowsMatch(self, attributes):
+        self.assertEqual(["Red", "Green", "Blue"],
+                         [Attribute.objects.get(pk=attribute.pk).value for attribute in attributes])
+
+    def test_should_read_the_ids_back_on_sqlite(self):
+        self.assertInsertedRowsMatch(self.insert(queries=3))
+
+    def test_should_insert_one_at_a_time_on_other_backends_that_cannot_return_ids(self):
+        with mock.patch.object(connection, "vendor", "mysql"):
+            self.assertInsertedRowsMatch(self.insert(queries=3))
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.serializers import ProductSerializer
+from api.views import ProductExport
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenSendingAGetToProductExportView(TestCaseWithFixtureData):
+    """This class defines the test suite for exporting every product as newline delimited JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAGetToProductExportView, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+
+        cls.client = APIClient()
+        with override_settings(API_EXPORT_CHUNK_SIZE=2):
+            cls.response = cls.client.get(reverse("product_export"))
+            cls.lines = b"".join(cls.response.streaming_content).decode("utf-8").splitlines()
+
+    def test_should_receive_a_200_ok_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_200_OK)
+
+    def test_should_stream_ndjson(self):
+        self.assertEqual("application/x-ndjson", self.response["Content-Type"])
+
+    def test_should_stream_every_product_across_chunks(self):
+        self.assertEqual([self.product1.id, self.product2.id, self.product3.id],
+                         [json.loads(line)["id"] for line in self.lines])
+
+    def test_should_match_the_product_serializer(self):
+        self.assertEqual(json.loads(json.dumps(ProductSerializer(self.product1).data)), json.loads(self.lines[0]))
+
+
+class WhenSendingAGetWithAFilterToProductExportView(TestCaseWithFixtureData):
+    """This class defines the test suite for exporting the products that match a filter as CSV"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAGetWithAFilterToProductExportView, cls).setUpTestData()
+
+        cls.product2.attributes.add(cls.attribute3)
+
+        cls.client = APIClient()
+        cls.response = cls.client.get(reverse("product_export"),
+                                      data={"output": "csv", "attributes__type": "Backup camera"})
+        content = b"".join(cls.response.streaming_content).decode("utf-8")
+        cls.rows = list(csv.DictReader(io.StringIO(content)))
+
+    def test_should_stream_csv(self):
+        self.assertEqual("text/csv", self.response["Content-Type"])
+
+    def test_should_only_export_the_matching_products(self):
+        self.assertEqual([str(self.product2.id)], [row["id"] for row in self.rows])
+
+    def test_should_export_the_attributes_as_json(self):
+        attributes = json.loads(self.rows[0]["attributes"])
+        self.assertEqual([self.attribute3.id], [attribute["id"] for attribute in attributes])
+
+
+class WhenSendingAGetWithAnUnsupportedOutputToProductExportView(TestCaseWithFixtureData):
+    """This class defines the test suite for exporting to an output format that is not supported"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenSendingAGetWithAnUnsupportedOutputToProductExportView, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.get(reverse("product_export"), data={"output": "xml"})
+
+    def test_should_receive_a_400_bad_request_response(self):
+        self.assertEqual(self.response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WhenCheckingTheQueryBudgetOfAnExport(TestCaseWithFixtureData):
+    """This class shows that the queries of a streamed export are checked against the budget a chunk at a time"""
+
+    def export(self):
+        with override_settings(API_ENFORCE_QUERY_BUDGETS=True, API_EXPORT_CHUNK_SIZE=1), \
+                mock.patch("api.mixins.logger") as logger:
+            b"".join(APIClient().get(reverse("product_export")).streaming_content)
+        return logger.warning.call_args_list
+
+    def test_should_stay_within_budget_however_many_chunks_it_streams(self):
+        self.assertEqual([], self.export())
+
+    def test_should_log_a_chunk_over_budget(self):
+        with mock.patch.object(ProductExport, "query_budget", 1):
+            warnings = self.export()
+        self.assertEqual(3, len(warnings))
@@ -0,0 +1,112 @@
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.facets import queryset_facets
+from api.facets import stored_facets
+from api.models import Attribute
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenGettingFacetsAfterChangingTheCatalog(TestCaseWithFixtureData):
+    """This class defines the test suite for keeping the facet counts up to date as products and links change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenGettingFacetsAfterChangingTheCatalog, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product2.attributes.add(cls.attribute1)
+        cls.attribute3.product_set.add(cls.product2, cls.product3)
+        cls.client.post(reverse("products"), data={"name": "iPad", "price": 329.00, "manufacturer": "Apple",
+                                                   "product_type": "Tablet"}, format="json")
+        cls.client.post(reverse("product_details", kwargs={'pk': cls.product3.id}),
+                        data={"name": "HP Laptop", "price": 1299.99, "manufacturer": "Apple",
+                              "product_type": "Laptop"}, format="json")
+        cls.client.post(reverse("product_bulk_create"), data=[
+            {"name": "MX Keys", "price": 99.99, "manufacturer": "Logitech", "product_type": "Keyboard",
+             "attribute_ids": [cls.attribute1.id]}], format="json")
+        cls.client.post(reverse("product_attribute_links"),
+                        data={"product_ids": [cls.product1.id, cls.product3.id],
+                              "add_attribute_ids": [cls.attribute3.id], "remove_attribute_ids": [cls.attribute1.id]},
+                        format="json")
+        cls.client.post(reverse("product_remove_attribute", kwargs={'pk': cls.product1.id}),
+                        data={"attribute_id": cls.attribute2.id}, format="json")
+        cls.product2.attributes.remove(cls.attribute2)
+        cls.attribute3.product_set.clear()
+        cls.product2.attributes.add(cls.attribute3)
+        cls.client.post(reverse("product_delete", kwargs={'pk': cls.product1.id}))
+        cls.client.post(reverse("attribute_delete", kwargs={'pk': cls.attribute2.id}))
+
+        cls.response = cls.client.get(reverse("product_facets"))
+
+    def test_should_match_counting_every_product(self):
+        self.assertEqual(queryset_facets(Product.objects.all()), self.response.data)
+
+    def test_should_count_manufacturers(self):
+        self.assertEqual([{"value": "Apple", "count": 2}, {"value": "Logitech", "count": 2}],
+                         self.response.data["manufacturer"])
+
+    def test_should_count_attributes(self):
+        self.assertEqual([{"type": "Color", "value": "Red", "count": 2},
+                          {"type": "Backup camera", "value": "false", "count": 1}],
+                         self.response.data["attributes"])
+
+
+class WhenGettingFacetsForAFilterSet(TestCaseWithFixtureData):
+    """This class defines the test suite for counting the facets of the products matching the filters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenGettingFacetsForAFilterSet, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        cls.product2.attributes.add(cls.attribute1)
+        cls.response = APIClient().get(reverse("product_facets"), data={"attributes__type": "Color"})
+
+    def test_should_only_count_matching_products(self):
+        self.assertEqual([{"value": "Apple", "count": 1}, {"value": "Logitech", "count": 1}],
+                         self.response.data["manufacturer"])
+
+    def test_should_count_each_product_once(self):
+        self.assertEqual([{"type": "Color", "value": "Red", "count": 2},
+                          {"type": "Number Of Wheels", "value": "4", "count": 1}],
+                         self.response.data["attributes"])
+
+
+class WhenGettingFacetsWithDuplicateAttributes(TestCaseWithFixtureData):
+    """This class shows that a product linked to two attributes with the same type and value is counted once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenGettingFacetsWithDuplicateAttributes, cls).setUpTestData()
+
+        duplicate = Attribute(type="Color", value="Red")
+        duplicate.save()
+        cls.product1.attributes.add(cls.attribute1, duplicate)
+        cls.product2.attributes.add(duplicate)
+        cls.product3.attributes.add(cls.attribute3)
+
+    def test_should_count_each_product_once(self):
+        self.assertEqual([{"type": "Color", "value": "Red", "count": 2},
+                          {"type": "Backup camera", "value": "false", "count": 1}],
+                         stored_facets()["attributes"])
+
+    def test_should_match_counting_every_product(self):
+        self.assertEqual(queryset_facets(Product.objects.all()), stored_facets())
+
+
+class WhenGettingFacetsOfAnEmptyCatalog(TestCaseWithFixtureData):
+    """This class shows that the facet counts go back to nothing once every product is deleted"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenGettingFacetsOfAnEmptyCatalog, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        Product.objects.all().delete()
+        Attribute.objects.all().delete()
+
+    def test_should_have_no_counts(self):
+        self.assertEqual({"manufacturer": [], "product_type": [], "attributes": []}, stored_facets())
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.models import Product
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenFilteringProductsOnRangesAndLists(TestCaseWithFixtureData):
+    """This class shows the range and multi-value filters and the ordering of the product list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenFilteringProductsOnRangesAndLists, cls).setUpTestData()
+
+        for product, year in ((cls.product1, 2015), (cls.product2, 2016), (cls.product3, 2017)):
+            Product.objects.filter(pk=product.pk).update(release_date=datetime(year, 6, 1, tzinfo=timezone.utc))
+        cls.client = APIClient()
+
+    def get_names(self, **params):
+        response = self.client.get(reverse("products"), data=params)
+        self.assertEqual(status.HTTP_200_OK, response.status_code, response.data)
+        return [product["name"] for product in response.data["results"]]
+
+    def test_should_filter_on_a_price_range(self):
+        self.assertEqual(["iWatch"], self.get_names(price__gte="100", price__lte="500"))
+
+    def test_should_filter_on_a_release_date_range(self):
+        self.assertEqual(["Logitech MX Mouse", "HP Laptop"],
+                         self.get_names(release_date__range="2016-01-01T00:00:00Z,2017-12-31T00:00:00Z",
+                                        ordering="release_date"))
+
+    def test_should_filter_on_several_manufacturers(self):
+        self.assertEqual(["iWatch", "HP Laptop"], self.get_names(manufacturer__in="Apple,HP", ordering="price"))
+
+    def test_should_filter_on_several_product_types(self):
+        self.assertEqual(["Logitech MX Mouse"], self.get_names(product_type__in="Mouse,Tablet"))
+
+    def test_should_order_on_price(self):
+        self.assertEqual(["Logitech MX Mouse", "iWatch", "HP Laptop"], self.get_names(ordering="price"))
+        self.assertEqual(["HP Laptop", "iWatch", "Logitech MX Mouse"], self.get_names(ordering="-price"))
+
+    def test_should_order_a_price_range_newest_first(self):
+        self.assertEqual(["HP Laptop", "Logitech MX Mouse"],
+                         self.get_names(price__gte="50", price__lte="1500", manufacturer__in="HP,Logitech",
+                                        ordering="-release_date"))
+
+    def test_should_reject_ordering_on_a_field_without_an_index(self):
+        response = self.client.get(reverse("products"), data={"ordering": "manufacturer"})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn("ordering", response.data)
+
+    def test_should_reject_ordering_on_several_fields(self):
+        response = self.client.get(reverse("products"), data={"ordering": "price,name"})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
@@ -0,0 +1,68 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import SimpleTestCase
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.profiling import ProfilingMiddleware
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenProfilingAGetToProductListView(TestCaseWithFixtureData):
+    """This class defines the test suite for a request profiled with the X-Profile header"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenProfilingAGetToProductListView, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.directory = tempfile.mkdtemp()
+        with override_settings(API_PROFILING_TOKEN="letmein", API_PROFILING_DIR=cls.directory):
+            cls.response = APIClient().get(reverse("products"), HTTP_X_PROFILE="letmein",
+                                           HTTP_X_REQUEST_ID="req-1234")
+            cls.unprofiled = APIClient().get(reverse("products"), HTTP_X_PROFILE="guess")
+        cls.path = os.path.join(cls.directory, "req-1234")
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super(WhenProfilingAGetToProductListView, cls).tearDownClass()
+
+    def test_should_answer_with_the_profile_id(self):
+        self.assertEqual("req-1234", self.response["X-Profile-Id"])
+
+    def test_should_save_the_pstats(self):
+        functions = pstats.Stats(self.path + ".pstats").stats
+        self.assertIn("list", {name for _, _, name in functions})
+
+    def test_should_save_the_collapsed_stacks(self):
+        with open(self.path + ".collapsed") as collapsed:
+            lines = collapsed.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.rsplit(" ", 1)[1].isdigit() for line in lines))
+
+    def test_should_save_the_queries_with_the_code_that_ran_them(self):
+        with open(self.path + ".sql.json") as queries:
+            profile = json.load(queries)
+        self.assertTrue(profile["queries"])
+        self.assertTrue(all(any(frame.startswith("api/") for frame in query["stack"]) for query in profile["queries"]))
+
+    def test_should_not_profile_a_request_with_the_wrong_token(self):
+        self.assertFalse(self.unprofiled.has_header("X-Profile-Id"))
+        self.assertEqual(["req-1234.collapsed", "req-1234.pstats", "req-1234.sql.json"],
+                         sorted(os.listdir(self.directory)))
+
+
+class WhenProfilingHasNoToken(SimpleTestCase):
+    """This class shows that the profiling middleware leaves the chain when there is no token"""
+
+    @override_settings(API_PROFILING_TOKEN=None)
+    def test_should_not_be_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: None)
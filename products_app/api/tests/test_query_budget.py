@@ -0,0 +1,249 @@
+from django.db import connection
+from django.db import transaction
+from django.test import TestCase
+from django.test import override_settings
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.bulk import bulk_relink
+from api.bulk import relink_query_count
+from api.mixins import QueryCounter
+from api.models import Attribute
+from api.models import DeletionJob
+from api.models import Product
+from api.urls import urlpatterns
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+# The requests run against every named route in api/urls.py when checking its query budget. Each entry is the HTTP
+# method, a function building the url kwargs and a function building the request body from the test class.
+BUDGET_SCENARIOS = {
+    "attributes": [
+        ("get", lambda cls: {}, lambda cls: {"limit": 50}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "pagination": "cached-count"}),
+        ("post", lambda cls: {}, lambda cls: {"type": "Color", "value": "Blue"}),
+    ],
+    "attribute_details": [
+        ("get", lambda cls: {'pk': cls.attribute1.id}, lambda cls: None),
+        ("post", lambda cls: {'pk': cls.attribute2.id}, lambda cls: {"type": "Number Of Wheels", "value": "6"}),
+    ],
+    "attribute_batch_get": [
+        ("post", lambda cls: {}, lambda cls: {"ids": [cls.attribute3.id, cls.attribute1.id, 100000]}),
+    ],
+    "attribute_changes": [
+        ("get", lambda cls: {}, lambda cls: {"limit": 50}),
+    ],
+    "attribute_delete": [
+        ("post", lambda cls: {'pk': cls.disposable_attribute.id}, lambda cls: None),
+    ],
+    "products": [
+        ("get", lambda cls: {}, lambda cls: {"limit": 50}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "attributes__type": "Color"}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "fields": "id,name", "expand": "attributes"}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "attribute": ["Color:Red", "Number Of Wheels:4"],
+                                             "attribute_any": ["Color:Red", "Color:Blue"]}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "price__gte": 5, "price__lte": 500,
+                                             "manufacturer__in": "Acme,Apple", "ordering": "-price"}),
+        ("get", lambda cls: {}, lambda cls: {"limit": 50, "attributes__type": "Color", "pagination": "nocount"}),
+        ("post", lambda cls: {}, lambda cls: {"name": "iPad", "price": 329.00, "manufacturer": "Apple",
+                                              "product_type": "Tablet"}),
+    ],
+    "product_export": [
+        ("get", lambda cls: {}, lambda cls: {"output": "ndjson"}),
+        ("get", lambda cls: {}, lambda cls: {"output": "csv", "attributes__type": "Color"}),
+    ],
+    "product_facets": [
+        ("get", lambda cls: {}, lambda cls: None),
+        ("get", lambda cls: {}, lambda cls: {"attributes__type": "Color"}),
+    ],
+    "product_batch_get": [
+        ("post", lambda cls: {}, lambda cls: {"ids": list(Product.objects.values_list("id", flat=True)) + [100000]}),
+    ],
+    "product_changes": [
+        ("get", lambda cls: {}, lambda cls: {"limit": 50}),
+    ],
+    "product_bulk_create": [
+        ("post", lambda cls: {}, lambda cls: [{"name": f"Widget {index}", "price": 5, "manufacturer": "Acme",
+                                               "product_type": "Widget",
+                                               "attribute_ids": [cls.attribute1.id, cls.attribute2.id]}
+                                              for index in range(30)]),
+    ],
+    "product_bulk_delete": [
+        ("post", lambda cls: {}, lambda cls: {"product_ids": [cls.disposable_product.id, 100000]}),
+    ],
+    "product_attribute_links": [
+        ("post", lambda cls: {}, lambda cls: {"product_ids": list(Product.objects.values_list("id", flat=True)),
+                                              "add_attribute_ids": [cls.attribute3.id],
+                                              "remove_attribute_ids": [cls.attribute2.id]}),
+    ],
+    "product_details": [
+        ("get", lambda cls: {'pk': cls.product1.id}, lambda cls: None),
+        ("get", lambda cls: {'pk': cls.product2.id}, lambda cls: {"fields": "id,price", "expand": "attributes"}),
+        ("post", lambda cls: {'pk': cls.product2.id}, lambda cls: {"name": "Logitech MX Master", "price": 79.99,
+                                                                   "manufacturer": "Logitech",
+                                                                   "product_type": "Mouse"}),
+    ],
+    "product_delete": [
+        ("post", lambda cls: {'pk': cls.disposable_product.id}, lambda cls: None),
+    ],
+    "product_add_attribute": [
+        ("post", lambda cls: {'pk': cls.product3.id}, lambda cls: {"attribute_id": cls.attribute2.id}),
+    ],
+    "product_remove_attribute": [
+        ("post", lambda cls: {'pk': cls.product1.id}, lambda cls: {"attribute_id": cls.attribute1.id}),
+    ],
+    "deletion_job": [
+        ("get", lambda cls: {'pk': cls.job.id}, lambda cls: None),
+    ],
+    "cache_stats": [
+        ("get", lambda cls: {}, lambda cls: None),
+    ],
+    "metrics": [
+        ("get", lambda cls: {}, lambda cls: None),
+    ],
+}
+
+
+@override_settings(API_CHANGE_FEED_SETTLE=0)
+class WhenCheckingTheQueryBudgetOfEveryRoute(TestCaseWithFixtureData):
+    """
+    This class runs every route in api/urls.py against enough linked products that a query per row would push it over
+    the query budget declared on its view.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenCheckingTheQueryBudgetOfEveryRoute, cls).setUpTestData()
+
+        attributes = [cls.attribute1, cls.attribute2, cls.attribute3]
+        for index in range(30):
+            product = Product(name=f"Product {index}", price=10, manufacturer="Acme", product_type="Widget")
+            product.save()
+            product.attributes.add(*attributes)
+        cls.product1.attributes.add(*attributes)
+
+        cls.disposable_attribute = Attribute(type="Material", value="Wood")
+        cls.disposable_attribute.save()
+        cls.disposable_product = Product(name="Old Widget", price=1, manufacturer="Acme", product_type="Widget")
+        cls.disposable_product.save()
+        cls.disposable_product.attributes.add(cls.disposable_attribute)
+        cls.job = DeletionJob.objects.create(kind=DeletionJob.PRODUCTS, target_ids="[]")
+
+        cls.views = {pattern.name: pattern.callback.view_class for pattern in urlpatterns}
+        cls.results = []
+        client = APIClient()
+        for name, scenarios in BUDGET_SCENARIOS.items():
+            for method, kwargs, data in scenarios:
+                url, body = reverse(name, kwargs=kwargs(cls)), data(cls)
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    response = getattr(client, method)(url, data=body, format="json" if method == "post" else None)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                cls.results.append((name, method, response.status_code, counter.count))
+
+    def test_every_route_should_declare_a_query_budget(self):
+        self.assertEqual([], [name for name, view in self.views.items() if view.query_budget is None])
+
+    def test_every_route_should_have_a_budget_scenario(self):
+        self.assertCountEqual(self.views.keys(), BUDGET_SCENARIOS.keys())
+
+    def test_every_scenario_should_succeed(self):
+        self.assertEqual([], [result for result in self.results if result[2] >= 400])
+
+    def test_no_route_should_go_over_its_query_budget(self):
+        over_budget = [result for result in self.results if result[3] > self.views[result[0]].query_budget]
+        self.assertEqual([], over_budget)
+
+
+class WhenBatchGettingTheMostIdsAtOnce(TestCase):
+    """This class checks the batch-get routes against their query budgets with as many ids as they accept"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([Product(name=f"Product {index}", price=10, manufacturer="Acme",
+                                             product_type="Widget") for index in range(1000)])
+        Attribute.objects.bulk_create([Attribute(type="Color", value=str(index)) for index in range(1000)])
+
+        client = APIClient()
+        cls.results = []
+        for name, model in (("attribute_batch_get", Attribute), ("product_batch_get", Product)):
+            ids, counter = list(model.objects.values_list("id", flat=True)), QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = client.post(reverse(name), data={"ids": ids}, format="json")
+            cls.results.append((name, response.status_code, len(response.data["results"]), counter.count))
+
+    def test_should_read_every_object(self):
+        self.assertEqual([200, 200], [status_code for _, status_code, _, _ in self.results])
+        self.assertEqual([1000, 1000], [found for _, _, found, _ in self.results])
+
+    def test_should_stay_within_the_query_budget(self):
+        views = {pattern.name: pattern.callback.view_class for pattern in urlpatterns}
+        self.assertEqual([], [result for result in self.results if result[3] > views[result[0]].query_budget])
+
+
+class WhenRelinkingManyProductsAtOnce(TestCase):
+    """This class checks that the query budget of the links route holds for a re-tag spanning several chunks"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.bulk_create([Product(name=f"Product {index}", price=10, manufacturer="Acme",
+                                             product_type="Widget") for index in range(2500)])
+        cls.product_ids = list(Product.objects.values_list("id", flat=True))
+        cls.added, cls.removed = (Attribute.objects.create(type="Color", value=value).id for value in ("Red", "Blue"))
+        Product.attributes.through.objects.bulk_create([
+            Product.attributes.through(product_id=product_id, attribute_id=cls.removed)
+            for product_id in cls.product_ids[::2]])
+
+    def test_should_stay_under_the_most_queries_bulk_relink_may_run(self):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter), transaction.atomic():
+            bulk_relink(self.product_ids, [self.added], [self.removed])
+        self.assertLessEqual(counter.count, relink_query_count(len(self.product_ids), 2))
+
+    def test_should_stay_within_the_query_budget(self):
+        views = {pattern.name: pattern.callback.view_class for pattern in urlpatterns}
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = APIClient().post(reverse("product_attribute_links"), format="json", data={
+                "product_ids": self.product_ids, "add_attribute_ids": [self.added],
+                "remove_attribute_ids": [self.removed]})
+        self.assertEqual((200, 2500), (response.status_code, response.data["created"]))
+        self.assertLessEqual(counter.count, views["product_attribute_links"].query_budget)
+
+
+class WhenDeletingManyProductsAtOnce(TestCase):
+    """This class checks that the query budget of the bulk delete route holds for ids spanning several chunks"""
+
+    def test_should_stay_within_the_query_budget(self):
+        Product.objects.bulk_create([Product(name=f"Product {index}", price=10, manufacturer="Acme",
+                                             product_type="Widget") for index in range(2500)])
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        views = {pattern.name: pattern.callback.view_class for pattern in urlpatterns}
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = APIClient().post(reverse("product_bulk_delete"), data={"product_ids": product_ids},
+                                        format="json")
+        self.assertEqual(202, response.status_code)
+        self.assertLessEqual(counter.count, views["product_bulk_delete"].query_budget)
+
+
+class WhenListingProductsWithDifferentPageSizes(TestCaseWithFixtureData):
+    """This class shows that the number of queries for a product listing does not depend on the page size"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenListingProductsWithDifferentPageSizes, cls).setUpTestData()
+
+        for product in (cls.product1, cls.product2, cls.product3):
+            product.attributes.add(cls.attribute1, cls.attribute2)
+
+        client = APIClient()
+        cls.query_counts = []
+        for limit in (1, 3):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                client.get(reverse("products"), data={"limit": limit})
+            cls.query_counts.append(counter.count)
+
+    def test_should_run_the_same_number_of_queries(self):
+        self.assertEqual(self.query_counts[0], self.query_counts[1])
@@ -0,0 +1,184 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+from unittest import skipIf
+
+from django.test import SimpleTestCase
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.models import Product
+from api.parsers import FastJSONParser
+from api.parsers import MessagePackParser
+from api.renderers import FastJSONRenderer
+from api.renderers import MessagePackRenderer
+from api.renderers import msgpack
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+PAYLOAD = {
+    "count": 2,
+    "next": "http://testserver/products/?limit=1&offset=1",
+    "previous": None,
+    "results": [
+        {"id": 1, "name": "iWatch\u2028Édition", "price": "399.99", "on_sale": True, "tags": ("new", "watch"),
+         "release_date": datetime.datetime(2018, 2, 1, 9, 30, 15, 123456, tzinfo=timezone.utc),
+         "created_at": datetime.datetime(2018, 2, 1, 9, 30, tzinfo=timezone.utc), "cost": Decimal("199.50"),
+         "launch_day": datetime.date(2018, 2, 1), "ids": {1, 2}, "attributes": []},
+        {"id": 2, "name": "Mouse", "attributes": [{"id": 3, "type": "Color", "value": "Red"}]},
+    ],
+}
+
+
+class WhenRenderingWithTheFastJSONRenderer(SimpleTestCase):
+    """This class shows that the fast JSON renderer writes the same bytes as JSONRenderer"""
+
+    def test_should_match_json_renderer(self):
+        self.assertEqual(JSONRenderer().render(PAYLOAD), FastJSONRenderer().render(PAYLOAD))
+
+    def test_should_match_json_renderer_for_big_integers(self):
+        self.assertEqual(JSONRenderer().render({"id": 2 ** 70}), FastJSONRenderer().render({"id": 2 ** 70}))
+
+    def test_should_match_json_renderer_when_indenting(self):
+        self.assertEqual(JSONRenderer().render(PAYLOAD, "application/json; indent=4"),
+                         FastJSONRenderer().render(PAYLOAD, "application/json; indent=4"))
+
+    def test_should_match_json_renderer_without_orjson(self):
+        with mock.patch("api.renderers.orjson", None):
+            self.assertEqual(JSONRenderer().render(PAYLOAD), FastJSONRenderer().render(PAYLOAD))
+
+    def test_should_render_nothing_for_no_data(self):
+        self.assertEqual(b"", FastJSONRenderer().render(None))
+
+
+class WhenParsingWithTheFastJSONParser(SimpleTestCase):
+    """This class shows that the fast JSON parser reads bodies the same way as JSONParser"""
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), "application/json", {"encoding": "utf-8"})
+
+    def test_should_match_json_parser(self):
+        body = '{"name": "iWatch É", "price": 399.99, "ids": [1, 123456789012345678901234], "on_sale": true}'.encode()
+        self.assertEqual(self.parse(JSONParser(), body), self.parse(FastJSONParser(), body))
+
+    def test_should_keep_big_integers(self):
+        self.assertEqual([123456789012345678901234], self.parse(FastJSONParser(), b"[123456789012345678901234]"))
+
+    def test_should_raise_the_same_parse_error(self):
+        errors = []
+        for parser in (JSONParser(), FastJSONParser()):
+            with self.assertRaises(ParseError) as context:
+                self.parse(parser, b'{"name": NaN}')
+            errors.append(str(context.exception.detail))
+        self.assertEqual(errors[0], errors[1])
+
+
+class WhenRenderingWithAColumnarLayout(SimpleTestCase):
+    """This class shows the results of a page written as a table of fields and rows"""
+
+    def test_should_write_the_results_as_fields_and_rows(self):
+        page = {"count": 2, "next": None, "results": [{"id": 1, "name": "Mouse"}, {"id": 2, "name": "Pen"}]}
+        self.assertEqual({"count": 2, "next": None, "results": {"fields": ["id", "name"],
+                                                                 "rows": [[1, "Mouse"], [2, "Pen"]]}},
+                         json.loads(FastJSONRenderer().render(page, "application/json; layout=columns")))
+
+    def test_should_leave_results_with_different_fields_as_they_are(self):
+        page = {"results": [{"id": 1, "deleted": True}, {"id": 2, "object": {}}]}
+        self.assertEqual(page, json.loads(FastJSONRenderer().render(page, "application/json; layout=columns")))
+
+    def test_should_read_a_table_back_as_a_list(self):
+        body = b'{"fields": ["id", "name"], "rows": [[1, "Mouse"], [2, "Pen"]]}'
+        self.assertEqual([{"id": 1, "name": "Mouse"}, {"id": 2, "name": "Pen"}],
+                         FastJSONParser().parse(io.BytesIO(body), "application/json; layout=columns"))
+
+    def test_should_reject_a_malformed_table(self):
+        for body in (b'{"fields": ["name"], "rows": 5}', b'{"fields": "name", "rows": [["Pen"]]}',
+                     b'{"fields": [1], "rows": [["Pen"]]}', b'{"fields": ["name"], "rows": [5]}',
+                     b'{"fields": ["name"], "rows": [["Pen", "1.50"]]}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(body), "application/json; layout=columns")
+
+
+class WhenPostingAMalformedColumnarTable(TestCase):
+    """This class shows that a table of fields and rows that does not line up is a bad request"""
+
+    def test_should_receive_a_400_bad_request_response(self):
+        response = APIClient().post(reverse("product_bulk_create"), data=b'{"fields": ["name"], "rows": 5}',
+                                    content_type="application/json; layout=columns")
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_should_receive_a_400_bad_request_response_for_message_pack(self):
+        response = APIClient().post(reverse("product_bulk_create"),
+                                    data=msgpack.packb({"fields": ["name"], "rows": [["Pen", "1.50"]]}),
+                                    content_type="application/x-msgpack; layout=columns")
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+
+@skipIf(msgpack is None, "msgpack is not installed")
+class WhenRenderingWithTheMessagePackRenderer(SimpleTestCase):
+    """This class shows that MessagePack carries the same data as JSON"""
+
+    def test_should_parse_back_to_what_json_carries(self):
+        for media_type in ("application/x-msgpack", "application/x-msgpack; layout=columns"):
+            body = MessagePackRenderer().render(PAYLOAD, media_type)
+            self.assertEqual(json.loads(FastJSONRenderer().render(PAYLOAD)),
+                             MessagePackParser().parse(io.BytesIO(body), media_type))
+
+    def test_should_be_smaller_than_json(self):
+        self.assertLess(len(MessagePackRenderer().render(PAYLOAD)), len(FastJSONRenderer().render(PAYLOAD)))
+
+    def test_should_reject_a_truncated_body(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(MessagePackRenderer().render(PAYLOAD)[:-3]))
+
+    def test_should_reject_a_malformed_table(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(msgpack.packb({"fields": ["name"], "rows": 5})),
+                                      "application/x-msgpack; layout=columns")
+
+
+@skipIf(msgpack is None, "msgpack is not installed")
+class WhenAskingTheProductListForMessagePack(TestCaseWithFixtureData):
+    """This class defines the test suite for negotiating MessagePack with the product routes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenAskingTheProductListForMessagePack, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        cls.json = cls.client.get(reverse("products"))
+        cls.response = cls.client.get(reverse("products"), HTTP_ACCEPT="application/x-msgpack")
+        cls.columns = cls.client.get(reverse("products"), HTTP_ACCEPT="application/x-msgpack; layout=columns")
+
+    def test_should_receive_a_200_ok_response(self):
+        self.assertEqual(status.HTTP_200_OK, self.response.status_code)
+
+    def test_should_answer_with_the_media_type_asked_for(self):
+        self.assertEqual("application/x-msgpack", self.response["Content-Type"])
+
+    def test_should_carry_the_same_page_as_json(self):
+        self.assertEqual(json.loads(self.json.content), msgpack.unpackb(self.response.content, raw=False))
+
+    def test_should_keep_the_pagination_fields_in_the_columnar_layout(self):
+        page = msgpack.unpackb(self.columns.content, raw=False)
+        self.assertEqual(page["count"], json.loads(self.json.content)["count"])
+        self.assertEqual([product["id"] for product in json.loads(self.json.content)["results"]],
+                         [row[page["results"]["fields"].index("id")] for row in page["results"]["rows"]])
+
+    def test_should_create_products_sent_as_a_columnar_table(self):
+        body = msgpack.packb({"fields": ["name", "price", "manufacturer", "product_type"],
+                              "rows": [["Packed Pen", "1.50", "Acme", "Pen"], ["Packed Pad", "2.50", "Acme", "Pad"]]})
+        response = self.client.post(reverse("product_bulk_create"), data=body,
+                                    content_type="application/x-msgpack; layout=columns",
+                                    HTTP_ACCEPT="application/x-msgpack")
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(2, Product.objects.filter(name__startswith="Packed ").count())
@@ -0,0 +1,106 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.cache import product_cache
+from api.models import Product
+from api.routers import READ_YOUR_WRITES_COOKIE
+from api.views import ProductList
+
+
+@override_settings(API_REPLICA_ALIASES=["replica"])
+class WhenReadingFromAReplica(TestCase):
+    """
+    This class runs the views against a second SQLite file standing in for a replica. It holds a product the primary
+    does not have and lacks the one the primary has, so each response tells which database it was read from.
+    """
+    multi_db = True
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.databases["replica"] = dict(connections["default"].settings_dict,
+                                                NAME=os.path.join(cls.directory.name, "replica.sqlite3"))
+        call_command("migrate", database="replica", verbosity=0)
+        super(WhenReadingFromAReplica, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(WhenReadingFromAReplica, cls).tearDownClass()
+        connections["replica"].close()
+        del connections["replica"]
+        del connections.databases["replica"]
+        cls.directory.cleanup()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.primary_product = Product.objects.create(name="Primary only", price=1, manufacturer="Acme",
+                                                     product_type="Widget")
+        Product.objects.using("replica").bulk_create([
+            Product(name="Replica only", price=1, manufacturer="Acme", product_type="Widget")])
+        cls.replica_product = Product.objects.using("replica").get(name="Replica only")
+
+    def setUp(self):
+        product_cache.cache.clear()
+
+    def get_names(self, client, name):
+        response = client.get(reverse("products"), data={"name": name})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        return [product["name"] for product in response.data["results"]]
+
+    def test_should_list_products_from_the_replica(self):
+        client = APIClient()
+        self.assertEqual(["Replica only"], self.get_names(client, "Replica only"))
+        self.assertEqual([], self.get_names(client, "Primary only"))
+
+    def test_should_write_to_the_primary(self):
+        response = APIClient().post(reverse("products"), data={"name": "Written", "price": 2, "manufacturer": "Acme",
+                                                                "product_type": "Widget"}, format="json")
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertTrue(Product.objects.using("default").filter(name="Written").exists())
+        self.assertFalse(Product.objects.using("replica").filter(name="Written").exists())
+
+    def test_should_read_a_client_s_own_writes_from_the_primary(self):
+        client = APIClient()
+        client.post(reverse("products"), data={"name": "Written", "price": 2, "manufacturer": "Acme",
+                                               "product_type": "Widget"}, format="json")
+        self.assertEqual(["Written"], self.get_names(client, "Written"))
+        self.assertEqual([], self.get_names(APIClient(), "Written"))
+
+    def test_should_not_open_the_window_for_a_batch_get(self):
+        response = APIClient().post(reverse("product_batch_get"), data={"ids": [self.replica_product.id]},
+                                    format="json")
+        self.assertEqual(["Replica only"], [product["name"] for product in response.data["results"]])
+        self.assertNotIn(READ_YOUR_WRITES_COOKIE, response.cookies)
+
+    def test_should_cache_what_it_read_from_the_replica(self):
+        response = APIClient().get(reverse("product_details", kwargs={"pk": self.replica_product.id}))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual("Replica only", product_cache.get(self.replica_product.id)["data"]["name"])
+
+    def test_should_not_cache_a_row_older_than_the_change_that_invalidated_it(self):
+        product_cache.invalidate([self.replica_product.id])
+        response = APIClient().get(reverse("product_details", kwargs={"pk": self.replica_product.id}))
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIsNone(product_cache.get(self.replica_product.id))
+
+    def test_should_count_the_replica_s_queries_against_the_query_budget(self):
+        with override_settings(API_ENFORCE_QUERY_BUDGETS=True), mock.patch.object(ProductList, "query_budget", 0), \
+                mock.patch("api.mixins.logger") as logger, CaptureQueriesContext(connections["replica"]) as queries:
+            APIClient().get(reverse("products"))
+        self.assertTrue(queries.captured_queries)
+        self.assertEqual(len(queries.captured_queries), logger.warning.call_args[0][3])
+
+    def test_should_keep_the_change_feed_on_the_primary(self):
+        with override_settings(API_CHANGE_FEED_SETTLE=0):
+            response = APIClient().get(reverse("product_changes"), data={"limit": 1000})
+        self.assertIn(self.primary_product.id, [entry["id"] for entry in response.data["results"]])
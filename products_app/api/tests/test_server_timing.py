@@ -0,0 +1,105 @@
+import json
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from api.timing import ServerTimingMiddleware
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+def parse_server_timing(header):
+    """Return the metrics of a Server-Timing header by name, each as a dict of its parameters."""
+    metrics = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+class WhenTimingAGetToProductListView(TestCaseWithFixtureData):
+    """This class defines the test suite for the timings of a sampled request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenTimingAGetToProductListView, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1, cls.attribute2)
+        with mock.patch("api.timing.logger") as logger, CaptureQueriesContext(connection) as queries:
+            cls.response = APIClient().get(reverse("products"), data={"manufacturer": "Apple"})
+        cls.queries = len(queries.captured_queries)
+        cls.log = json.loads(logger.info.call_args[0][0])
+        cls.metrics = parse_server_timing(cls.response["Server-Timing"])
+
+    def test_should_time_every_phase(self):
+        self.assertLessEqual({"filter", "validators", "count", "fetch", "prefetch", "serialize", "render", "db",
+                              "total"}, set(self.metrics))
+
+    def test_should_count_every_query(self):
+        self.assertEqual(f'"{self.queries} queries"', self.metrics["db"]["desc"])
+
+    def test_should_give_each_query_a_phase_of_its_own(self):
+        self.assertEqual({"validators": '"1 queries"', "count": '"1 queries"', "fetch": '"1 queries"',
+                          "prefetch": '"1 queries"'},
+                         {name: self.metrics[name]["desc"] for name in ("validators", "count", "fetch", "prefetch")})
+
+    def test_should_not_count_the_attribute_loads_as_serialization(self):
+        self.assertNotIn("desc", self.metrics["serialize"])
+
+    def test_should_add_the_phases_up_to_the_total(self):
+        phases = sum(float(metric["dur"]) for name, metric in self.metrics.items() if name not in ("db", "total"))
+        self.assertAlmostEqual(float(self.metrics["total"]["dur"]), phases, delta=0.1)
+
+    def test_should_log_the_timings_as_json(self):
+        self.assertEqual(("ProductList", 200, "GET", self.queries),
+                         (self.log["view"], self.log["status"], self.log["method"], self.log["queries"]))
+        self.assertEqual(float(self.metrics["total"]["dur"]), self.log["total_ms"])
+
+
+class WhenTimingIsSampledOut(TestCaseWithFixtureData):
+    """This class shows that requests left out of the sample are not timed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenTimingIsSampledOut, cls).setUpTestData()
+
+        with override_settings(API_TIMING_SAMPLE_RATE=0):
+            cls.response = APIClient().get(reverse("products"))
+
+    def test_should_not_send_a_server_timing_header(self):
+        self.assertFalse(self.response.has_header("Server-Timing"))
+
+
+class CheapView(object):
+    timing_overhead_budget = 0.5
+
+
+@override_settings(API_TIMING_SAMPLE_RATE=0.5, API_TIMING_MIN_SAMPLE_RATE=0.1)
+class WhenTimingAViewCostsMoreThanItsBudget(SimpleTestCase):
+    """This class shows that a view is sampled less often while timing it goes over its overhead budget"""
+
+    def setUp(self):
+        self.middleware = ServerTimingMiddleware(lambda request: None)
+
+    def test_should_halve_its_sample_rate(self):
+        with self.assertLogs("api.timing", "WARNING"):
+            self.middleware.adapt(CheapView, 0.8)
+        self.assertEqual(0.25, self.middleware.get_sample_rate("CheapView"))
+
+    def test_should_not_go_under_the_minimum_sample_rate(self):
+        with self.assertLogs("api.timing", "WARNING"):
+            for _ in range(5):
+                self.middleware.adapt(CheapView, 0.8)
+        self.assertEqual(0.1, self.middleware.get_sample_rate("CheapView"))
+
+    def test_should_go_back_up_to_the_configured_rate_once_under_budget(self):
+        with self.assertLogs("api.timing", "WARNING"):
+            self.middleware.adapt(CheapView, 0.8)
+            self.middleware.adapt(CheapView, 0.8)
+        for _ in range(3):
+            self.middleware.adapt(CheapView, 0.1)
+        self.assertEqual(0.5, self.middleware.get_sample_rate("CheapView"))
@@ -0,0 +1,88 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.reverse import reverse
+from rest_framework.test import APIClient
+
+from .test_case_with_fixture_data import TestCaseWithFixtureData
+
+
+class WhenListingProductsWithSparseFields(TestCaseWithFixtureData):
+    """This class defines the test suite for listing only some of the fields of products"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenListingProductsWithSparseFields, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        with CaptureQueriesContext(connection) as cls.queries:
+            cls.response = cls.client.get(reverse("products"), data={"fields": "id,name,price"})
+        cls.expanded_response = cls.client.get(reverse("products"), data={"fields": "name", "expand": "attributes"})
+        cls.cursor_response = cls.client.get(reverse("products"), data={"fields": "name", "pagination": "cursor",
+                                                                        "limit": 2})
+
+    def test_should_only_return_the_requested_fields(self):
+        self.assertEqual({("id", "name", "price")}, {tuple(product) for product in self.response.data["results"]})
+
+    def test_should_only_select_the_requested_columns(self):
+        selects = [query["sql"] for query in self.queries.captured_queries if "api_product" in query["sql"]]
+        self.assertFalse([sql for sql in selects if "release_date" in sql or "manufacturer" in sql])
+
+    def test_should_not_load_attributes(self):
+        self.assertFalse([query for query in self.queries.captured_queries
+                          if "api_product_attributes" in query["sql"]])
+
+    def test_should_return_attributes_when_expanded(self):
+        products = {product["name"]: product for product in self.expanded_response.data["results"]}
+        self.assertEqual(("name", "attributes"), tuple(products["iWatch"]))
+        self.assertEqual([self.attribute1.id], [attribute["id"] for attribute in products["iWatch"]["attributes"]])
+
+    def test_should_page_with_cursors(self):
+        self.assertEqual(2, len(self.cursor_response.data["results"]))
+        self.assertIsNotNone(self.cursor_response.data["next"])
+
+
+class WhenGettingAProductWithSparseFields(TestCaseWithFixtureData):
+    """This class defines the test suite for getting only some of the fields of a product"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenGettingAProductWithSparseFields, cls).setUpTestData()
+
+        cls.product1.attributes.add(cls.attribute1)
+        cls.client = APIClient()
+        url = reverse("product_details", kwargs={'pk': cls.product1.id})
+        cls.uncached_response = cls.client.get(url, data={"fields": "id,price"})
+        cls.client.get(url)
+        cls.cached_response = cls.client.get(url, data={"fields": "id,price"})
+        cls.expanded_response = cls.client.get(url, data={"fields": "id", "expand": "attributes"})
+
+    def test_should_only_return_the_requested_fields(self):
+        self.assertEqual({"id": self.product1.id, "price": "399.99"}, self.uncached_response.data)
+
+    def test_should_narrow_a_cached_product_the_same_way(self):
+        self.assertEqual(self.uncached_response.data, self.cached_response.data)
+
+    def test_should_return_attributes_when_expanded(self):
+        self.assertEqual([self.attribute1.id],
+                         [attribute["id"] for attribute in self.expanded_response.data["attributes"]])
+
+
+class WhenAskingForFieldsThatDoNotExist(TestCaseWithFixtureData):
+    """This class defines the test suite for rejecting unknown fields and expansions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super(WhenAskingForFieldsThatDoNotExist, cls).setUpTestData()
+
+        cls.client = APIClient()
+        cls.response = cls.client.get(reverse("products"), data={"fields": "id,colour", "expand": "manufacturer"})
+
+    def test_should_return_bad_request(self):
+        self.assertEqual(400, self.response.status_code)
+
+    def test_should_name_the_unknown_field(self):
+        self.assertIn("colour", self.response.data["fields"][0])
+
+    def test_should_reject_the_expansion(self):
+        self.assertIn("expand", self.response.data)
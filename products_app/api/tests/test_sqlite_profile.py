@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from api.sqlite_backend.base import DatabaseWrapper
+
+
+class WhenConnectingWithTheProductionProfile(SimpleTestCase):
+    """This class shows the pragmas and transaction mode the production database profile gives new connections"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "production.sqlite3")
+        profile = settings.API_DB_PROFILES["production"]
+        with override_settings(API_SQLITE_PRAGMAS=profile["PRAGMAS"]):
+            self.wrapper = DatabaseWrapper(dict(connection.settings_dict, NAME=self.path, **profile["DATABASE"]))
+            self.wrapper.ensure_connection()
+        self.addCleanup(self.wrapper.close)
+
+    def pragma(self, name):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_should_use_wal_journaling(self):
+        self.assertEqual("wal", self.pragma("journal_mode"))
+
+    def test_should_only_sync_at_checkpoints(self):
+        self.assertEqual(1, self.pragma("synchronous"))
+
+    def test_should_wait_for_the_write_lock(self):
+        self.assertEqual(20000, self.pragma("busy_timeout"))
+
+    def test_should_take_the_write_lock_when_a_transaction_starts(self):
+        self.wrapper._start_transaction_under_autocommit()
+        self.addCleanup(self.wrapper.connection.rollback)
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute("BEGIN IMMEDIATE")
+
+    def test_should_not_count_the_pragmas_as_queries(self):
+        self.wrapper.close()
+        executed = []
+        with override_settings(API_SQLITE_PRAGMAS=settings.API_DB_PROFILES["production"]["PRAGMAS"]), \
+                self.wrapper.execute_wrapper(lambda execute, sql, *args: executed.append(sql) or execute(sql, *args)), \
+                CaptureQueriesContext(self.wrapper) as queries:
+            self.wrapper.ensure_connection()
+        self.assertEqual(([], []), (executed, queries.captured_queries))
+        self.assertEqual("wal", self.pragma("journal_mode"))
@@ -0,0 +1,176 @@
+import json
+import logging
+import random
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings(object):
+    """
+    The phases of one sampled request, with the wall time of each and the queries run and SQL time spent inside it.
+    Its execute wrapper attributes every query to the phase running it, or to "other" outside of any phase, which also
+    gets whatever time the named phases leave of the total. A phase timed inside another one is left out of the outer
+    one's time, so the phases add up to the total. The time spent keeping the books is added up in `overhead`, so the
+    middleware can tell what the instrumentation costs.
+    """
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.current = 'other'
+        self.inner = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.overhead = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        entered = perf_counter()
+        phase = self.get_phase(self.current)
+        before = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            after = perf_counter()
+            phase['queries'] += 1
+            phase['sql'] += after - before
+            self.queries += 1
+            self.sql_time += after - before
+            self.overhead += (before - entered) + (perf_counter() - after)
+
+    def get_phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = {'time': 0.0, 'queries': 0, 'sql': 0.0}
+        return self.phases[name]
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the block, outside of the phases inside it, and the queries it runs, to the phase."""
+        outer, self.current = self.current, name
+        outer_inner, self.inner = self.inner, 0.0
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - started
+            self.get_phase(name)['time'] += elapsed - self.inner
+            self.current, self.inner = outer, outer_inner + elapsed
+
+    def close(self, total):
+        """Give the "other" phase the time the named phases leave of the total."""
+        named = sum(phase['time'] for name, phase in self.phases.items() if name != 'other')
+        self.get_phase('other')['time'] = max(total - named, 0.0)
+
+    def server_timing(self, total):
+        """Return the Server-Timing header value, with durations in milliseconds."""
+        metrics = [f'{name};dur={phase["time"] * 1000:.2f};desc="{phase["queries"]} queries"'
+                   if phase['queries'] else f'{name};dur={phase["time"] * 1000:.2f}'
+                   for name, phase in self.phases.items()]
+        metrics.append(f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries"')
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_log_fields(self, total):
+        return {
+            'total_ms': round(total * 1000, 2),
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'phases': {name: {'ms': round(phase['time'] * 1000, 2), 'queries': phase['queries'],
+                              'sql_ms': round(phase['sql'] * 1000, 2)} for name, phase in self.phases.items()},
+        }
+
+
+@contextmanager
+def timed(request, name):
+    """Time the block as a phase of the request, if ServerTimingMiddleware is timing it."""
+    timings = getattr(request, 'timings', None)
+    if timings is None:
+        yield
+        return
+    with timings.phase(name):
+        yield
+
+
+class ServerTimingMiddleware(object):
+    """
+    Times a sample of the requests: their phases, as ServerTimingMixin marks them on the views, how many queries they
+    run and how long those take, and how long rendering takes. The results go in a Server-Timing header and in a log
+    line of JSON on the api.timing logger. API_TIMING_SAMPLE_RATE is the share of requests timed. When timing a view's
+    requests costs more than its `timing_overhead_budget` (API_TIMING_OVERHEAD_BUDGET by default), in milliseconds per
+    request, the view is sampled half as often, and it goes back up as the cost drops under the budget again.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rates = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        request.timings = None
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.timings is not None:
+                for connection in connections.all():
+                    if request.timings in connection.execute_wrappers:
+                        connection.execute_wrappers.remove(request.timings)
+        if request.timings is not None:
+            self.finish(request, response, perf_counter() - started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if view_class is None or random.random() >= self.get_sample_rate(view_class.__name__):
+            return None
+
+        request.timings = RequestTimings()
+        request.timings_view = view_class
+        for connection in connections.all():
+            connection.execute_wrappers.append(request.timings)
+        return None
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            started = perf_counter()
+            response.add_post_render_callback(lambda response: self.rendered(timings, started))
+        return response
+
+    def rendered(self, timings, started):
+        timings.get_phase('render')['time'] += perf_counter() - started
+
+    def finish(self, request, response, total):
+        started, timings, view_class = perf_counter(), request.timings, request.timings_view
+        timings.close(total)
+        response['Server-Timing'] = timings.server_timing(total)
+        fields = dict(timings.as_log_fields(total), method=request.method, path=request.path,
+                      view=view_class.__name__, status=response.status_code,
+                      sample_rate=self.get_sample_rate(view_class.__name__))
+        logger.info(json.dumps(fields, sort_keys=True), extra={'timing': fields})
+        timings.overhead += perf_counter() - started
+        self.adapt(view_class, timings.overhead * 1000)
+
+    def get_sample_rate(self, view_name):
+        return self.sample_rates.get(view_name, getattr(settings, 'API_TIMING_SAMPLE_RATE', 1.0))
+
+    def adapt(self, view_class, overhead_ms):
+        """Halve the view's sample rate when timing it went over budget, or move it back up when well under."""
+        budget = getattr(view_class, 'timing_overhead_budget', None)
+        if budget is None:
+            budget = getattr(settings, 'API_TIMING_OVERHEAD_BUDGET', 1.0)
+        configured = getattr(settings, 'API_TIMING_SAMPLE_RATE', 1.0)
+        with self._lock:
+            rate = self.get_sample_rate(view_class.__name__)
+            if overhead_ms > budget:
+                rate = max(rate / 2, getattr(settings, 'API_TIMING_MIN_SAMPLE_RATE', 0.01))
+                self.sample_rates[view_class.__name__] = rate
+                logger.warning("Timing %s took %.2fms, over its %.2fms budget; sampling it at %.4f",
+                               view_class.__name__, overhead_ms, budget, rate)
+            elif overhead_ms < budget / 2 and rate < configured:
+                self.sample_rates[view_class.__name__] = min(rate * 2, configured)
@@ -1,22 +1,46 @@
 from django.conf.urls import url
 
-from .views import AttributeDetail
+from .views import AttributeBatchGet
+from .views import AttributeChanges
 from .views import AttributeDelete
+from .views import AttributeDetail
 from .views import AttributeList
+from .views import CacheStats
+from .views import DeletionJobDetail
+from .views import Metrics
 from .views import ProductAddAttribute
-from .views import ProductRemoveAttribute
-from .views import ProductDetail
+from .views import ProductAttributeLinks
+from .views import ProductBatchGet
+from .views import ProductBulkCreate
+from .views import ProductBulkDelete
+from .views import ProductChanges
 from .views import ProductDelete
+from .views import ProductDetail
+from .views import ProductExport
+from .views import ProductFacets
 from .views import ProductList
+from .views import ProductRemoveAttribute
 
 urlpatterns = [
     url(r'^attributes/$', AttributeList.as_view(), name="attributes"),
+    url(r'^attributes/batch-get/$', AttributeBatchGet.as_view(), name="attribute_batch_get"),
+    url(r'^attributes/changes/$', AttributeChanges.as_view(), name="attribute_changes"),
     url(r'^attributes/(?P<pk>[0-9]+)/$', AttributeDetail.as_view(), name="attribute_details"),
     url(r'^attributes/(?P<pk>[0-9]+)/delete/$', AttributeDelete.as_view(), name="attribute_delete"),
     url(r'^products/$', ProductList.as_view(), name="products"),
+    url(r'^products/export/$', ProductExport.as_view(), name="product_export"),
+    url(r'^products/facets/$', ProductFacets.as_view(), name="product_facets"),
+    url(r'^products/batch-get/$', ProductBatchGet.as_view(), name="product_batch_get"),
+    url(r'^products/changes/$', ProductChanges.as_view(), name="product_changes"),
+    url(r'^products/bulk/$', ProductBulkCreate.as_view(), name="product_bulk_create"),
+    url(r'^products/bulk-delete/$', ProductBulkDelete.as_view(), name="product_bulk_delete"),
+    url(r'^products/attributes/$', ProductAttributeLinks.as_view(), name="product_attribute_links"),
     url(r'^products/(?P<pk>[0-9]+)/$', ProductDetail.as_view(), name="product_details"),
     url(r'^products/(?P<pk>[0-9]+)/delete/$', ProductDelete.as_view(), name="product_delete"),
     url(r'^products/(?P<pk>[0-9]+)/add-attribute/$', ProductAddAttribute.as_view(), name="product_add_attribute"),
     url(r'^products/(?P<pk>[0-9]+)/remove-attribute/$', ProductRemoveAttribute.as_view(),
-        name="product_remove_attribute")
+        name="product_remove_attribute"),
+    url(r'^jobs/(?P<pk>[0-9]+)/$', DeletionJobDetail.as_view(), name="deletion_job"),
+    url(r'^cache/stats/$', CacheStats.as_view(), name="cache_stats"),
+    url(r'^metrics/$', Metrics.as_view(), name="metrics"),
 ]
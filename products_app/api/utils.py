@@ -0,0 +1,18 @@
+from itertools import islice
+
+# Keeps `IN (...)` lookups under SQLite's default limit of 999 bound parameters per statement.
+MAX_IN_CLAUSE_SIZE = 900
+
+
+def chunk_count(count, size=MAX_IN_CLAUSE_SIZE):
+    """Return how many chunks of at most `size` items `count` items make."""
+    return -(-count // size)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from the iterable."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
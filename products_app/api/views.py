@@ -1,39 +1,101 @@
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics
 from rest_framework import mixins
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from rest_framework.views import APIView
 
+from .bulk import bulk_create_products
+from .bulk import bulk_relink
+from .bulk import existing_attribute_ids
+from .bulk import existing_product_ids
+from .bulk import relink_query_count
+from .cache import attribute_cache
+from .cache import product_cache
+from .export import EXPORT_FORMATS
+from .export import iter_product_chunks
+from .facets import queryset_facets
+from .facets import stored_facets
+from .fast_serializers import fast_attribute_serializer
+from .fast_serializers import fast_product_serializer
+from .filters import AttributeIndexFilterBackend
+from .filters import IndexedOrderingFilter
+from .filters import ProductFilterSet
+from .jobs import delete_attribute_later
+from .jobs import delete_products_later
+from .metrics import registry
+from .metrics import render_prometheus
+from .mixins import BatchRetrieveMixin
+from .mixins import CachedRetrieveMixin
+from .mixins import ChangeFeedMixin
+from .mixins import ConditionalGetMixin
+from .mixins import FastReadMixin
+from .mixins import QueryBudgetMixin
+from .mixins import ReplicaRoutingMixin
+from .mixins import ServerTimingMixin
+from .mixins import SparseFieldsetMixin
 from .models import Attribute
+from .models import DeletionJob
 from .models import Product
+from .models import Tombstone
+from .pagination import CatalogPagination
 from .serializers import AttributeSerializer
+from .serializers import BatchGetSerializer
+from .serializers import DeletionJobSerializer
 from .serializers import ProductAddAttributeSerializer
+from .serializers import ProductAttributeLinksSerializer
+from .serializers import ProductBulkDeleteSerializer
+from .serializers import ProductBulkItemSerializer
 from .serializers import ProductRemoveAttributeSerializer
 from .serializers import ProductSerializer
+from .utils import chunk_count
 
 
-class AttributeList(generics.ListCreateAPIView):
+class AttributeList(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, ConditionalGetMixin, FastReadMixin,
+                    generics.ListCreateAPIView):
     """
     get:
-    Return a list of all the existing attributes. Can be filtered down on type or value.
+    Return a list of all the existing attributes. Can be filtered down on type or value. Pass `pagination=cursor` to
+    page with cursors ordered by creation time instead of limit/offset, or `pagination=nocount` or
+    `pagination=cached-count` to page without counting the attributes on every request. Answers with a 304 when the
+    ETag or Last-Modified sent back shows the page has not changed.
 
     post:
     Creates a new attribute.
     """
     queryset = Attribute.objects.all()
     serializer_class = AttributeSerializer
+    fast_serializer = fast_attribute_serializer
+    query_budget = 3
+    replica_methods = ('GET', 'HEAD')
+    pagination_class = CatalogPagination
+    keyset_sort_key = 'created_at'
     filter_backends = (DjangoFilterBackend,)
     filter_fields = ('type', 'value')
 
 
-class AttributeDetail(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, generics.GenericAPIView):
+class AttributeDetail(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, ConditionalGetMixin, FastReadMixin,
+                      CachedRetrieveMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin, generics.GenericAPIView):
     """
     get:
-    Return an individual attribute.
+    Return an individual attribute. Served from the attribute cache when it has an up to date copy, or with a 304 when
+    the ETag or Last-Modified sent back shows it has not changed.
 
     post:
     Updates an individual attribute.
     """
     queryset = Attribute.objects.all()
     serializer_class = AttributeSerializer
+    fast_serializer = fast_attribute_serializer
+    query_budget = 5
+    replica_methods = ('GET', 'HEAD')
+    representation_cache = attribute_cache
 
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
@@ -42,44 +104,292 @@ class AttributeDetail(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, generi
         return self.update(request, *args, **kwargs)
 
 
-class AttributeDelete(mixins.DestroyModelMixin, generics.GenericAPIView):
+class AttributeBatchGet(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, FastReadMixin, BatchRetrieveMixin,
+                        generics.GenericAPIView):
     """
     post:
-    Deletes an individual attribute.
+    Return the attributes whose ids are in the "ids" list, in the same order, along with the "missing_ids" that do not
+    exist. Reads them with a query per 900 ids.
     """
     queryset = Attribute.objects.all()
+    serializer_class = BatchGetSerializer
+    fast_serializer = fast_attribute_serializer
+    # The API_BATCH_GET_MAX_IDS of 1000 ids take two queries.
+    query_budget = 2
+    replica_methods = ('POST',)
+
+    def post(self, request, *args, **kwargs):
+        return self.batch_retrieve(request, *args, **kwargs)
+
+
+class AttributeChanges(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, FastReadMixin, ChangeFeedMixin,
+                       generics.GenericAPIView):
+    """
+    get:
+    Return the attributes created, changed or deleted after the `cursor`, oldest change first, and the url of the next
+    page under "next". Leave out the cursor to start from the beginning.
+    """
+    queryset = Attribute.all_objects.all()
     serializer_class = AttributeSerializer
+    fast_serializer = fast_attribute_serializer
+    tombstone_kind = Tombstone.ATTRIBUTE
+    hidden_field = 'hidden'
+    query_budget = 2
+
+    def get(self, request, *args, **kwargs):
+        return self.changes(request, *args, **kwargs)
+
+
+def accepted_job_response(request, job, **extra):
+    """Return the 202 answering a request that started a deletion job, pointing at the job's status."""
+    url = reverse("deletion_job", kwargs={'pk': job.pk}, request=request)
+    return Response(dict(DeletionJobSerializer(job).data, url=url, **extra), status=status.HTTP_202_ACCEPTED,
+                    headers={'Location': url})
+
+
+class AttributeDelete(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """
+    post:
+    Deletes an individual attribute. The attribute is hidden right away and a background job then unlinks it from its
+    products a batch at a time before deleting it. Answers with a 202 and the url of the job's status.
+    """
+    queryset = Attribute.objects.all()
+    serializer_class = AttributeSerializer
+    query_budget = 5
 
     def post(self, request, *args, **kwargs):
-        return self.destroy(request, *args, **kwargs)
+        attribute = self.get_object()
+        with transaction.atomic():
+            job = delete_attribute_later(attribute)
+        return accepted_job_response(request, job)
 
 
-class ProductList(generics.ListCreateAPIView):
+class ProductList(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, ConditionalGetMixin, SparseFieldsetMixin,
+                  FastReadMixin, generics.ListCreateAPIView):
     """
     get:
     Return a list of all the existing products. Can be filtered down on all product non-id fields and attribute type and
-    attribute value.
+    attribute value, on a price range with `price__gte` and `price__lte`, on a release date range with
+    `release_date__range=<from>,<to>` and on several manufacturers or product types with `manufacturer__in=<a>,<b>` and
+    `product_type__in`. Pass `ordering=-price` to order on one of the indexed ordering_fields. Pass
+    `attribute=Type:Value` any number of times to only get products with all of those attributes, and
+    `attribute_any=Type:Value` to only get products with at least one of them. Pass `pagination=cursor` to page with
+    cursors ordered by creation time instead of limit/offset, or `pagination=nocount` or `pagination=cached-count` to
+    page without counting the products on every request. Answers with a 304 when the ETag or Last-Modified sent
+    back shows the page has not changed. Pass `fields=id,name` to only get those fields, and `expand=attributes` to get
+    the attributes along with them.
 
     post:
     Creates a new product.
     """
+    queryset = Product.objects.prefetch_related('attributes')
+    serializer_class = ProductSerializer
+    fast_serializer = fast_product_serializer
+    query_budget = 7
+    replica_methods = ('GET', 'HEAD')
+    pagination_class = CatalogPagination
+    keyset_sort_key = 'created_at'
+    filter_backends = (DjangoFilterBackend, AttributeIndexFilterBackend, IndexedOrderingFilter)
+    filter_class = ProductFilterSet
+    # Every one of these has an index on the product table.
+    ordering_fields = ('name', 'price', 'release_date', 'created_at', 'modified_at')
+
+
+class ProductExport(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """
+    get:
+    Streams every product, with the same filters as the product list, as newline delimited JSON or as CSV when
+    `output=csv` is passed. Products are read a chunk at a time, so the export runs in constant memory.
+    """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filter_fields = ('name', 'price', 'manufacturer', 'product_type', 'release_date', 'created_at', 'modified_at',
-                     'attributes__type', 'attributes__value')
+    # The body streams after dispatch returns, so the budget is checked against the queries reading each chunk.
+    query_budget = 2
+    filter_backends = ProductList.filter_backends
+    filter_class = ProductList.filter_class
+    ordering_fields = ProductList.ordering_fields
 
+    def get(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({"detail": f"Unsupported output, expected one of {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-class ProductDetail(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, generics.GenericAPIView):
+        render, content_type = EXPORT_FORMATS[output]
+        chunks = iter_product_chunks(self.filter_queryset(self.get_queryset()))
+        response = StreamingHttpResponse(render(self.stream(request, chunks)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{output}"'
+        return response
+
+    def stream(self, request, chunks):
+        """Yield the products of every chunk, checking the queries reading each one against the query budget."""
+        while True:
+            with self.checking_query_budget(request):
+                chunk = next(chunks, None)
+            if chunk is None:
+                return
+            yield from chunk
+
+
+class ProductFacets(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
     """
     get:
-    Return an individual product.
+    Return the number of products per manufacturer, product type and attribute type and value, for the products
+    matching the same filters as the product list. Without filters the counts come from the facet count tables.
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    query_budget = 3
+    replica_methods = ('GET', 'HEAD')
+    filter_backends = ProductList.filter_backends
+    filter_class = ProductList.filter_class
+    ordering_fields = ProductList.ordering_fields
 
+    def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(queryset_facets(queryset) if queryset.query.where else stored_facets())
+
+
+class ProductBatchGet(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, SparseFieldsetMixin, FastReadMixin,
+                      BatchRetrieveMixin, generics.GenericAPIView):
+    """
     post:
-    Updates an individual product.
+    Return the products whose ids are in the "ids" list, with their attributes, in the same order, along with the
+    "missing_ids" that do not exist. Reads them and their attributes with a query each per 900 ids. Pass
+    `fields=id,name` to only get those fields, and `expand=attributes` to get the attributes along with them.
+    """
+    queryset = Product.objects.all()
+    serializer_class = BatchGetSerializer
+    fast_serializer = fast_product_serializer
+    # The API_BATCH_GET_MAX_IDS of 1000 ids take two queries for the products and two for their attributes.
+    query_budget = 4
+    replica_methods = ('POST',)
+
+    def post(self, request, *args, **kwargs):
+        return self.batch_retrieve(request, *args, **kwargs)
+
+
+class ProductChanges(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, FastReadMixin, ChangeFeedMixin,
+                     generics.GenericAPIView):
+    """
+    get:
+    Return the products created, changed or deleted after the `cursor`, oldest change first, with their attributes, and
+    the url of the next page under "next". Adding or removing an attribute counts as a change of the product.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    fast_serializer = fast_product_serializer
+    tombstone_kind = Tombstone.PRODUCT
+    query_budget = 3
+
+    def get(self, request, *args, **kwargs):
+        return self.changes(request, *args, **kwargs)
+
+
+class ProductBulkCreate(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """
+    post:
+    Creates every product in a list of products, each of which can have a list of attribute_ids to link to it. Returns
+    a result per item. Invalid items are skipped unless `atomic=true` is passed, in which case nothing is created
+    when any item is invalid.
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductBulkItemSerializer
+    query_budget = 6
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        max_items = getattr(settings, 'API_BULK_MAX_ITEMS', 10000)
+        if not isinstance(items, list):
+            return Response({"detail": "Expected a list of products."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_items:
+            return Response({"detail": f"At most {max_items} products can be created at once."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializers = [self.get_serializer(data=item) for item in items]
+        valid = [serializer.is_valid() for serializer in serializers]
+        existing = existing_attribute_ids(attribute_id for serializer, is_valid in zip(serializers, valid) if is_valid
+                                          for attribute_id in serializer.validated_data.get('attribute_ids', []))
+
+        results, products, attribute_ids = [], [], []
+        for index, (serializer, is_valid) in enumerate(zip(serializers, valid)):
+            if not is_valid:
+                results.append({"index": index, "status": status.HTTP_400_BAD_REQUEST, "errors": serializer.errors})
+                continue
+            data = dict(serializer.validated_data)
+            missing = sorted(set(data.get('attribute_ids', [])) - existing)
+            if missing:
+                results.append({"index": index, "status": status.HTTP_400_BAD_REQUEST,
+                                "errors": {"attribute_ids": [f"Invalid pk \"{pk}\" - object does not exist."
+                                                             for pk in missing]}})
+                continue
+            attribute_ids.append(data.pop('attribute_ids', []))
+            products.append(Product(**data))
+            results.append({"index": index, "status": status.HTTP_201_CREATED})
+
+        failed = len(items) - len(products)
+        atomic = request.query_params.get('atomic', '').lower() in ('1', 'true')
+        if products and not (atomic and failed):
+            with transaction.atomic():
+                bulk_create_products(products, attribute_ids)
+            created = iter(products)
+            for result in results:
+                if result["status"] == status.HTTP_201_CREATED:
+                    result["id"] = next(created).pk
+        else:
+            products = []
+            for result in results:
+                if result["status"] == status.HTTP_201_CREATED:
+                    result["status"] = status.HTTP_424_FAILED_DEPENDENCY
+
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif products:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({"created": len(products), "failed": failed, "results": results}, status=response_status)
+
+
+class ProductBulkDelete(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """
+    post:
+    Deletes every product in product_ids with a background job, a batch of products per transaction. Answers with a
+    202, the url of the job's status and the product ids that do not exist.
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductBulkDeleteSerializer
+    # The products' existence a chunk at a time for as many ids as the serializer accepts, and the job's creation.
+    query_budget = 3 + chunk_count(getattr(settings, 'API_BULK_DELETE_MAX_ITEMS', 100000))
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data["product_ids"])
+        product_ids = existing_product_ids(requested)
+        with transaction.atomic():
+            job = delete_products_later(product_ids)
+        return accepted_job_response(request, job, missing_product_ids=sorted(requested - product_ids))
+
+
+class ProductDetail(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, ConditionalGetMixin, SparseFieldsetMixin,
+                    FastReadMixin, CachedRetrieveMixin, mixins.RetrieveModelMixin, mixins.UpdateModelMixin,
+                    generics.GenericAPIView):
+    """
+    get:
+    Return an individual product. Served from the product cache when it has an up to date copy, or with a 304 when the
+    ETag or Last-Modified sent back shows it has not changed. Pass `fields=id,name` to only get those fields, and
+    `expand=attributes` to get the attributes along with them.
+
+    post:
+    Updates an individual product.
+    """
+    queryset = Product.objects.prefetch_related('attributes')
+    serializer_class = ProductSerializer
+    fast_serializer = fast_product_serializer
+    query_budget = 5
+    replica_methods = ('GET', 'HEAD')
+    representation_cache = product_cache
 
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
@@ -88,37 +398,105 @@ class ProductDetail(mixins.RetrieveModelMixin, mixins.UpdateModelMixin, generics
         return self.update(request, *args, **kwargs)
 
 
-class ProductDelete(mixins.DestroyModelMixin, generics.GenericAPIView):
+class ProductDelete(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, mixins.DestroyModelMixin,
+                    generics.GenericAPIView):
     """
     post:
     Deletes an individual product.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    query_budget = 8
 
     def post(self, request, *args, **kwargs):
         return self.destroy(request, *args, **kwargs)
 
 
-class ProductAddAttribute(mixins.UpdateModelMixin, generics.GenericAPIView):
+class ProductAddAttribute(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, mixins.UpdateModelMixin,
+                          generics.GenericAPIView):
     """
     post:
     Adds specified attribute to specified product.
     """
     queryset = Product.objects.all()
     serializer_class = ProductAddAttributeSerializer
+    query_budget = 8
 
     def post(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
 
 
-class ProductRemoveAttribute(mixins.UpdateModelMixin, generics.GenericAPIView):
+class ProductRemoveAttribute(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, mixins.UpdateModelMixin,
+                             generics.GenericAPIView):
     """
     post:
     Removes specified attribute from specified product.
     """
     queryset = Product.objects.all()
     serializer_class = ProductRemoveAttributeSerializer
+    query_budget = 8
 
     def post(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
+
+
+class ProductAttributeLinks(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.GenericAPIView):
+    """
+    post:
+    Links every product in product_ids to the attributes in add_attribute_ids and unlinks it from the attributes in
+    remove_attribute_ids. Returns how many links were created and deleted, and the product ids that do not exist.
+    """
+    queryset = Product.objects.all()
+    serializer_class = ProductAttributeLinksSerializer
+    # The check of the attributes, then for as many products and attributes as the serializer accepts, the products'
+    # existence a chunk at a time and bulk_relink.
+    query_budget = 1 + chunk_count(getattr(settings, 'API_ATTRIBUTE_LINKS_MAX_ITEMS', 100000)) + relink_query_count(
+        getattr(settings, 'API_ATTRIBUTE_LINKS_MAX_ITEMS', 100000), ProductAttributeLinksSerializer.max_attribute_ids)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = set(serializer.validated_data["product_ids"])
+        product_ids = existing_product_ids(requested)
+
+        with transaction.atomic():
+            created, deleted = bulk_relink(product_ids, serializer.validated_data["add_attribute_ids"],
+                                           serializer.validated_data["remove_attribute_ids"])
+        return Response({"created": created, "deleted": deleted,
+                         "missing_product_ids": sorted(requested - product_ids)})
+
+
+class DeletionJobDetail(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, generics.RetrieveAPIView):
+    """
+    get:
+    Return the status of a deletion job and how many of the links or products it deletes it has processed.
+    """
+    queryset = DeletionJob.objects.all()
+    serializer_class = DeletionJobSerializer
+    query_budget = 1
+
+
+class CacheStats(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, APIView):
+    """
+    get:
+    Return the hit and miss counts of the product and attribute detail caches in this worker process.
+    """
+    query_budget = 0
+
+    def get(self, request, *args, **kwargs):
+        return Response({"product": product_cache.stats(), "attribute": attribute_cache.stats()})
+
+
+class Metrics(ServerTimingMixin, ReplicaRoutingMixin, QueryBudgetMixin, APIView):
+    """
+    get:
+    Return the request counts, latency and query histograms and cache hit ratios of every worker process, in the
+    Prometheus text format. Only answers clients in API_METRICS_ALLOWED_IPS.
+    """
+    query_budget = 0
+
+    def get(self, request, *args, **kwargs):
+        if request.META.get('REMOTE_ADDR') not in getattr(settings, 'API_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')):
+            raise NotFound()
+        return HttpResponse(render_prometheus(registry.collect()),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -43,6 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,11 +81,96 @@ WSGI_APPLICATION = 'products_app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'api.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# API_DB_PROFILE=production keeps database connections open across requests, starts transactions with BEGIN IMMEDIATE
+# (api/sqlite_backend) and has it set these pragmas on every new SQLite connection: WAL journaling, so
+# readers carry on while a writer writes, synchronous=NORMAL, which is still safe with WAL and only syncs at
+# checkpoints, memory mapped reads, a 64MB page cache, and a busy timeout so writers wait for the lock rather than fail
+# with "database is locked".
+API_DB_PROFILES = {
+    'default': {'DATABASE': {'CONN_MAX_AGE': 0, 'TRANSACTION_MODE': 'DEFERRED'}, 'PRAGMAS': {}},
+    'production': {
+        'DATABASE': {'CONN_MAX_AGE': 600, 'TRANSACTION_MODE': 'IMMEDIATE'},
+        'PRAGMAS': {
+            'busy_timeout': 20000,
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 268435456,
+            'cache_size': -65536,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+API_DB_PROFILE = os.environ.get('API_DB_PROFILE', 'default')
+DATABASES['default'].update(API_DB_PROFILES[API_DB_PROFILE]['DATABASE'])
+API_SQLITE_PRAGMAS = API_DB_PROFILES[API_DB_PROFILE]['PRAGMAS']
+
+# API_DATABASE_REPLICAS is a comma separated list of database files holding copies of the primary kept up to date by
+# replication, such as Litestream or LiteFS read replicas. The GET requests of the list and detail views read from one
+# of them at random (api/routers.py), except for a client that wrote within the last API_READ_YOUR_WRITES_WINDOW
+# seconds, whose reads stay on the primary. The test runner points them at the test database of the primary.
+API_REPLICA_ALIASES = []
+for index, path in enumerate(filter(None, os.environ.get('API_DATABASE_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = dict(DATABASES['default'], NAME=path, TEST={'MIRROR': 'default'})
+    API_REPLICA_ALIASES.append(f'replica{index}')
+DATABASE_ROUTERS = ['api.routers.PrimaryReplicaRouter']
+API_READ_YOUR_WRITES_WINDOW = 5
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# The product and attribute detail views cache their representations here. Use a shared backend such as memcached
+# when running several worker processes so they see each other's invalidations.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+API_CACHE_TIMEOUT = 300
+
+# Each worker keeps an in-memory index of which products have which attributes (api/attribute_index.py), and before
+# using it re-reads the links of the products modified since its last sync, less this many seconds to also catch
+# transactions that committed late.
+API_ATTRIBUTE_INDEX_SYNC_OVERLAP = 2
+
+# With pagination=cached-count the listings take their count from the cache, counting again in the background once
+# it is more than API_COUNT_REFRESH_AFTER seconds old.
+API_COUNT_CACHE_TIMEOUT = 3600
+API_COUNT_REFRESH_AFTER = 60
+
+# Deleting an attribute, or products in bulk, runs as a job in a background thread, unlinking or deleting this many
+# rows per transaction.
+API_DELETION_BATCH_SIZE = 500
+
+# The change feeds leave out changes younger than this many seconds, so that a transaction committing late cannot slip
+# in behind a cursor that has already moved past its modified_at.
+API_CHANGE_FEED_SETTLE = 2
+
+# The share of requests timed by api.timing.ServerTimingMiddleware, which sends their timings in a Server-Timing header
+# and logs them as JSON on the api.timing logger. A view whose timing costs more than API_TIMING_OVERHEAD_BUDGET
+# milliseconds per request is sampled less often, down to API_TIMING_MIN_SAMPLE_RATE.
+API_TIMING_SAMPLE_RATE = 1.0
+API_TIMING_OVERHEAD_BUDGET = 1.0
+API_TIMING_MIN_SAMPLE_RATE = 0.01
+
+# Requests sent with this token in an X-Profile header are profiled, and their profiles saved in API_PROFILING_DIR
+# (api/profiling.py). Profiling is off when there is no token.
+API_PROFILING_TOKEN = os.environ.get('API_PROFILING_TOKEN')
+API_PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# api/metrics.py counts requests per url name. Under a prefork server, point API_METRICS_DIR at a directory the workers
+# share, emptied before the server starts, so metrics/ adds up the requests of every worker; each writes its counts
+# there at most every API_METRICS_FLUSH_INTERVAL seconds. metrics/ only answers API_METRICS_ALLOWED_IPS.
+API_METRICS_DIR = os.environ.get('API_METRICS_DIR')
+API_METRICS_FLUSH_INTERVAL = 1
+API_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
@@ -124,5 +212,23 @@ STATIC_URL = '/static/'
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
+
+# Clients that send `Accept: application/x-msgpack` get MessagePack instead of JSON, when msgpack is installed.
+try:
+    import msgpack  # noqa: F401
+except ImportError:
+    pass
+else:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('api.renderers.MessagePackRenderer',)
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] += ('api.parsers.MessagePackParser',)
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "products_app.settings")
 
 application = get_wsgi_application()
+
+# Build the attribute index as each worker starts, rather than on the first request filtering on attributes. The
+# connection it opened is closed, so workers forked from a preloaded app do not share it.
+from api.attribute_index import attribute_index  # noqa: E402
+from django.db import connections  # noqa: E402
+attribute_index.load()
+connections.close_all()